@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# Serve recipe/tag/ingredient reads from coroutine views (recipe.async_views).
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Change events are streamed outside
+# Django, which cannot serve long-lived async responses.
+from recipe.events import with_event_stream  # noqa: E402
+
+application = with_event_stream(django_application)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,19 +82,143 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Share of requests timed for Server-Timing headers, and the duration
+# above which a timed request is logged with its slowest queries.
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 1 if DEBUG else 0.05))
+REQUEST_TIMING_SLOW_MS = float(os.environ.get('REQUEST_TIMING_SLOW_MS', 500))
+
+# Slow requests are logged by core.timing as one JSON object per line on
+# stdout, for the log shipper to parse.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_lines': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'json_stdout': {
+            'class': 'logging.StreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json_lines',
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['json_stdout'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Response compression, most preferred coding first; br and zstd need the
+# brotli and zstandard packages. Smaller responses are sent as they are.
+COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+COMPRESSION_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
+# Admin changelists count at most this many rows (larger tables show the
+# planner's estimate), and bulk actions work in batches of this size.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_ACTION_BATCH_SIZE = 1000
+
+# Deleted users are purged by `manage.py purge_users`, this many rows per
+# transaction; a purge without progress for USER_PURGE_STALE_SECONDS is
+# taken over by another worker.
+USER_PURGE_BATCH_SIZE = int(os.environ.get('USER_PURGE_BATCH_SIZE', 500))
+USER_PURGE_STALE_SECONDS = 300
+
+# Background jobs (core.jobs): attempts before a job fails for good, the
+# retry backoff, and how long a worker may go silent before its job is
+# given to another worker.
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 10
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_STALE_SECONDS = 600
+
+# Sync tokens older than this get a full resync; tombstones of deleted
+# rows are kept a day longer by `manage.py prune_tombstones`.
+SYNC_TOKEN_MAX_AGE = 30 * 24 * 60 * 60
+
+# Most recipes one multi-get (/recipes/?ids=...) may ask for.
+RECIPE_MULTI_GET_MAX_IDS = 500
+
+# Change event streams (recipe.events, ASGI only): idle streams get a
+# comment this often, and clients and the LISTEN connection reconnect
+# after this delay.
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
+EVENT_STREAM_RECONNECT_SECONDS = 5
+
+# Directory shared by all worker processes for /metrics; see core.metrics.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Who may scrape /metrics: these client addresses, or anyone sending
+# `Authorization: Bearer <METRICS_TOKEN>` when a token is set.
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Request profiling; see core.profiling. Staff trigger it per request
+# with an X-Profile header signed for them by
+# `manage.py profiles token --user <email>`.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'cprofile')  # or 'sampling'
+PROFILE_SAMPLING_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLING_INTERVAL_MS', 2))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'api-profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+# Route recipe API reads to async views; app/asgi.py turns this on.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections persist for DB_CONN_MAX_AGE seconds and are checked before
+# reuse. Setting DB_POOL_MAX_SIZE instead shares a bounded pool between
+# the threads of each worker and returns connections after every request.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        } if DB_POOL_MAX_SIZE else None,
     }
 }
 
+# Read replicas: DB_REPLICA_HOSTS is a comma separated list of hosts
+# serving copies of the default database under the same credentials.
+# Views using core.db.replicas.ReplicaReadMixin read from them, except for
+# DB_REPLICA_PIN_SECONDS after a user's last write.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db.replicas.ReplicaRouter']
+
+# The read-replica pin needs a cache shared by all workers, e.g.
+# CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache and
+# CACHE_LOCATION=cache_table (after `manage.py createcachetable`).
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -149,6 +277,20 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True
 }
 
+# Prebuilt schema served by /api/schema/ (manage.py build_openapi_schema);
+# generated on the first request when unset or missing.
+OPENAPI_SCHEMA_FILE = os.environ.get('OPENAPI_SCHEMA_FILE') or None
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',  # drf-spectacular settings
+    # orjson, with the same output as DRF's JSON renderer and parser
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
@@ -0,0 +1,42 @@
+"""
+Settings for API-only workers.
+
+Select with DJANGO_SETTINGS_MODULE=app.settings_api. The user and recipe
+APIs are token-authenticated JSON, so these workers load no admin,
+sessions, messages, static files or templates and run a short middleware
+stack. The admin and the Swagger/Redoc pages are served by workers
+running app.settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, REST_FRAMEWORK
+
+API_EXCLUDED_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+)
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in API_EXCLUDED_APPS
+]
+
+MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'app.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.TokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': ['core.renderers.OrjsonRenderer'],
+}
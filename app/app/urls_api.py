@@ -0,0 +1,15 @@
+"""URL configuration of API-only workers (app.settings_api)"""
+from core.views import metrics_view, CachedSpectacularAPIView
+from django.conf import settings
+from django.urls import path, include
+
+urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
+    path('api/schema/', CachedSpectacularAPIView.as_view(), name='schema'),
+
+    # API ENDPOINTS
+    path('api/user/', include('user.urls')),
+    path('', include(
+        'recipe.async_urls' if settings.ASYNC_READ_VIEWS else 'recipe.urls'
+    )),
+]
@@ -1,8 +1,86 @@
+from django.conf import settings
 from django.contrib import admin  # noqa
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
-from .models import User, Recipe, Tag, Ingredient
+from user import purge
+
+from .models import User, Recipe, Tag, Ingredient, UserPurge, Job
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator that never counts more than ADMIN_EXACT_COUNT_LIMIT rows
+
+    Unfiltered tables larger than the limit report the planner's row
+    estimate; filtered querysets are counted up to the limit.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate > limit:
+                return estimate
+        return queryset.order_by()[:limit].count()
+
+
+def estimated_row_count(model, using):
+    """Return PostgreSQL's estimate of a table's rows, -1 if unknown"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Admin for tables too large to list, count or load in full"""
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+    ordering = ['-id']
+    actions = ['delete_in_batches']
+
+    def get_actions(self, request):
+        # delete_selected loads and lists every selected object.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(
+        permissions=['delete'],
+        description=_('Delete selected %(verbose_name_plural)s in batches'),
+    )
+    def delete_in_batches(self, request, queryset):
+        """Delete the selection a batch of primary keys at a time"""
+        size = settings.ADMIN_ACTION_BATCH_SIZE
+        pks = queryset.order_by().values_list('pk', flat=True)
+        deleted = 0
+        batch = []
+        for pk in pks.iterator(chunk_size=size):
+            batch.append(pk)
+            if len(batch) == size:
+                deleted += self._delete_batch(batch)
+                batch = []
+        if batch:
+            deleted += self._delete_batch(batch)
+        self.message_user(request, _('Deleted %(count)d %(name)s.') % {
+            'count': deleted, 'name': self.model._meta.verbose_name_plural,
+        })
+
+    def _delete_batch(self, pks):
+        with transaction.atomic():
+            _, deleted = self.model.objects.filter(pk__in=pks).delete()
+        return deleted.get(self.model._meta.label, 0)
 
 
 class UserAdmin(BaseUserAdmin):
@@ -24,6 +102,24 @@ class UserAdmin(BaseUserAdmin):
         (_('important_dates'), {'fields': ('last_login',)})
     )
     readonly_fields = ['last_login']
+    search_fields = ['^email']
+
+    def get_deleted_objects(self, objs, request):
+        # Only the users are deleted now; see user.purge for the rest.
+        deleted, model_count, perms_needed, protected = [], {}, set(), []
+        for obj in objs:
+            deleted.append(str(obj))
+        model_count[User._meta.verbose_name_plural] = len(deleted)
+        if not self.has_delete_permission(request):
+            perms_needed.add(User._meta.verbose_name)
+        return deleted, model_count, perms_needed, protected
+
+    def delete_model(self, request, obj):
+        purge.request_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset.iterator():
+            purge.request_deletion(obj)
     add_fieldsets = (
         (None, {'classes': ('wide',),
                 'fields': (
@@ -39,7 +135,66 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class RecipeAdmin(ScalableModelAdmin):
+    """Define the admin pages for recipes"""
+    list_display = ['id', 'title', 'user', 'price', 'time_minutes']
+    search_fields = ['^title']
+    autocomplete_fields = ['user', 'tags', 'ingredients']
+
+
+class TagAdmin(ScalableModelAdmin):
+    """Define the admin pages for tags"""
+    list_display = ['id', 'name', 'user']
+    search_fields = ['^name']
+
+
+class IngredientAdmin(ScalableModelAdmin):
+    """Define the admin pages for ingredients"""
+    list_display = ['id', 'name', 'user']
+    search_fields = ['^name']
+
+
+class UserPurgeAdmin(admin.ModelAdmin):
+    """Show the progress of user purges"""
+    list_display = [
+        'email', 'status', 'recipes_deleted', 'tags_deleted',
+        'ingredients_deleted', 'images_deleted', 'requested_at', 'finished_at',
+    ]
+    list_filter = ['status']
+    search_fields = ['^email']
+    ordering = ['-requested_at']
+    readonly_fields = [
+        'user_id', 'email', 'recipes_deleted', 'tags_deleted',
+        'ingredients_deleted', 'images_deleted', 'error', 'requested_at',
+        'updated_at', 'finished_at',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+class JobAdmin(admin.ModelAdmin):
+    """Show queued, running and failed background jobs"""
+    list_display = [
+        'id', 'task', 'status', 'priority', 'attempts', 'max_attempts',
+        'run_after', 'locked_by',
+    ]
+    list_filter = ['status', 'task']
+    ordering = ['-id']
+    readonly_fields = ['locked_by', 'locked_at', 'last_error', 'created_at']
+    actions = ['retry_now']
+
+    @admin.action(description=_('Retry selected jobs now'))
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(),
+        )
+        self.message_user(request, _('Queued %(count)d jobs.') % {'count': count})
+
+
 admin.site.register(User, UserAdmin)
-admin.site.register(Recipe)
-admin.site.register(Tag)
-admin.site.register(Ingredient)
+admin.site.register(UserPurge, UserPurgeAdmin)
+admin.site.register(Job, JobAdmin)
+admin.site.register(Recipe, RecipeAdmin)
+admin.site.register(Tag, TagAdmin)
+admin.site.register(Ingredient, IngredientAdmin)
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .jobs import queue_depth
+        from .metrics import install_query_counter, register_collector
+        from .timing import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
+        connection_created.connect(install_query_counter)
+        register_collector(queue_depth)
@@ -0,0 +1,148 @@
+"""Response body codecs for negotiated compression
+
+gzip is always available; brotli (``br``) and zstd come from the
+``brotli`` and ``zstandard`` packages in requirements.txt, and are
+skipped where those are missing. Every codec
+compresses a whole body at once or a stream of chunks, flushing after
+each chunk so streamed responses keep flowing to the client.
+"""
+
+import re
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/([\w.+-]+\+)?(json|xml|javascript)\b'
+    r'|image/svg\+xml\b)'
+)
+
+
+class GzipCodec:
+    """gzip through zlib, with a zero mtime so output is reproducible"""
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def _compressor(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        compressor = self._compressor()
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks):
+        compressor = self._compressor()
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class BrotliCodec:
+    """Brotli, usually smaller than gzip at the same speed"""
+    name = 'br'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ZstdCodec:
+    """Zstandard, the fastest to compress and decompress"""
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.level = level
+        self._local = threading.local()
+
+    def compress(self, data):
+        # ZstdCompressor objects are not thread-safe: one per thread.
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(level=self.level)
+            self._local.compressor = compressor
+        return compressor.compress(data)
+
+    def stream(self, chunks):
+        # Streams interleave, even within a thread; each gets its own.
+        compressor = zstandard.ZstdCompressor(
+            level=self.level
+        ).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            data += compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def available_codecs(levels):
+    """Return {encoding: codec} for the installed compression libraries"""
+    codecs = {'gzip': GzipCodec(levels.get('gzip', 6))}
+    if brotli is not None:
+        codecs['br'] = BrotliCodec(levels.get('br', 4))
+    if zstandard is not None:
+        codecs['zstd'] = ZstdCodec(levels.get('zstd', 3))
+    return codecs
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def negotiate(header, preference):
+    """Return the preferred coding of ``preference`` the client accepts.
+
+    Codings are ranked by their q value, then by their order in
+    ``preference``; ``*`` stands for any coding not listed.
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in preference:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(content_type):
+    """Return True for text-like media; images and archives are packed"""
+    return bool(COMPRESSIBLE_TYPES.match(content_type.strip().lower()))
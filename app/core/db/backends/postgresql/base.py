@@ -0,0 +1,117 @@
+"""
+PostgreSQL backend with connection health checks and optional pooling
+
+Settings understood on top of Django's own, per database alias:
+
+* ``CONN_HEALTH_CHECKS``: check a persistent connection with a cheap
+  query before the first use in each request, and reconnect if the
+  server dropped it.
+* ``POOL``: ``{'MAX_SIZE': int, 'TIMEOUT': float}`` shares a bounded set
+  of connections between the threads of a worker process. Closing the
+  Django connection hands the raw connection back to the pool.
+"""
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from core.db.pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Test database creation that releases pooled connections first"""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL wrapper with health checks and a process-wide pool"""
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        target = tuple(
+            self.settings_dict.get(key)
+            for key in ('HOST', 'PORT', 'NAME', 'USER')
+        )
+        return get_pool(
+            self.alias,
+            target,
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                self.get_connection_params()
+            ),
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 5.0),
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        conn = pool.acquire()
+        if self.health_check_enabled and not self._ping(conn):
+            pool.discard(conn)
+            conn = pool.acquire()
+        return conn
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        pool = self.pool
+        if pool is None:
+            return super()._close()
+        conn = self.connection
+        idle = extensions.TRANSACTION_STATUS_IDLE
+        try:
+            if not conn.closed and conn.get_transaction_status() != idle:
+                conn.rollback()
+        except Exception:
+            pool.discard(conn)
+        else:
+            pool.release(conn)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        """Close a reused connection the server no longer answers on"""
+        if (
+            self.connection is None
+            or not self.health_check_enabled
+            or self.health_check_done
+            or self.in_atomic_block
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not conn.autocommit:
+                conn.rollback()
+        except Exception:
+            return False
+        return True
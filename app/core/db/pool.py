@@ -0,0 +1,144 @@
+"""
+In-process database connection pool for threaded and ASGI workers
+"""
+
+import threading
+import time
+
+from psycopg2 import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """No pooled connection became available within the acquire timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections shared by the threads of a worker.
+
+    ``connect`` opens a new raw connection. At most ``max_size``
+    connections exist at once; ``acquire`` waits up to ``timeout``
+    seconds for one to be released before raising PoolTimeout.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=5.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0
+        self._lock = threading.Condition()
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    def acquire(self):
+        """Return an idle connection, open a new one or wait for one"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._lock:
+            waited = False
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f'No database connection available after '
+                        f'{self.timeout}s (pool size {self.max_size})'
+                    )
+                waited = True
+                self._lock.wait(remaining)
+            if waited:
+                self._waits += 1
+                self._wait_seconds += time.monotonic() - start
+            self._acquired += 1
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            self._forget()
+            raise
+
+    def release(self, conn):
+        """Return a healthy connection to the pool"""
+        if conn.closed:
+            self.discard(conn)
+            return
+        with self._lock:
+            self._idle.append(conn)
+            self._lock.notify()
+
+    def discard(self, conn):
+        """Close a broken connection and free its slot"""
+        try:
+            conn.close()
+        finally:
+            self._forget()
+
+    def _forget(self):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Return a snapshot of the pool's gauges and counters"""
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'acquired_total': self._acquired,
+                'waits_total': self._waits,
+                'timeouts_total': self._timeouts,
+                'wait_seconds_total': self._wait_seconds,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, target, connect, max_size, timeout):
+    """Return the process-wide pool for a database alias and target.
+
+    ``target`` identifies the server and database, so connections made
+    before a settings change (e.g. to the test database) are not reused.
+    """
+    with _pools_lock:
+        key = (alias, target)
+        if key not in _pools:
+            _pools[key] = ConnectionPool(connect, max_size, timeout)
+        return _pools[key]
+
+
+def close_pools(alias):
+    """Close the idle connections of every pool for a database alias"""
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items() if key[0] == alias]
+    for pool in pools:
+        pool.close_all()
+
+
+def pool_stats():
+    """Return the stats of every pool in this process, keyed by alias"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    stats = {}
+    for (alias, target), pool in pools:
+        for name, value in pool.stats().items():
+            stats.setdefault(alias, {}).setdefault(name, 0)
+            stats[alias][name] += value
+    return stats
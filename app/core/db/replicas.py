@@ -0,0 +1,99 @@
+"""
+Read-replica routing with read-your-writes consistency
+
+Views opt in with ReplicaReadMixin. Safe requests from those views are
+served by a random alias in settings.DATABASE_REPLICAS once the user is
+authenticated; everything else, and every write, uses ``default``.
+After a user writes, their reads stay on ``default`` for
+settings.REPLICA_PIN_SECONDS so they never see replication lag. The
+pin lives in the cache, which must be shared between workers for it to
+hold across processes; the router refuses to start with replicas and a
+process-local cache.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'replica-pin:{user_id}'
+
+# Cache backends that do not share the pin with other processes.
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def pin_to_primary(user):
+    """Keep the user's reads on the primary for the pin window"""
+    cache.set(
+        PIN_KEY.format(user_id=user.id), True, settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(user):
+    """Return True if the user wrote recently"""
+    return bool(cache.get(PIN_KEY.format(user_id=user.id)))
+
+
+class ReplicaRouter:
+    """Send reads to a replica while replica reads are enabled"""
+
+    def __init__(self):
+        backend = settings.CACHES['default']['BACKEND']
+        if settings.DATABASE_REPLICAS and backend in LOCAL_CACHES:
+            raise ImproperlyConfigured(
+                'Read replicas need a cache shared between processes for '
+                f'read-your-writes pinning; {backend} is per process. '
+                'Set CACHE_BACKEND and CACHE_LOCATION.'
+            )
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _replica_reads.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so objects read from a replica are saved to the primary.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaReadMixin:
+    """Serve safe requests of a DRF view from a read replica"""
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication has run on the primary by the time this returns.
+        super().initial(request, *args, **kwargs)
+        user = request.user
+        if not user.is_authenticated:
+            return
+        if request.method not in SAFE_METHODS:
+            # Pin before writing too, so concurrent reads see the write.
+            pin_to_primary(user)
+            self._pin_user = user
+        elif not is_pinned(user):
+            self._replica_reads = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_reads', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_reads = None
+        user = getattr(self, '_pin_user', None)
+        if user is not None:
+            # Restart the window now the write has committed.
+            pin_to_primary(user)
+            self._pin_user = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,236 @@
+"""Durable background jobs queued in PostgreSQL
+
+Functions decorated with ``@task`` can be queued with ``func.enqueue(
+**kwargs)`` (or ``enqueue('module.function', ...)``); the job is a Job
+row, committed or rolled back along with the caller's transaction.
+Workers (``manage.py run_jobs``) claim the most urgent due job with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of them share the
+queue without a broker. Failed jobs are retried with exponential
+backoff until they run out of attempts; successful ones are deleted.
+"""
+
+import datetime
+import functools
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(func=None, *, priority=0, max_attempts=None):
+    """Register a function as a task and give it an ``enqueue`` method"""
+    if func is None:
+        return functools.partial(
+            task, priority=priority, max_attempts=max_attempts
+        )
+    name = f'{func.__module__}.{func.__qualname__}'
+    TASKS[name] = func
+    func.enqueue = functools.partial(
+        enqueue, name, priority=priority, max_attempts=max_attempts
+    )
+    return func
+
+
+def enqueue(task, /, *, priority=0, delay=0, max_attempts=None, **kwargs):
+    """Queue a run of the task named ``task`` with JSON-serializable kwargs"""
+    return Job.objects.create(
+        task=task,
+        kwargs=kwargs,
+        priority=priority,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=timezone.now() + datetime.timedelta(seconds=delay),
+    )
+
+
+def worker_name():
+    """Return the name jobs are locked by in this process"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Mark the most urgent due job as running by ``worker``; return it"""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('-priority', 'run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.locked_by = worker
+        job.locked_at = now
+        job.save(update_fields=[
+            'status', 'attempts', 'locked_by', 'locked_at',
+        ])
+    return job
+
+
+def requeue_stale():
+    """Give jobs of workers that stopped heartbeating to other workers"""
+    stale = timezone.now() - datetime.timedelta(
+        seconds=settings.JOB_STALE_SECONDS
+    )
+    running = Job.objects.filter(status=Job.RUNNING, locked_at__lt=stale)
+    # Unlocked, so the stalled worker can no longer finish them.
+    failed = running.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='Worker stopped while running the job',
+        locked_by='', locked_at=None,
+    )
+    requeued = running.update(
+        status=Job.QUEUED, run_after=timezone.now(),
+        locked_by='', locked_at=None,
+    )
+    return requeued, failed
+
+
+def backoff(attempts):
+    """Return the delay in seconds before retrying after ``attempts``"""
+    delay = min(
+        settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_SECONDS,
+    )
+    # Jitter, so jobs failing together are not retried together.
+    return delay * random.uniform(0.5, 1)
+
+
+class Heartbeat:
+    """Refresh a running job's lock until the block exits"""
+
+    def __init__(self, job):
+        self.job = job
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        from django.db import connection
+
+        try:
+            while not self._stop.wait(settings.JOB_STALE_SECONDS / 3):
+                Job.objects.filter(
+                    pk=self.job.pk, locked_by=self.job.locked_by
+                ).update(locked_at=timezone.now())
+        finally:
+            connection.close()
+
+
+def run(job):
+    """Run a claimed job and record its outcome; return True on success.
+
+    The outcome is only written while the job is still locked by the
+    worker that claimed it: once requeue_stale() unlocked it, the run of
+    the worker claiming it next decides.
+    """
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    start = time.perf_counter()
+    try:
+        func = TASKS.get(job.task) or import_string(job.task)
+        with Heartbeat(job):
+            func(**job.kwargs)
+    except Exception as exc:
+        duration = time.perf_counter() - start
+        error = ''.join(traceback.format_exception(
+            type(exc), exc, exc.__traceback__
+        ))
+        if job.attempts >= job.max_attempts:
+            result = 'failed'
+            written = owned.update(status=Job.FAILED, last_error=error)
+            logger.error('Job %s failed for good: %r', job, exc)
+        else:
+            result = 'retried'
+            delay = backoff(job.attempts)
+            written = owned.update(
+                status=Job.QUEUED, last_error=error,
+                run_after=timezone.now() + datetime.timedelta(seconds=delay),
+            )
+            logger.warning('Job %s failed, retrying in %.0f s: %r',
+                           job, delay, exc)
+    else:
+        duration = time.perf_counter() - start
+        result = 'done'
+        written, _ = owned.delete()
+    if not written:
+        logger.warning('Job %s was given to another worker while running',
+                       job)
+    metrics.inc_counter('jobs_total', task=job.task, result=result)
+    metrics.observe('job_duration_seconds', duration, task=job.task)
+    return result == 'done'
+
+
+def work(worker=None, burst=False, poll_interval=1.0, should_stop=None):
+    """Claim and run jobs; return how many ran.
+
+    Runs until ``should_stop()`` returns True or, with ``burst``, until no
+    job is due.
+    """
+    worker = worker or worker_name()
+    should_stop = should_stop or (lambda: False)
+    done = 0
+    last_stale_check = 0
+    while not should_stop():
+        if time.monotonic() - last_stale_check > settings.JOB_STALE_SECONDS:
+            requeue_stale()
+            last_stale_check = time.monotonic()
+        job = claim(worker)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run(job)
+        done += 1
+    return done
+
+
+def queue_depth():
+    """Return /metrics samples counting jobs by status and readiness"""
+    samples = {}
+    now = timezone.now()
+    try:
+        rows = list(Job.objects.values('status').annotate(
+            count=Count('id'), oldest=Min('run_after'),
+        ))
+        ready = Job.objects.filter(
+            status=Job.QUEUED, run_after__lte=now
+        ).count()
+    except DatabaseError:
+        logger.warning('Could not read the job queue depth', exc_info=True)
+        return samples
+    for status, _ in Job.STATUS_CHOICES:
+        samples[('job_queue_depth', (('status', status),))] = 0
+    for row in rows:
+        samples[('job_queue_depth', (('status', row['status']),))] = (
+            row['count']
+        )
+        if row['status'] == Job.QUEUED:
+            lag = max((now - row['oldest']).total_seconds(), 0)
+            samples[('job_queue_lag_seconds', ())] = lag
+    samples[('job_queue_ready', ())] = ready
+    return samples
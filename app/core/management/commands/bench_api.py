@@ -0,0 +1,258 @@
+"""
+Django command to load test the API endpoints in-process
+"""
+
+import io
+import json
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import numpy as np
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag, Ingredient
+
+BENCH_EMAIL = 'bench-api@example.com'
+BENCH_PASSWORD = 'bench-api-password'
+
+SCENARIOS = (
+    'token',
+    'recipes',
+    'recipe-detail',
+    'tags',
+    'ingredients',
+    'upload-image',
+)
+
+
+class Command(BaseCommand):
+    """Drive each API endpoint through the WSGI handler and time it"""
+    help = 'Report throughput, latency percentiles and queries per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--ingredients', type=int, default=50)
+        parser.add_argument(
+            '--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS,
+        )
+        parser.add_argument(
+            '--output', help='Write the results to this JSON file',
+        )
+        parser.add_argument(
+            '--compare', help='Print the change against a saved JSON file',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+
+        counter = threading.local()
+
+        def count_queries(execute, sql, params, many, context):
+            counter.queries = getattr(counter, 'queries', 0) + 1
+            return execute(sql, params, many, context)
+
+        def on_connect(connection, **kwargs):
+            connection.execute_wrappers.append(count_queries)
+
+        user = self.seed(options)
+        results = {}
+        connection_created.connect(on_connect)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(
+                        MEDIA_ROOT=media_root, ALLOWED_HOSTS=['localhost']
+                    ):
+                for name in options['scenarios']:
+                    results[name] = self.run(
+                        self.scenario(name, user),
+                        counter,
+                        options['requests'],
+                        options['concurrency'],
+                    )
+                    self.report(name, results[name], baseline)
+        finally:
+            connection_created.disconnect(on_connect)
+            get_user_model().objects.filter(email=BENCH_EMAIL).delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'commit': self.commit(),
+                    'options': {
+                        key: options[key] for key in (
+                            'requests', 'concurrency', 'recipes', 'tags',
+                            'ingredients',
+                        )
+                    },
+                    'results': results,
+                }, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def seed(self, options):
+        """Create the benchmark user and their recipes"""
+        get_user_model().objects.filter(email=BENCH_EMAIL).delete()
+        user = get_user_model().objects.create_user(
+            email=BENCH_EMAIL, password=BENCH_PASSWORD,
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag{i}') for i in range(options['tags'])
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'ingredient{i}')
+            for i in range(options['ingredients'])
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'recipe{i}',
+                time_minutes=5 + i % 120,
+                price=Decimal(100 + i % 2000) / 100,
+            )
+            for i in range(options['recipes'])
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for i, recipe in enumerate(recipes)
+            for tag in tags[i % len(tags):][:3]
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe.id, ingredient_id=ingredient.id
+            )
+            for i, recipe in enumerate(recipes)
+            for ingredient in ingredients[i % len(ingredients):][:5]
+        )
+        user.token = Token.objects.create(user=user).key
+        user.recipe_ids = [recipe.id for recipe in recipes]
+        return user
+
+    def scenario(self, name, user):
+        """Return a function building the WSGI environ of request ``i``"""
+        factory = RequestFactory(
+            HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Token {user.token}',
+        )
+
+        def recipe_id(i):
+            return user.recipe_ids[i % len(user.recipe_ids)]
+
+        if name == 'token':
+            return lambda i: RequestFactory(HTTP_HOST='localhost').post(
+                reverse('user:token'),
+                {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD},
+            ).environ
+        if name == 'recipes':
+            return lambda i: factory.get(reverse('recipe:recipe-list')).environ
+        if name == 'recipe-detail':
+            return lambda i: factory.get(
+                reverse('recipe:recipe-detail', args=[recipe_id(i)])
+            ).environ
+        if name == 'tags':
+            return lambda i: factory.get(reverse('recipe:tag-list')).environ
+        if name == 'ingredients':
+            return lambda i: factory.get(
+                reverse('recipe:ingredient-list')
+            ).environ
+
+        image = io.BytesIO()
+        Image.new('RGB', (64, 64)).save(image, format='JPEG')
+        return lambda i: factory.post(
+            reverse('recipe:recipe-upload-image', args=[recipe_id(i)]),
+            {'image': SimpleUploadedFile(
+                'bench.jpg', image.getvalue(), content_type='image/jpeg'
+            )},
+        ).environ
+
+    def run(self, build, counter, requests, concurrency):
+        """Serve ``requests`` requests over ``concurrency`` threads"""
+        handler = WSGIHandler()
+
+        def one(i):
+            environ = build(i)
+            statuses = []
+            counter.queries = 0
+            start = time.perf_counter()
+            response = handler(
+                environ, lambda status, headers: statuses.append(status)
+            )
+            b''.join(response)
+            response.close()
+            elapsed = time.perf_counter() - start
+            return elapsed, counter.queries, statuses[0].startswith('2')
+
+        def close_connections(_):
+            # Once per thread: each waits until all threads got one.
+            barrier.wait()
+            connections.close_all()
+
+        barrier = threading.Barrier(concurrency)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(one, range(requests)))
+            elapsed = time.perf_counter() - start
+            list(pool.map(close_connections, range(concurrency)))
+
+        timings = np.array([sample[0] for sample in samples]) * 1000
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+        return {
+            'requests': requests,
+            'errors': sum(not sample[2] for sample in samples),
+            'requests_per_sec': requests / elapsed,
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'queries_per_request': float(
+                np.mean([sample[1] for sample in samples])
+            ),
+        }
+
+    def report(self, name, result, baseline):
+        """Print one scenario's result and its change from the baseline"""
+        line = (
+            f'{name}: {result["requests_per_sec"]:.0f} requests/sec, '
+            f'p50 {result["p50_ms"]:.1f} ms, p95 {result["p95_ms"]:.1f} ms, '
+            f'p99 {result["p99_ms"]:.1f} ms, '
+            f'{result["queries_per_request"]:.1f} queries/request'
+        )
+        previous = (baseline or {}).get(name)
+        if previous:
+            change = result['p95_ms'] / previous['p95_ms'] - 1
+            line += f' (p95 {change:+.0%} vs baseline)'
+        if result['errors']:
+            self.stdout.write(self.style.ERROR(
+                f'{line}, {result["errors"]} errors'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(line))
+
+    def commit(self):
+        """Return the current git commit, if known"""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,87 @@
+"""
+Django command to measure response compression on recipe payloads
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import compression
+from core.management.commands.bench_json import recipe_list
+from core.renderers import OrjsonRenderer
+
+LEVELS = {'gzip': (1, 6, 9), 'br': (1, 4, 9), 'zstd': (1, 3, 9)}
+
+
+def best_of(repeat, func, *args):
+    """Return the result and fastest time in ms of ``repeat`` calls"""
+    fastest = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    return result, fastest * 1000
+
+
+class Command(BaseCommand):
+    """Compress rendered recipe lists with every installed codec"""
+    help = 'Report compression ratio and CPU time per codec and level'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[10, 100, 1000, 10000],
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--chunk-rows', type=int, default=100,
+            help='Rows per chunk when compressing as a stream',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        renderer = OrjsonRenderer()
+        results = []
+        for rows in options['rows']:
+            data = recipe_list(rows, raw=False)
+            body = renderer.render(data)
+            step = options['chunk_rows']
+            chunks = [
+                renderer.render(data[i:i + step])
+                for i in range(0, rows, step)
+            ]
+            for name, levels in LEVELS.items():
+                for level in levels:
+                    codec = compression.available_codecs(
+                        {name: level}
+                    ).get(name)
+                    if codec is None:
+                        continue
+                    compressed, ms = best_of(
+                        options['repeat'], codec.compress, body
+                    )
+                    streamed, stream_ms = best_of(
+                        options['repeat'],
+                        lambda: b''.join(codec.stream(iter(chunks))),
+                    )
+                    results.append({
+                        'rows': rows,
+                        'codec': name,
+                        'level': level,
+                        'bytes': len(body),
+                        'compressed': len(compressed),
+                        'ratio': round(len(body) / len(compressed), 2),
+                        'compress_ms': round(ms, 3),
+                        'mb_per_s': round(len(body) / ms / 1000, 1),
+                        'streamed': len(streamed),
+                        'stream_ms': round(stream_ms, 3),
+                    })
+                    self.stdout.write(
+                        '{rows:>6} rows {codec:>4}-{level} '
+                        '{bytes:>10} -> {compressed:>9} B  x{ratio:<6} '
+                        '{compress_ms:>8.3f} ms {mb_per_s:>7} MB/s  '
+                        'stream {streamed:>9} B {stream_ms:>8.3f} ms'
+                        .format(**results[-1])
+                    )
+        self.stdout.write(json.dumps(results))
@@ -0,0 +1,68 @@
+"""
+Django command to benchmark per-request database connection handling
+"""
+
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from core.db.pool import pool_stats
+
+
+class Command(BaseCommand):
+    """Compare fresh, persistent and pooled connections"""
+    help = 'Measure simulated requests/sec for each connection strategy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--pool-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+        original = dict(settings_dict)
+        strategies = [
+            ('new connection per request', {'CONN_MAX_AGE': 0, 'POOL': None}),
+            ('persistent connections', {'CONN_MAX_AGE': 60, 'POOL': None}),
+            ('in-process pool', {'CONN_MAX_AGE': 0, 'POOL': {
+                'MAX_SIZE': options['pool_size'], 'TIMEOUT': 30,
+            }}),
+        ]
+        try:
+            for name, overrides in strategies:
+                # Wrappers are created per thread from this shared dict.
+                settings_dict.update(overrides)
+                rate = self.run(options['requests'], options['concurrency'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'{name}: {rate:.0f} requests/sec'
+                ))
+        finally:
+            settings_dict.clear()
+            settings_dict.update(original)
+        for alias, stats in pool_stats().items():
+            self.stdout.write(f'pool {alias}: {stats}')
+
+    def run(self, requests, concurrency):
+        """Run ``requests`` simulated requests over ``concurrency`` threads"""
+        per_thread = max(1, requests // concurrency)
+
+        def worker():
+            for _ in range(per_thread):
+                # The same signals close_old_connections() hooks into.
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                request_finished.send(sender=self.__class__)
+            connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return per_thread * concurrency / (time.perf_counter() - start)
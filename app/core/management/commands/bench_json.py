@@ -0,0 +1,93 @@
+"""
+Django command to compare the JSON renderers and parsers
+"""
+
+import datetime
+import io
+import json
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import OrjsonParser
+from core.renderers import OrjsonRenderer
+
+
+def recipe_list(rows, raw):
+    """Return data shaped like a recipe list response.
+
+    With ``raw``, prices and timestamps are Decimal and datetime objects
+    left to the renderer's encoder instead of strings.
+    """
+    created = datetime.datetime(
+        2021, 6, 1, 12, 30, tzinfo=datetime.timezone.utc
+    )
+    return [
+        OrderedDict([
+            ('id', i),
+            ('title', f'Recipe {i} with a reasonably long title'),
+            ('time_minutes', i % 90),
+            ('price', Decimal(f'{i % 100}.{i % 97:02d}') if raw
+             else f'{i % 100}.{i % 97:02d}'),
+            ('link', f'https://example.com/recipes/{i}'),
+            ('tags', [OrderedDict([('id', t), ('name', f'Tag {t}')])
+                      for t in range(i % 4)]),
+            ('ingredients', [OrderedDict([('id', n), ('name', f'Item {n}')])
+                             for n in range(i % 9)]),
+            ('image', None),
+            ('chef_name', 'Chef'),
+            ('created', created if raw else created.isoformat()),
+        ])
+        for i in range(rows)
+    ]
+
+
+def best_of(repeat, func, *args):
+    """Return the fastest of ``repeat`` calls in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+class Command(BaseCommand):
+    """Time rendering and parsing a recipe list with each implementation"""
+    help = 'Compare the stdlib and orjson JSON renderers and parsers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        rows, repeat = options['rows'], options['repeat']
+        results = {}
+        for shape in ('serialized', 'raw'):
+            data = recipe_list(rows, raw=shape == 'raw')
+            expected = JSONRenderer().render(data)
+            if OrjsonRenderer().render(data) != expected:
+                self.stderr.write(f'{shape}: the renderers differ')
+            for name, renderer in (('json', JSONRenderer()),
+                                   ('orjson', OrjsonRenderer())):
+                results[f'render {shape} {name}'] = best_of(
+                    repeat, renderer.render, data
+                )
+
+        body = JSONRenderer().render(recipe_list(rows, raw=False))
+        for name, parser in (('json', JSONParser()),
+                             ('orjson', OrjsonParser())):
+            results[f'parse {name}'] = best_of(
+                repeat, lambda: parser.parse(io.BytesIO(body))
+            )
+
+        for key, value in results.items():
+            self.stdout.write(f'{key:<28} {value:>9.3f} ms')
+        self.stdout.write(json.dumps(
+            {key: round(value, 3) for key, value in results.items()}
+        ))
@@ -0,0 +1,100 @@
+"""
+Django command to compare startup and request overhead of settings modules
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter per settings module, under -X importtime.
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import RequestFactory
+handler = WSGIHandler()
+startup = time.perf_counter() - start
+
+environ = RequestFactory().get(sys.argv[2], HTTP_HOST='localhost').environ
+def start_response(status, headers, exc_info=None):
+    pass
+for _ in range(50):
+    handler(dict(environ), start_response)
+start = time.perf_counter()
+for _ in range(int(sys.argv[1])):
+    for chunk in handler(dict(environ), start_response):
+        pass
+per_request = (time.perf_counter() - start) / int(sys.argv[1])
+print(json.dumps({
+    'startup_ms': startup * 1000,
+    'request_us': per_request * 1e6,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def import_time_ms(stderr):
+    """Sum the self times of an ``-X importtime`` report"""
+    total = 0
+    for line in stderr.splitlines():
+        if line.startswith('import time:'):
+            self_us = line.split(':', 1)[1].split('|')[0].strip()
+            if self_us.isdigit():
+                total += int(self_us)
+    return total / 1000
+
+
+class Command(BaseCommand):
+    """Measure import time, setup time and per-request overhead"""
+    help = 'Compare startup and request overhead of settings modules'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-modules', nargs='+',
+            default=['app.settings', 'app.settings_api'],
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument(
+            '--path', default='/recipes/',
+            help='Path requested without credentials, so no query is run',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        results = {}
+        for module in options['settings_modules']:
+            runs = [
+                self.probe(module, options['requests'], options['path'])
+                for _ in range(options['runs'])
+            ]
+            # Best of the runs: the least disturbed by the rest of the host.
+            results[module] = {
+                key: round(min(run[key] for run in runs), 3)
+                for key in runs[0]
+            }
+            self.stdout.write(
+                '{:<24} import {import_ms:>8.1f} ms  '
+                'startup {startup_ms:>8.1f} ms  '
+                'request {request_us:>8.1f} us  '
+                'modules {modules:>5}'.format(module, **results[module])
+            )
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def probe(self, module, requests, path):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': module}
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE,
+             str(requests), path],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode:
+            raise CommandError(f'{module} failed:\n{proc.stderr[-2000:]}')
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['import_ms'] = import_time_ms(proc.stderr)
+        return result
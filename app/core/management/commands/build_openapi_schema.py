@@ -0,0 +1,28 @@
+"""
+Django command to prebuild the OpenAPI schema served at /api/schema/
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import write_schema
+
+
+class Command(BaseCommand):
+    """Generate the OpenAPI schema and save it as JSON"""
+    help = 'Write the OpenAPI schema to OPENAPI_SCHEMA_FILE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', help='Write here instead of OPENAPI_SCHEMA_FILE',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        path = options['file'] or settings.OPENAPI_SCHEMA_FILE
+        if not path:
+            raise CommandError('Set OPENAPI_SCHEMA_FILE or pass --file')
+        schema = write_schema(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(schema["paths"])} paths to {path}'
+        ))
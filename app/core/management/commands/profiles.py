@@ -0,0 +1,106 @@
+"""
+Django command to list and summarize captured request profiles
+"""
+
+import io
+import os
+import pstats
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import load_profiles, make_token
+
+
+class Command(BaseCommand):
+    """List, summarize or request profiles of API requests"""
+    help = 'List and summarize profiles captured by core.profiling'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', nargs='?', default='list',
+            choices=['list', 'show', 'token'],
+            help='list profiles, show one, or print an X-Profile token',
+        )
+        parser.add_argument('profile_id', nargs='?')
+        parser.add_argument(
+            '--user', help='Email of the staff user a token is for',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Profiles to list, or functions/stacks to show',
+        )
+        parser.add_argument(
+            '--sort', default='cumulative',
+            help='pstats sort key for pstats profiles',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        if options['action'] == 'token':
+            self.stdout.write(make_token(self.staff_user(options['user'])))
+        elif options['action'] == 'list':
+            self.list_profiles(options['limit'])
+        else:
+            if not options['profile_id']:
+                raise CommandError('show needs a profile id')
+            self.show(options['profile_id'], options['limit'], options['sort'])
+
+    def staff_user(self, email):
+        """Return the staff user with ``email``"""
+        if not email:
+            raise CommandError('token needs --user')
+        user = get_user_model().objects.filter(
+            email=email, is_staff=True
+        ).first()
+        if user is None:
+            raise CommandError(f'No staff user {email}')
+        return user
+
+    def list_profiles(self, limit):
+        """Print the newest profiles, newest first"""
+        profiles = load_profiles(settings.PROFILE_DIR)
+        if not profiles:
+            self.stdout.write(f'No profiles in {settings.PROFILE_DIR}')
+        for meta in reversed(profiles[-limit:]):
+            self.stdout.write(
+                f'{meta["id"]}  {meta["format"]:<9}  '
+                f'{meta["duration_ms"]:>9.1f} ms  {meta["status"]}  '
+                f'{meta["method"]} {meta["path"]}'
+            )
+
+    def show(self, profile_id, limit, sort):
+        """Summarize one profile"""
+        meta = next(
+            (m for m in load_profiles(settings.PROFILE_DIR)
+             if m['id'] == profile_id),
+            None,
+        )
+        if meta is None:
+            raise CommandError(f'No profile {profile_id}')
+        self.stdout.write(
+            f'{meta["method"]} {meta["path"]} -> {meta["status"]} '
+            f'in {meta["duration_ms"]:.1f} ms ({meta["view"]})'
+        )
+        base = os.path.join(settings.PROFILE_DIR, profile_id)
+        if meta['format'] == 'pstats':
+            out = io.StringIO()
+            stats = pstats.Stats(f'{base}.prof', stream=out)
+            stats.strip_dirs().sort_stats(sort).print_stats(limit)
+            self.stdout.write(out.getvalue())
+            return
+
+        stacks = Counter()
+        own = Counter()
+        with open(f'{base}.collapsed') as f:
+            for line in f:
+                stack, count = line.rstrip('\n').rsplit(' ', 1)
+                stacks[stack] += int(count)
+                own[stack.rsplit(';', 1)[-1]] += int(count)
+        total = sum(stacks.values()) or 1
+        self.stdout.write(f'{total} samples; hottest frames (self time):')
+        for frame, count in own.most_common(limit):
+            self.stdout.write(f'{count / total:7.1%}  {frame}')
+        self.stdout.write(f'Collapsed stacks: {base}.collapsed')
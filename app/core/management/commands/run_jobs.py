@@ -0,0 +1,99 @@
+"""
+Django command to run background jobs from the queue
+"""
+
+import os
+import signal
+import time
+import traceback
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Run queued jobs in one or more worker processes"""
+    help = 'Work through the background job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Worker processes to fork, each running one job at a time',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is due instead of waiting for more',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        self.stopping = False
+        self.children = {}
+        previous = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            if options['processes'] <= 1:
+                done = self.work(options)
+                self.stdout.write(f'Ran {done} jobs')
+            else:
+                self.supervise(options)
+                self.stdout.write('Workers stopped')
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def supervise(self, options):
+        """Keep ``--processes`` forked workers running until stopped"""
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        children = self.children
+        while True:
+            while not self.stopping and len(children) < options['processes']:
+                pid = os.fork()
+                if pid == 0:
+                    self.children = {}
+                    status = 0
+                    try:
+                        self.work(options)
+                    except BaseException:
+                        traceback.print_exc()
+                        status = 1
+                    finally:
+                        os._exit(status)
+                children[pid] = time.monotonic()
+            if not children:
+                break
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = children.pop(pid, None)
+            code = os.waitstatus_to_exitcode(status)
+            if options['burst'] and code == 0:
+                # A burst worker exits when the queue is drained.
+                self.stopping = True
+            elif code != 0:
+                self.stderr.write(f'Worker {pid} exited with {code}')
+                if started is not None and time.monotonic() - started < 1:
+                    time.sleep(1)
+
+    def work(self, options):
+        return jobs.work(
+            burst=options['burst'],
+            poll_interval=options['poll_interval'],
+            should_stop=lambda: self.stopping,
+        )
+
+    def stop(self, signum, frame):
+        """Finish the job at hand, then exit; forward to the children"""
+        self.stopping = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
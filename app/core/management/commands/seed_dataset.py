@@ -0,0 +1,156 @@
+"""
+Django command to bulk load a synthetic dataset for scale testing
+"""
+
+import io
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.synthetic import SyntheticDataset, TABLES
+
+EMAIL_DOMAIN = 'synthetic.example.com'
+
+COLUMNS = {
+    'core_user': (
+        'id', 'password', 'is_superuser', 'email', 'name', 'is_active',
+        'is_staff',
+    ),
+    'core_tag': ('id', 'user_id', 'name'),
+    'core_ingredient': ('id', 'user_id', 'name'),
+    'core_recipe': (
+        'id', 'user_id', 'title', 'description', 'time_minutes', 'price',
+        'link', 'image', 'chef_name',
+    ),
+    'core_recipe_tags': ('recipe_id', 'tag_id'),
+    'core_recipe_ingredients': ('recipe_id', 'ingredient_id'),
+}
+
+
+def row_count(rows):
+    """Return the number of rows in a {column: array} mapping"""
+    return len(next(iter(rows.values())))
+
+
+def format_rows(table, rows, password):
+    """Return the rows of a table in COPY text format"""
+    ids = rows.get('id')
+    if table == 'core_user':
+        lines = (
+            f'{i}\t{password}\tf\tuser{i}@{EMAIL_DOMAIN}\tuser{i}\tt\tf'
+            for i in ids.tolist()
+        )
+    elif table in ('core_tag', 'core_ingredient'):
+        prefix = table[len('core_'):]
+        lines = (
+            f'{i}\t{user}\t{prefix}{n}' for i, user, n in zip(
+                ids.tolist(), rows['user_id'].tolist(), rows['name'].tolist()
+            )
+        )
+    elif table == 'core_recipe':
+        lines = (
+            f'{i}\t{user}\trecipe{n}\t\t{minutes}\t{price:.2f}\t\t\t'
+            for i, user, n, minutes, price in zip(
+                ids.tolist(),
+                rows['user_id'].tolist(),
+                rows['title'].tolist(),
+                rows['time_minutes'].tolist(),
+                rows['price'].tolist(),
+            )
+        )
+    else:
+        lines = (
+            f'{a}\t{b}' for a, b in zip(*(
+                rows[column].tolist() for column in COLUMNS[table]
+            ))
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class Command(BaseCommand):
+    """Generate users, recipes, tags, ingredients and links with COPY"""
+    help = 'Bulk load a deterministic, seeded synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--recipes', type=int, default=200_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Power-law exponent of recipes per user',
+        )
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--chunk-users', type=int, default=5_000)
+        parser.add_argument(
+            '--password', default='synthetic',
+            help='Password shared by every generated user',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        dataset = SyntheticDataset(
+            options['users'],
+            options['recipes'],
+            seed=options['seed'],
+            skew=options['skew'],
+            tags_per_recipe=options['tags_per_recipe'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            chunk_users=options['chunk_users'],
+        )
+        # Hashing is deliberately slow; do it once for every user.
+        password = make_password(options['password'])
+        first_ids = self.reserve_ids(dataset.counts())
+
+        totals = dict.fromkeys(TABLES, 0)
+        start = time.perf_counter()
+        for chunk in dataset.chunks(first_ids):
+            with transaction.atomic(), connection.cursor() as cursor:
+                for table in TABLES:
+                    self.copy(cursor, table, chunk[table], password)
+                    totals[table] += row_count(chunk[table])
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{totals["core_user"]} users, '
+                    f'{sum(totals.values())} rows loaded'
+                )
+
+        with connection.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f'ANALYZE {table}')
+        elapsed = time.perf_counter() - start
+        for table, rows in totals.items():
+            self.stdout.write(f'{table}: {rows} rows')
+        rows = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {rows} rows in {elapsed:.1f} s '
+            f'({rows / elapsed * 60:,.0f} rows/minute)'
+        ))
+
+    def reserve_ids(self, counts):
+        """Take a block of ids from each table's sequence"""
+        first_ids = {}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table, count in counts.items():
+                cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id'))",
+                    [table],
+                )
+                first_ids[table] = cursor.fetchone()[0]
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)",
+                    [table, first_ids[table] + max(count, 1) - 1],
+                )
+        return first_ids
+
+    def copy(self, cursor, table, rows, password):
+        """COPY one chunk of a table's rows into the database"""
+        if not row_count(rows):
+            return
+        cursor.copy_expert(
+            f'COPY {table} ({", ".join(COLUMNS[table])}) FROM STDIN',
+            io.StringIO(format_rows(table, rows, password)),
+        )
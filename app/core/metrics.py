@@ -0,0 +1,407 @@
+"""Prometheus metrics aggregated across worker processes
+
+Each process writes its values to its own memory-mapped files in
+settings.METRICS_DIR (counter_<pid>.db and gauge_<pid>.db), so updates
+are a lock and a few bytes written in place. The /metrics view reads
+every file in the directory and sums them: counters and histograms of
+exited workers still count, gauges only for live processes. Reading
+also prunes the files of exited workers, folding their counters into
+the reader's own file. Point METRICS_DIR at a directory shared by the
+workers of one host (the Docker image sets it) and empty it when the
+server starts; when unset, each process uses a private temp directory.
+"""
+
+import fcntl
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+INITIAL_SIZE = 1 << 16
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Jobs range from quick refreshes to purges running for many minutes.
+JOB_DURATION_BUCKETS = (
+    0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0,
+    3600.0,
+)
+
+# (kind, help) by metric family; histograms add their bucket bounds.
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Requests served, by route, method and status',
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Request latency, by route and method',
+        LATENCY_BUCKETS,
+    ),
+    'http_requests_in_progress': (
+        'gauge', 'Requests being served, by route and method',
+    ),
+    'db_queries_total': (
+        'counter', 'Database queries run while serving requests, by route',
+    ),
+    'cache_requests_total': (
+        'counter', 'Cache lookups, by cache and result (hit or miss)',
+    ),
+    'cache_hit_ratio': (
+        'gauge', 'Share of cache lookups that were hits, by cache',
+    ),
+    'jobs_total': (
+        'counter', 'Background jobs run, by task and result',
+    ),
+    'job_duration_seconds': (
+        'histogram', 'Background job run time, by task',
+        JOB_DURATION_BUCKETS,
+    ),
+    'job_queue_depth': (
+        'gauge', 'Background jobs in the queue, by status',
+    ),
+    'job_queue_ready': (
+        'gauge', 'Queued background jobs due to run now',
+    ),
+    'job_queue_lag_seconds': (
+        'gauge', 'How long the oldest due background job has waited',
+    ),
+}
+
+# Functions returning {(name, labels tuple): value} read at scrape time.
+COLLECTORS = []
+
+_queries = ContextVar('request_queries', default=None)
+
+
+def _padded(length):
+    """Return the key size padding the following value to 8 bytes"""
+    return length + (8 - (length + 4) % 8) % 8
+
+
+def _entries(data, used):
+    """Yield (key, value, offset of value) for the entries of a file"""
+    pos = 8
+    while pos < used:
+        length = struct.unpack_from('i', data, pos)[0]
+        key = bytes(data[pos + 4:pos + 4 + length]).decode()
+        pos += 4 + _padded(length)
+        yield key, struct.unpack_from('d', data, pos)[0], pos
+        pos += 8
+
+
+class MmapValues:
+    """Float values by key in a memory-mapped file owned by one process.
+
+    The file starts with the number of bytes in use, followed by entries
+    of a key length, the key and a double. New entries are written before
+    the length is updated, so readers never see a partial entry.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = struct.unpack_from('i', self._map, 0)[0] or 8
+        self._positions = {
+            key: pos for key, _, pos in _entries(self._map, self._used)
+        }
+
+    def add(self, key, amount):
+        """Add ``amount`` to a value, creating it at zero if needed"""
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._append(key)
+            value = struct.unpack_from('d', self._map, pos)[0]
+            struct.pack_into('d', self._map, pos, value + amount)
+
+    def _append(self, key):
+        """Add an entry for ``key`` and return the offset of its value"""
+        encoded = key.encode()
+        size = 4 + _padded(len(encoded)) + 8
+        if self._used + size > len(self._map):
+            new_size = len(self._map)
+            while self._used + size > new_size:
+                new_size *= 2
+            self._map.close()
+            self._file.truncate(new_size)
+            self._map = mmap.mmap(self._file.fileno(), new_size)
+        struct.pack_into(
+            f'i{_padded(len(encoded))}sd', self._map, self._used,
+            len(encoded), encoded, 0.0,
+        )
+        self._used += size
+        struct.pack_into('i', self._map, 0, self._used)
+        self._positions[key] = self._used - 8
+        return self._used - 8
+
+
+def read_values(path):
+    """Yield (key, value) for every entry of a values file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 8:
+        return
+    used = struct.unpack_from('i', data, 0)[0]
+    for key, value, _ in _entries(data, used):
+        yield key, value
+
+
+_store = {}
+_store_lock = threading.Lock()
+
+
+def metrics_dir():
+    """Return the directory metrics files are written to"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if directory:
+        return directory
+    with _store_lock:
+        if 'tempdir' not in _store:
+            _store['tempdir'] = tempfile.mkdtemp(prefix='metrics-')
+    return _store['tempdir']
+
+
+def _values(kind):
+    """Return this process's MmapValues of ``kind`` (counter or gauge)"""
+    directory = metrics_dir()
+    # Keyed by pid too, so forked workers never write the parent's file.
+    key = (kind, os.getpid(), directory)
+    values = _store.get(key)
+    if values is None:
+        with _store_lock:
+            values = _store.get(key)
+            if values is None:
+                os.makedirs(directory, exist_ok=True)
+                values = MmapValues(
+                    os.path.join(directory, f'{kind}_{os.getpid()}.db')
+                )
+                _store[key] = values
+    return values
+
+
+def _key(name, labels):
+    return json.dumps([name, labels], sort_keys=True)
+
+
+def inc_counter(name, amount=1, **labels):
+    """Increase a counter"""
+    _values('counter').add(_key(name, labels), amount)
+
+
+def inc_gauge(name, amount=1, **labels):
+    """Increase (or, with a negative amount, decrease) a gauge"""
+    _values('gauge').add(_key(name, labels), amount)
+
+
+def observe(name, value, **labels):
+    """Record an observation of a histogram registered in METRICS"""
+    buckets = METRICS[name][2]
+    bucket = next((str(b) for b in buckets if value <= b), '+Inf')
+    counters = _values('counter')
+    counters.add(_key(f'{name}_bucket', {**labels, 'le': bucket}), 1)
+    counters.add(_key(f'{name}_sum', labels), value)
+    counters.add(_key(f'{name}_count', labels), 1)
+
+
+def record_cache_lookup(cache, hit):
+    """Count a hit or a miss of a named cache"""
+    inc_counter(
+        'cache_requests_total', cache=cache, result='hit' if hit else 'miss'
+    )
+
+
+@contextmanager
+def counting_queries():
+    """Count the queries run in the enclosed block into a one-item list"""
+    queries = [0]
+    token = _queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _queries.reset(token)
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper counting the queries of the current request"""
+    queries = _queries.get()
+    if queries is not None:
+        queries[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """Add count_query to a connection's execute wrappers once"""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _files(directory):
+    """Yield (path, kind, pid) for the values files in ``directory``"""
+    for path in glob.glob(os.path.join(directory, '*_*.db')):
+        kind, pid = os.path.basename(path)[:-len('.db')].split('_')
+        yield path, kind, int(pid)
+
+
+def _prune_dead(directory):
+    """Remove the files of exited processes, keeping their counters"""
+    for path, kind, pid in _files(directory):
+        if _pid_alive(pid):
+            continue
+        if kind == 'counter':
+            counters = _values('counter')
+            for key, value in read_values(path):
+                counters.add(key, value)
+        os.remove(path)
+
+
+@contextmanager
+def _collect_lock(directory):
+    """Serialize readers, so a pruned file is never counted twice"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'collect.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def collect():
+    """Return {(name, labels tuple): value} summed over every process"""
+    totals = {}
+    directory = metrics_dir()
+    with _collect_lock(directory):
+        _prune_dead(directory)
+        samples = [
+            item for path, _, _ in _files(directory)
+            for item in read_values(path)
+        ]
+    for key, value in samples:
+        name, labels = json.loads(key)
+        sample = (name, tuple(sorted(labels.items())))
+        totals[sample] = totals.get(sample, 0.0) + value
+    return totals
+
+
+def _bound(le, buckets):
+    """Return the bucket of ``buckets`` holding a count recorded at ``le``.
+
+    Counts recorded with other bounds, before the buckets changed, go to
+    the next registered bound up.
+    """
+    if le != '+Inf':
+        for bucket in buckets:
+            if float(le) <= bucket:
+                return str(bucket)
+    return '+Inf'
+
+
+def _cumulative_buckets(totals):
+    """Turn per-bucket histogram counts into cumulative ones"""
+    series = {}
+    for (name, labels), value in list(totals.items()):
+        family = name[:-len('_bucket')]
+        if name.endswith('_bucket') and family in METRICS:
+            del totals[(name, labels)]
+            buckets = METRICS[family][2]
+            le = _bound(dict(labels)['le'], buckets)
+            rest = tuple(item for item in labels if item[0] != 'le')
+            counts = series.setdefault((name, buckets, rest), {})
+            counts[le] = counts.get(le, 0.0) + value
+    for (name, buckets, rest), counts in series.items():
+        running = 0.0
+        for bound in [str(b) for b in buckets] + ['+Inf']:
+            running += counts.get(bound, 0.0)
+            totals[(name, tuple(sorted(rest + (('le', bound),))))] = running
+
+
+def _cache_hit_ratios(totals):
+    """Derive cache_hit_ratio from cache_requests_total"""
+    lookups = {}
+    for (name, labels), value in list(totals.items()):
+        if name == 'cache_requests_total':
+            labels = dict(labels)
+            counts = lookups.setdefault(labels['cache'], [0.0, 0.0])
+            counts[labels['result'] == 'hit'] += value
+    for cache, (misses, hits) in lookups.items():
+        if hits + misses:
+            ratio = hits / (hits + misses)
+            totals[('cache_hit_ratio', (('cache', cache),))] = ratio
+
+
+def _format_value(value):
+    return repr(float(value)) if value % 1 else str(int(value))
+
+
+def _format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(label, str(text).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for label, text in labels
+    )
+
+
+def _sample_order(item):
+    """Sort samples by labels, histogram buckets by their bound"""
+    (name, labels), _ = item
+    rest = tuple(label for label in labels if label[0] != 'le')
+    le = dict(labels).get('le')
+    return rest, float(le) if le is not None else 0.0
+
+
+def register_collector(collector):
+    """Add samples computed by ``collector`` to every scrape"""
+    if collector not in COLLECTORS:
+        COLLECTORS.append(collector)
+
+
+def collect_registered():
+    """Return the samples of every registered collector"""
+    samples = {}
+    for collector in COLLECTORS:
+        samples.update(collector())
+    return samples
+
+
+def render_metrics(samples=None):
+    """Return every metric, plus ``samples``, in the Prometheus format"""
+    totals = collect()
+    _cumulative_buckets(totals)
+    _cache_hit_ratios(totals)
+    totals.update(samples or {})
+
+    lines = []
+    for family, (kind, help_text, *_) in METRICS.items():
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        names = (
+            [f'{family}_bucket', f'{family}_sum', f'{family}_count']
+            if kind == 'histogram' else [family]
+        )
+        for name in names:
+            samples = [item for item in totals.items() if item[0][0] == name]
+            for (_, labels), value in sorted(samples, key=_sample_order):
+                label_text = _format_labels(labels)
+                lines.append(
+                    f'{name}{{{label_text}}} {_format_value(value)}'
+                    if label_text else f'{name} {_format_value(value)}'
+                )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,258 @@
+"""Middleware for the whole project"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+import types
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from . import compression, metrics
+from .timing import collect_timings, current_timings
+
+logger = logging.getLogger('core.timing')
+
+
+class DualModeMiddleware:
+    """Base for middleware that runs natively in sync and async stacks.
+
+    Under ASGI, a single sync-only middleware makes Django run the whole
+    chain in its one thread-sensitive worker, serializing requests. A
+    subclass implements ``call`` and ``acall`` and is awaited directly
+    when the rest of the chain is async; its ``process_*`` hooks are
+    plain functions, run on the event loop rather than in that worker.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # As Django's MiddlewareMixin does, so Django awaits us.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            for name in ('process_view', 'process_template_response'):
+                hook = getattr(self, name, None)
+                if hook is not None:
+                    setattr(self, name, _on_event_loop(hook))
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def acall(self, request):
+        raise NotImplementedError
+
+
+def _on_event_loop(hook):
+    """Wrap a quick sync hook so Django awaits it instead of a thread"""
+
+    async def run(middleware, *args):
+        return hook(*args)
+
+    # Bound, as Django names the middleware after hook.__self__.
+    return types.MethodType(run, hook.__self__)
+
+
+class ServerTimingMiddleware(DualModeMiddleware):
+    """Time a sample of requests and report it in Server-Timing headers.
+
+    Sampled requests get db, auth, serialize, render and total durations
+    in their Server-Timing header; those slower than REQUEST_TIMING_SLOW_MS
+    are logged as JSON along with their slowest queries. Unsampled
+    requests only pay for one context variable lookup per query.
+    """
+
+    def call(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        with collect_timings() as timings:
+            response = self.get_response(request)
+        return self.report(request, response, timings)
+
+    async def acall(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        # The timings context variable follows the request into the
+        # threads sync views run in.
+        with collect_timings() as timings:
+            response = await self.get_response(request)
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        """Add the Server-Timing header; log the request if slow"""
+        response['Server-Timing'] = timings.header()
+        if timings.total * 1000 >= settings.REQUEST_TIMING_SLOW_MS:
+            self.log_slow_request(request, response, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        timings = current_timings()
+        if timings is not None:
+            # Called right before the response is rendered.
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.add('render', time.perf_counter() - start)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def log_slow_request(self, request, response, timings):
+        """Log a slow request with its timings and slowest queries"""
+        record = {
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'timings_ms': {
+                name: round(ms, 3) for name, ms in timings.metrics().items()
+            },
+            'query_count': timings.query_count,
+            'slowest_queries': timings.slowest_queries(),
+        }
+        logger.warning(json.dumps(record), extra={'request_timing': record})
+
+
+class CompressionMiddleware(DualModeMiddleware):
+    """Compress responses with the best coding the client accepts.
+
+    Codings are taken from settings.COMPRESSION_ENCODINGS, most preferred
+    first, among those installed (see core.compression). Only text-like
+    content is compressed, and whole responses only from
+    COMPRESSION_MIN_SIZE bytes; streaming responses are compressed chunk
+    by chunk.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.codecs = compression.available_codecs(
+            settings.COMPRESSION_LEVELS
+        )
+        self.preference = [
+            coding for coding in settings.COMPRESSION_ENCODINGS
+            if coding in self.codecs
+        ]
+
+    def call(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def acall(self, request):
+        response = await self.get_response(request)
+        if (response.streaming
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return self.compress(request, response)
+        # Off the event loop; zlib, brotli and zstd release the GIL.
+        return await sync_to_async(self.compress, thread_sensitive=False)(
+            request, response
+        )
+
+    def compress(self, request, response):
+        """Compress a response if the client and its content allow"""
+        if (response.has_header('Content-Encoding')
+                or not compression.is_compressible(
+                    response.get('Content-Type', ''))
+                or 'no-transform' in response.get('Cache-Control', '')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        coding = compression.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), self.preference
+        )
+        if coding is None:
+            return response
+
+        codec = self.codecs[coding]
+        if response.streaming:
+            response.streaming_content = codec.stream(
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            compressed = codec.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The body changed, so a strong ETag no longer holds.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
+
+
+class MetricsMiddleware(DualModeMiddleware):
+    """Count, time and track in-flight requests for the /metrics view"""
+
+    def call(self, request):
+        start = time.perf_counter()
+        with metrics.counting_queries() as queries:
+            try:
+                response = self.get_response(request)
+            finally:
+                self.finished(request)
+        return self.record(request, response, start, queries)
+
+    async def acall(self, request):
+        start = time.perf_counter()
+        # Queries run in sync views' threads count into the same list.
+        with metrics.counting_queries() as queries:
+            try:
+                response = await self.get_response(request)
+            finally:
+                self.finished(request)
+        return self.record(request, response, start, queries)
+
+    def finished(self, request):
+        """Take a request out of the in-flight gauge"""
+        labels = getattr(request, '_metrics_labels', None)
+        if labels is not None:
+            metrics.inc_gauge('http_requests_in_progress', -1, **labels)
+
+    def record(self, request, response, start, queries):
+        """Count and time a served request"""
+        duration = time.perf_counter() - start
+        route = _route(request)
+        metrics.inc_counter(
+            'http_requests_total', route=route, method=request.method,
+            status=str(response.status_code),
+        )
+        metrics.observe(
+            'http_request_duration_seconds', duration,
+            route=route, method=request.method,
+        )
+        if queries[0]:
+            metrics.inc_counter('db_queries_total', queries[0], route=route)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The route is only known once the URL has been resolved.
+        request._metrics_labels = {
+            'route': _route(request), 'method': request.method,
+        }
+        metrics.inc_gauge(
+            'http_requests_in_progress', **request._metrics_labels
+        )
+
+
+def _route(request):
+    """Return the URL name of the view serving a request"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
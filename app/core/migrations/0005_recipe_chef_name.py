@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:31
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_auto_20230925_1539'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='chef_name',
+            field=models.CharField(blank=True, max_length=255, validators=[django.core.validators.RegexValidator('^[a-zA-Z]+$')]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:12
+
+from django.db import migrations
+
+# Indexes serving the admin's prefix searches, which filter on
+# UPPER(column::text) LIKE 'PREFIX%' whatever the database collation.
+# Built CONCURRENTLY, outside a transaction, so writes go on meanwhile.
+INDEXES = [
+    ('core_user', 'email', 'user_email_upper_idx'),
+    ('core_recipe', 'title', 'recipe_title_upper_idx'),
+    ('core_tag', 'name', 'tag_name_upper_idx'),
+    ('core_ingredient', 'name', 'ingredient_name_upper_idx'),
+]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_user_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX CONCURRENTLY {name} ON {table} '
+                f'((UPPER({column}::text)) text_pattern_ops);',
+            reverse_sql=f'DROP INDEX CONCURRENTLY {name};',
+        )
+        for table, column, name in INDEXES
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPurge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(unique=True)),
+                ('email', models.EmailField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('recipes_deleted', models.BigIntegerField(default=0)),
+                ('tags_deleted', models.BigIntegerField(default=0)),
+                ('ingredients_deleted', models.BigIntegerField(default=0)),
+                ('images_deleted', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userpurge',
+            index=models.Index(fields=['status', 'updated_at'], name='userpurge_status_idx'),
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:55
+
+from django.db import migrations, models
+
+# The change sequence is the writing transaction's 64-bit id, so a sync
+# can resume from the oldest transaction its snapshot could not see.
+# Its indexes on the existing tables are built concurrently by 0014.
+CURRENT_SEQ = 'pg_current_xact_id()::text::bigint'
+
+FUNCTIONS = f"""
+CREATE FUNCTION core_set_change_seq() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_seq := {CURRENT_SEQ};
+    RETURN NEW;
+END $$;
+
+CREATE FUNCTION core_record_tombstones() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO core_tombstone (user_id, kind, object_id, change_seq, deleted_at)
+    SELECT user_id, TG_ARGV[0], id, {CURRENT_SEQ}, now() FROM changed_rows;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION core_touch_linked_recipes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Once per recipe and transaction, however many links change.
+    UPDATE core_recipe SET change_seq = {CURRENT_SEQ}
+    WHERE id IN (SELECT recipe_id FROM changed_rows)
+    AND change_seq <> {CURRENT_SEQ};
+    RETURN NULL;
+END $$;
+"""
+
+DROP_FUNCTIONS = """
+DROP FUNCTION core_touch_linked_recipes();
+DROP FUNCTION core_record_tombstones();
+DROP FUNCTION core_set_change_seq();
+"""
+
+SYNCED_TABLES = [
+    ('core_recipe', 'recipe'),
+    ('core_tag', 'tag'),
+    ('core_ingredient', 'ingredient'),
+]
+
+LINK_TABLES = ['core_recipe_tags', 'core_recipe_ingredients']
+
+
+def synced_table_triggers(table, kind):
+    return migrations.RunSQL(
+        sql=f"""
+        CREATE TRIGGER {table}_change_seq
+        BEFORE INSERT OR UPDATE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION core_set_change_seq();
+
+        CREATE TRIGGER {table}_tombstones
+        AFTER DELETE ON {table} REFERENCING OLD TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION core_record_tombstones('{kind}');
+        """,
+        reverse_sql=f"""
+        DROP TRIGGER {table}_tombstones ON {table};
+        DROP TRIGGER {table}_change_seq ON {table};
+        """,
+    )
+
+
+def link_table_triggers(table):
+    return migrations.RunSQL(
+        sql=f"""
+        CREATE TRIGGER {table}_added
+        AFTER INSERT ON {table} REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION core_touch_linked_recipes();
+
+        CREATE TRIGGER {table}_removed
+        AFTER DELETE ON {table} REFERENCING OLD TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION core_touch_linked_recipes();
+        """,
+        reverse_sql=f"""
+        DROP TRIGGER {table}_removed ON {table};
+        DROP TRIGGER {table}_added ON {table};
+        """,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('recipe', 'Recipe'), ('tag', 'Tag'), ('ingredient', 'Ingredient')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user_id', 'change_seq'], name='tombstone_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ),
+        migrations.RunSQL(sql=FUNCTIONS, reverse_sql=DROP_FUNCTIONS),
+        *(synced_table_triggers(table, kind) for table, kind in SYNCED_TABLES),
+        *(link_table_triggers(table) for table in LINK_TABLES),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:40
+
+from django.db import migrations
+
+# Tells LISTENing event streams (recipe.events) whose data changed: one
+# NOTIFY per user and statement, so bulk writes (seeding, purges) queue
+# a handful of notifications rather than one per row. A transaction
+# sending the same payload many times delivers it once. Transition
+# tables allow one event per trigger.
+FUNCTION = """
+CREATE FUNCTION core_notify_changes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('recipe_changes', owner || ':' || TG_ARGV[0])
+    FROM (SELECT DISTINCT user_id AS owner FROM changed_rows) owners;
+    RETURN NULL;
+END $$;
+"""
+
+NOTIFYING_TABLES = [
+    ('core_recipe', 'recipe'),
+    ('core_tag', 'tag'),
+    ('core_ingredient', 'ingredient'),
+]
+
+EVENTS = [
+    ('inserted', 'INSERT', 'NEW'),
+    ('updated', 'UPDATE', 'NEW'),
+    ('deleted', 'DELETE', 'OLD'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_change_sync'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=FUNCTION, reverse_sql='DROP FUNCTION core_notify_changes();'
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=f"""
+            CREATE TRIGGER {table}_notify_{name}
+            AFTER {event} ON {table} REFERENCING {rows} TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION core_notify_changes('{kind}');
+            """,
+            reverse_sql=f'DROP TRIGGER {table}_notify_{name} ON {table};',
+        )
+        for table, kind in NOTIFYING_TABLES
+        for name, event, rows in EVENTS
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Recipes show the names of their tags and ingredients (recipe.fragments),
+# so renaming one is a change to every recipe linked to it. Transition
+# tables cannot be combined with UPDATE OF <column>, hence the name check.
+CURRENT_SEQ = 'pg_current_xact_id()::text::bigint'
+
+RENAMED_TABLES = [
+    ('core_tag', 'core_recipe_tags', 'tag_id'),
+    ('core_ingredient', 'core_recipe_ingredients', 'ingredient_id'),
+]
+
+
+def renamed_triggers(table, link_table, link_column):
+    return migrations.RunSQL(
+        sql=f"""
+        CREATE FUNCTION {table}_touch_renamed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE core_recipe SET change_seq = {CURRENT_SEQ}
+            WHERE id IN (
+                SELECT link.recipe_id FROM {link_table} link
+                JOIN new_rows ON new_rows.id = link.{link_column}
+                JOIN old_rows ON old_rows.id = new_rows.id
+                WHERE new_rows.name IS DISTINCT FROM old_rows.name
+            )
+            AND change_seq <> {CURRENT_SEQ};
+            RETURN NULL;
+        END $$;
+
+        CREATE TRIGGER {table}_renamed
+        AFTER UPDATE ON {table}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {table}_touch_renamed();
+        """,
+        reverse_sql=f"""
+        DROP TRIGGER {table}_renamed ON {table};
+        DROP FUNCTION {table}_touch_renamed();
+        """,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_change_notify'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeFragment',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fragment', serialize=False, to='core.recipe')),
+                ('change_seq', models.BigIntegerField()),
+                ('list_json', models.BinaryField()),
+                ('detail_json', models.BinaryField()),
+            ],
+        ),
+    ] + [
+        renamed_triggers(table, link_table, link_column)
+        for table, link_table, link_column in RENAMED_TABLES
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:55
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes for the change_seq columns of 0011, built without blocking
+    # writes; kept apart so 0011's schema and triggers stay atomic.
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_recipefragment'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'change_seq'], name='ingredient_user_change_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'change_seq'], name='recipe_user_change_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(fields=['user', 'change_seq'], name='tag_user_change_idx'),
+        ),
+    ]
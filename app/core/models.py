@@ -4,7 +4,8 @@ import uuid
 from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser,
-    BaseUserManager
+    BaseUserManager,
+    PermissionsMixin,
 )
 from django.db import models
 from django.core.validators import RegexValidator
@@ -40,7 +41,7 @@ class UserManager(BaseUserManager):
         return user
 
 
-class User(AbstractBaseUser):
+class User(AbstractBaseUser, PermissionsMixin):
     """ Model user in the system"""
     email = models.EmailField(max_length=255, unique=True)
     name = models.CharField(max_length=255)
@@ -67,8 +68,17 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file)
     chef_name = models.CharField(max_length=255, blank=True, validators=[RegexValidator(r'^[a-zA-Z]+$')])
+    # Set by a database trigger on every write; see recipe.sync.
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'change_seq'], name='recipe_user_change_idx'),
+        ]
 
-    
     def __str__(self):
         return self.title
 
@@ -80,6 +90,13 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=255)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='tag_user_id_idx'),
+            models.Index(fields=['user', 'change_seq'], name='tag_user_change_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -92,6 +109,131 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=255)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='ingredient_user_id_idx'),
+            models.Index(fields=['user', 'change_seq'], name='ingredient_user_change_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class RecipeFragment(models.Model):
+    """Recipe pre-rendered as JSON for list and detail responses"""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fragment',
+    )
+    # The recipe's change_seq when rendered; see recipe.fragments.
+    change_seq = models.BigIntegerField()
+    list_json = models.BinaryField()
+    detail_json = models.BinaryField()
+
+    def __str__(self):
+        return f'Fragment of recipe #{self.recipe_id}'
+
+
+class Tombstone(models.Model):
+    """Deleted recipe, tag or ingredient, kept for clients to sync"""
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = [
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    ]
+
+    # Written by database triggers, possibly while the user is deleted.
+    user_id = models.BigIntegerField()
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', 'change_seq'], name='tombstone_user_change_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.object_id}'
+
+
+class UserPurge(models.Model):
+    """Deletion of a user's data, run in batches by a worker"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # No foreign key: the record outlives the user it purged.
+    user_id = models.BigIntegerField(unique=True)
+    email = models.EmailField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    recipes_deleted = models.BigIntegerField(default=0)
+    tags_deleted = models.BigIntegerField(default=0)
+    ingredients_deleted = models.BigIntegerField(default=0)
+    images_deleted = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='userpurge_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.email} ({self.status})'
+
+
+class Job(models.Model):
+    """Background job waiting in or taken from the queue in core.jobs"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Serves the workers' claim query, and only covers queued jobs.
+            models.Index(
+                fields=['-priority', 'run_after', 'id'],
+                name='job_queued_idx',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(fields=['status', 'locked_at'], name='job_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk} ({self.status})'
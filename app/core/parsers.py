@@ -0,0 +1,39 @@
+"""JSON parsing with orjson, giving the same data as DRF's parser
+
+OrjsonParser parses UTF-8 request bodies with orjson. Bodies orjson
+rejects or would read differently (integers over 64 bits become floats
+in orjson) are parsed by rest_framework's JSONParser, which also
+produces the usual ParseError for invalid JSON.
+"""
+
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import DIGITS_TO_ZERO, OrjsonRenderer, orjson
+
+# Digits of an integer orjson may not read as an int (over 64 bits).
+BIG_INTEGER = b'0' * 19
+
+
+class OrjsonParser(JSONParser):
+    """Parser reading JSON with orjson"""
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if (orjson is None or not self.strict
+                or encoding.lower().replace('-', '') != 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if BIG_INTEGER not in body.translate(DIGITS_TO_ZERO):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(
+            io.BytesIO(body), media_type, parser_context
+        )
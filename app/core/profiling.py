@@ -0,0 +1,217 @@
+"""On-demand profiling of individual API requests
+
+DRF views using ProfilingMixin profile a request when it carries an
+X-Profile header signed for the requesting user (see ``manage.py
+profiles token``) or is picked by random sampling at
+settings.PROFILE_SAMPLE_RATE. Depending on
+settings.PROFILE_MODE a request runs under cProfile, saved as pstats, or
+under a stack sampler, saved as collapsed stacks for flamegraph tools.
+Profiles go to settings.PROFILE_DIR, which keeps only the newest
+settings.PROFILE_MAX_FILES of them.
+"""
+
+import cProfile
+import functools
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+
+HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'core.profiling'
+
+
+def make_token(user):
+    """Return a signed value for the X-Profile header of ``user``"""
+    return signing.dumps({'user': user.pk}, salt=TOKEN_SALT)
+
+
+def _token_user(token):
+    """Return the id of the user a token was signed for, or None"""
+    try:
+        payload = signing.loads(
+            token, salt=TOKEN_SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return payload.get('user') if isinstance(payload, dict) else None
+
+
+def should_profile(request):
+    """Return True if a request asked for, or was sampled for, profiling"""
+    token = request.META.get(HEADER)
+    if token:
+        return _token_user(token) is not None
+    return random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def token_matches_user(request):
+    """Return False if a request's token is for another user than its own.
+
+    Only known once the view has authenticated the request.
+    """
+    token = request.META.get(HEADER)
+    if not token:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and _token_user(token) == user.pk
+
+
+class StackSampler:
+    """Count the stacks of one thread, sampled from a background thread"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        target = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run, args=(target,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self, target):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} '
+                    f'({_short_path(code.co_filename)}:{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Return the samples in the collapsed stack format"""
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(path):
+    """Strip sys.path prefixes from a source file path"""
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and path.startswith(prefix + os.sep):
+            return path[len(prefix) + 1:]
+    return path
+
+
+def profile_call(func, *args, **kwargs):
+    """Call ``func`` under the configured profiler.
+
+    Return its result and the profile data, a pstats-dumpable profiler or
+    a collapsed stacks string.
+    """
+    if settings.PROFILE_MODE == 'sampling':
+        sampler = StackSampler(settings.PROFILE_SAMPLING_INTERVAL_MS / 1000)
+        with sampler:
+            result = func(*args, **kwargs)
+        return result, sampler.collapsed()
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    return result, profiler
+
+
+def save_profile(data, meta):
+    """Store a profile and its metadata, dropping the oldest; return its id"""
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f'{time.time_ns()}-{os.getpid()}'
+    base = os.path.join(directory, profile_id)
+    if isinstance(data, str):
+        meta['format'] = 'collapsed'
+        with open(f'{base}.collapsed', 'w') as f:
+            f.write(data)
+    else:
+        meta['format'] = 'pstats'
+        data.dump_stats(f'{base}.prof')
+    # Metadata last: a profile is listed once its data is complete.
+    with open(f'{base}.json', 'w') as f:
+        json.dump({'id': profile_id, **meta}, f)
+    _prune(directory, settings.PROFILE_MAX_FILES)
+    return profile_id
+
+
+def _prune(directory, keep):
+    """Delete all but the newest ``keep`` profiles"""
+    paths = list_profile_paths(directory)
+    for meta_path in paths[:max(len(paths) - keep, 0)]:
+        base = meta_path[:-len('.json')]
+        for path in (meta_path, f'{base}.prof', f'{base}.collapsed'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def list_profile_paths(directory):
+    """Return the metadata files of stored profiles, oldest first"""
+    return sorted(
+        glob.glob(os.path.join(directory, '*.json')),
+        key=lambda path: int(os.path.basename(path).split('-')[0]),
+    )
+
+
+def load_profiles(directory):
+    """Return the metadata of stored profiles, oldest first"""
+    profiles = []
+    for path in list_profile_paths(directory):
+        try:
+            with open(path) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+class ProfilingMixin:
+    """Profile a DRF view's requests on demand.
+
+    The profile covers rendering the response too. A request with a token
+    of another user is run under the profiler but its profile discarded.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not should_profile(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        start = time.perf_counter()
+        response, data = profile_call(
+            self._dispatch_rendered, request, *args, **kwargs
+        )
+        if not token_matches_user(request):
+            return response
+        profile_id = save_profile(data, {
+            'method': request.method,
+            'path': request.path,
+            'view': type(self).__name__,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            'created': time.time(),
+        })
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def _dispatch_rendered(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
@@ -0,0 +1,79 @@
+"""JSON rendering with orjson, byte for byte the same as DRF's renderer
+
+OrjsonRenderer writes exactly what rest_framework's JSONRenderer writes
+for the default settings (compact, unicode, strict): types orjson has
+no or a different encoding for (Decimal, datetimes, lazy strings, ...)
+go through DRF's JSONEncoder.default, and output orjson would format
+differently (non-string keys, integers over 64 bits, floats in exponent
+notation) is rendered by the stdlib instead. Indented output, non
+default JSON settings and a missing orjson all use JSONRenderer itself.
+The one difference: a NaN or infinite float is written as null, where
+JSONRenderer raises ValueError.
+"""
+
+import math
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+
+
+def has_exponent_floats(ret):
+    """Return True if orjson may have formatted a float unlike the stdlib.
+
+    orjson writes 1e16 and 0.00001 where the stdlib writes 1e+16 and
+    1e-05. Matches inside strings give false positives, which only cost
+    rendering with the stdlib.
+    """
+    if b'0.0000' in ret:
+        return True
+    digits = ret.translate(DIGITS_TO_ZERO)
+    return b'0e0' in digits or b'0e-' in digits
+
+
+class OrjsonRenderer(JSONRenderer):
+    """Renderer serializing to JSON with orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or not self.strict
+                or self.get_indent(
+                    accepted_media_type, renderer_context or {}
+                ) is not None):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        default = self.encoder_class().default
+
+        def encode(obj):
+            value = default(obj)
+            # orjson writes NaN as null, so leave it to the stdlib to refuse.
+            if isinstance(value, float) and not math.isfinite(value):
+                raise ValueError(value)
+            return value
+
+        try:
+            ret = orjson.dumps(data, default=encode, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            ret = None
+        if ret is None or has_exponent_floats(ret):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # JSONRenderer escapes these to keep the output valid javascript.
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(
+                '\u2028'.encode(), b'\\u2028'
+            ).replace('\u2029'.encode(), b'\\u2029')
+        return ret
@@ -0,0 +1,79 @@
+"""OpenAPI schema generated once per deploy instead of per request
+
+The schema is read from settings.OPENAPI_SCHEMA_FILE when that file
+exists (``manage.py build_openapi_schema`` writes it at build time) and
+generated on first use otherwise. It is then kept in memory, along with
+each rendering of it and their ETags, until the process restarts.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from drf_spectacular.settings import spectacular_settings
+
+_lock = threading.Lock()
+_schema = None
+_renderings = {}
+
+
+def generate_schema():
+    """Introspect the API and return its OpenAPI schema"""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        urlconf=spectacular_settings.SERVE_URLCONF
+    )
+    return generator.get_schema(
+        request=None, public=spectacular_settings.SERVE_PUBLIC
+    )
+
+
+def write_schema(path):
+    """Generate the schema and write it to ``path`` as JSON"""
+    schema = generate_schema()
+    directory = os.path.dirname(os.path.abspath(path))
+    # Replace the file atomically; workers may be reading it.
+    with tempfile.NamedTemporaryFile(
+        'w', dir=directory, suffix='.tmp', delete=False
+    ) as f:
+        json.dump(schema, f)
+    os.replace(f.name, path)
+    return schema
+
+
+def get_schema():
+    """Return the schema, loading or generating it on first use"""
+    global _schema
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                path = settings.OPENAPI_SCHEMA_FILE
+                if path and os.path.exists(path):
+                    with open(path) as f:
+                        _schema = json.load(f)
+                else:
+                    _schema = generate_schema()
+    return _schema
+
+
+def get_rendered_schema(renderer, renderer_context):
+    """Return (content, etag) of the schema rendered by ``renderer``"""
+    key = (type(renderer), renderer.media_type)
+    rendered = _renderings.get(key)
+    if rendered is None:
+        content = renderer.render(
+            get_schema(), renderer.media_type, renderer_context
+        )
+        etag = '"{}"'.format(hashlib.sha256(content).hexdigest()[:32])
+        rendered = _renderings.setdefault(key, (content, etag))
+    return rendered
+
+
+def clear_schema_cache():
+    """Forget the schema, so it is loaded or generated again"""
+    global _schema
+    with _lock:
+        _schema = None
+        _renderings.clear()
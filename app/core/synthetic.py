@@ -0,0 +1,157 @@
+"""Deterministic synthetic dataset for scale testing
+
+Rows are generated column-wise with numpy in chunks of users, so memory
+stays flat however large the dataset. Recipes are spread over users with
+a power law (a few tenants own a large share of them) and each user's
+tags and ingredients are used with a power law too, so some are on most
+of that user's recipes and most are rare.
+"""
+
+import numpy as np
+
+TABLES = (
+    'core_user',
+    'core_tag',
+    'core_ingredient',
+    'core_recipe',
+    'core_recipe_tags',
+    'core_recipe_ingredients',
+)
+
+
+def power_law_weights(n, exponent, rng):
+    """Return shuffled weights proportional to 1 / rank ** exponent"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def power_law_index(sizes, rng):
+    """Draw an index in [0, size) for each size, favouring low indexes"""
+    # Log-uniform draws: P(k) is proportional to log((k + 2) / (k + 1)).
+    return np.minimum(
+        np.floor(sizes ** rng.random(len(sizes))).astype(np.int64) - 1,
+        sizes - 1,
+    )
+
+
+def local_index(counts):
+    """Number items 0..count-1 within each consecutive group"""
+    starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(starts, counts)
+
+
+class SyntheticDataset:
+    """Plan of a synthetic dataset; iterate it to generate the rows"""
+
+    def __init__(self, users, recipes, seed=0, skew=1.1,
+                 tags_per_recipe=3, ingredients_per_recipe=8,
+                 max_tags=200, max_ingredients=1000, chunk_users=5000):
+        self.seed = seed
+        self.tags_per_recipe = tags_per_recipe
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.chunk_users = chunk_users
+
+        rng = np.random.default_rng([seed, 0])
+        self.recipe_counts = rng.multinomial(
+            recipes, power_law_weights(users, skew, rng)
+        )
+        vocabulary = np.sqrt(self.recipe_counts)
+        self.tag_counts = np.clip(
+            np.ceil(vocabulary * 2), tags_per_recipe, max_tags
+        ).astype(np.int64)
+        self.ingredient_counts = np.clip(
+            np.ceil(vocabulary * 6), ingredients_per_recipe, max_ingredients
+        ).astype(np.int64)
+
+    def counts(self):
+        """Return the number of rows of each table with an id column"""
+        return {
+            'core_user': len(self.recipe_counts),
+            'core_tag': int(self.tag_counts.sum()),
+            'core_ingredient': int(self.ingredient_counts.sum()),
+            'core_recipe': int(self.recipe_counts.sum()),
+        }
+
+    def chunks(self, first_ids):
+        """Yield {table: {column: array}} for each chunk of users.
+
+        ``first_ids`` maps each table in counts() to the id its first
+        generated row gets; ids are then consecutive.
+        """
+        offsets = {table: first_ids[table] for table in first_ids}
+        for lo in range(0, len(self.recipe_counts), self.chunk_users):
+            hi = min(lo + self.chunk_users, len(self.recipe_counts))
+            rng = np.random.default_rng([self.seed, 1, lo])
+            chunk = self._chunk(rng, lo, hi, offsets)
+            for table in offsets:
+                offsets[table] += len(chunk[table]['id'])
+            yield chunk
+
+    def _chunk(self, rng, lo, hi, offsets):
+        """Generate the rows of users lo..hi"""
+        user_ids = offsets['core_user'] + np.arange(hi - lo)
+        tag_counts = self.tag_counts[lo:hi]
+        ingredient_counts = self.ingredient_counts[lo:hi]
+        recipe_counts = self.recipe_counts[lo:hi]
+
+        tags = self._names(offsets['core_tag'], user_ids, tag_counts)
+        ingredients = self._names(
+            offsets['core_ingredient'], user_ids, ingredient_counts
+        )
+
+        n_recipes = int(recipe_counts.sum())
+        recipe_ids = offsets['core_recipe'] + np.arange(n_recipes)
+        recipe_users = np.repeat(np.arange(hi - lo), recipe_counts)
+        recipes = {
+            'id': recipe_ids,
+            'user_id': user_ids[recipe_users],
+            'title': local_index(recipe_counts),
+            'time_minutes': rng.integers(5, 240, n_recipes),
+            'price': np.clip(
+                np.round(rng.lognormal(2.3, 0.8, n_recipes), 2), 0.5, 999.99
+            ),
+        }
+
+        tag_starts = offsets['core_tag'] + np.cumsum(tag_counts) - tag_counts
+        ingredient_starts = offsets['core_ingredient'] + \
+            np.cumsum(ingredient_counts) - ingredient_counts
+        return {
+            'core_user': {'id': user_ids},
+            'core_tag': tags,
+            'core_ingredient': ingredients,
+            'core_recipe': recipes,
+            'core_recipe_tags': self._links(
+                rng, recipe_ids, recipe_users, tag_starts, tag_counts,
+                self.tags_per_recipe, 'tag_id',
+            ),
+            'core_recipe_ingredients': self._links(
+                rng, recipe_ids, recipe_users, ingredient_starts,
+                ingredient_counts, self.ingredients_per_recipe,
+                'ingredient_id',
+            ),
+        }
+
+    @staticmethod
+    def _names(first_id, user_ids, counts):
+        """Return the rows of a tag or ingredient table"""
+        return {
+            'id': first_id + np.arange(counts.sum()),
+            'user_id': np.repeat(user_ids, counts),
+            'name': local_index(counts),
+        }
+
+    @staticmethod
+    def _links(rng, recipe_ids, recipe_users, starts, counts, mean, column):
+        """Return the M2M rows linking recipes to their user's items"""
+        per_recipe = np.minimum(
+            rng.poisson(max(mean - 1, 0), len(recipe_ids)) + 1,
+            counts[recipe_users],
+        )
+        link_users = np.repeat(recipe_users, per_recipe)
+        items = starts[link_users] + power_law_index(
+            counts[link_users], rng
+        )
+        # Repeated draws would violate the through table's unique key.
+        stride = int(items.max(initial=0)) + 1
+        pairs = np.unique(np.repeat(recipe_ids, per_recipe) * stride + items)
+        return {'recipe_id': pairs // stride, column: pairs % stride}
@@ -1,10 +1,13 @@
 """Test for the django admin modifiications"""
+from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 from django.test import Client
 
+from core.models import Recipe, Tag, UserPurge
+
 
 class AdminSiteTests(TestCase):
     """"Test for Django admin"""
@@ -44,3 +47,86 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+
+class ScalableAdminTests(TestCase):
+    """Test the recipe, tag and ingredient admin pages"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='123456789',
+        )
+        self.client.force_login(self.admin_user)
+        self.tag = Tag.objects.create(user=self.admin_user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.admin_user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        self.recipe.tags.add(self.tag)
+
+    def test_change_form_uses_autocomplete(self):
+        """Test the recipe form does not list every tag and ingredient"""
+        Tag.objects.create(user=self.admin_user, name='Unrelated')
+        url = reverse('admin:core_recipe_change', args=[self.recipe.id])
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'admin-autocomplete')
+        self.assertContains(res, 'Vegan')
+        self.assertNotContains(res, 'Unrelated')
+
+    def test_changelist_counts_are_capped(self):
+        """Test searches count no further than ADMIN_EXACT_COUNT_LIMIT"""
+        for i in range(3):
+            Tag.objects.create(user=self.admin_user, name=f'Vegetable {i}')
+        url = reverse('admin:core_tag_changelist')
+
+        with self.settings(ADMIN_EXACT_COUNT_LIMIT=2):
+            res = self.client.get(url, {'q': 'veg'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.context['cl'].result_count, 2)
+
+    def test_delete_in_batches(self):
+        """Test the bulk delete action deletes the selection in batches"""
+        tags = [
+            Tag.objects.create(user=self.admin_user, name=f'Tag {i}')
+            for i in range(5)
+        ]
+        url = reverse('admin:core_tag_changelist')
+
+        with self.settings(ADMIN_ACTION_BATCH_SIZE=2):
+            res = self.client.post(url, {
+                'action': 'delete_in_batches',
+                '_selected_action': [tag.id for tag in tags],
+            })
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(
+            list(Tag.objects.values_list('name', flat=True)), ['Vegan']
+        )
+
+    def test_delete_user_is_deferred(self):
+        """Test deleting a user deactivates them and queues a purge"""
+        user = get_user_model().objects.create_user(
+            email='leaving@example.com', password='testpass123',
+        )
+        Recipe.objects.create(
+            user=user, title='Stew', time_minutes=5, price=Decimal('1.00'),
+        )
+        url = reverse('admin:core_user_delete', args=[user.id])
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, 'Stew')
+
+        res = self.client.post(url, {'post': 'yes'})
+        self.assertEqual(res.status_code, 302)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+        self.assertTrue(UserPurge.objects.filter(user_id=user.id).exists())
+        self.assertTrue(Recipe.objects.filter(user=user).exists())
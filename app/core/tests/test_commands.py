@@ -2,12 +2,22 @@
 Test custom Django commands
 """
 
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.db.models import F
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from core.models import Recipe, Tag, Ingredient
+from core.synthetic import SyntheticDataset
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -33,3 +43,83 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class SeedDatasetCommandTests(TestCase):
+    """Test the synthetic dataset loader"""
+
+    def test_seed_dataset_loads_consistent_rows(self):
+        """Test the loaded rows match the plan and users can log in"""
+        dataset = SyntheticDataset(50, 400, seed=3)
+
+        call_command(
+            'seed_dataset', users=50, recipes=400, seed=3, chunk_users=20,
+            password='shared-pass', stdout=StringIO(),
+        )
+
+        counts = dataset.counts()
+        self.assertEqual(get_user_model().objects.count(), counts['core_user'])
+        self.assertEqual(Recipe.objects.count(), 400)
+        self.assertEqual(Tag.objects.count(), counts['core_tag'])
+        self.assertEqual(Ingredient.objects.count(), counts['core_ingredient'])
+        user = get_user_model().objects.first()
+        self.assertTrue(user.check_password('shared-pass'))
+        # Links never cross tenants.
+        self.assertFalse(Recipe.tags.through.objects.exclude(
+            tag__user=F('recipe__user')
+        ).exists())
+        self.assertFalse(Recipe.ingredients.through.objects.exclude(
+            ingredient__user=F('recipe__user')
+        ).exists())
+        # Ids come from the sequences, so the ORM can keep inserting.
+        Recipe.objects.create(
+            user=user, title='After', time_minutes=5, price=Decimal('1.00')
+        )
+
+    def test_synthetic_dataset_deterministic(self):
+        """Test the same seed generates the same rows"""
+        first_ids = dict.fromkeys(SyntheticDataset(30, 300).counts(), 1)
+
+        def rows(seed):
+            return [
+                {table: {c: a.tolist() for c, a in chunk[table].items()}
+                 for table in chunk}
+                for chunk in SyntheticDataset(30, 300, seed=seed)
+                .chunks(first_ids)
+            ]
+
+        self.assertEqual(rows(1), rows(1))
+        self.assertNotEqual(rows(1), rows(2))
+
+
+class BenchApiCommandTests(TransactionTestCase):
+    """Test the API load test, whose requests run on other threads"""
+
+    def test_bench_api_writes_results(self):
+        """Test every scenario runs cleanly and is written out as JSON"""
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        output = os.path.join(tempdir.name, 'bench.json')
+
+        call_command(
+            'bench_api', requests=4, concurrency=2, recipes=5, tags=2,
+            ingredients=3, output=output, stdout=StringIO(),
+        )
+
+        with open(output) as f:
+            data = json.load(f)
+        self.assertEqual(data['options'], {
+            'requests': 4, 'concurrency': 2, 'recipes': 5, 'tags': 2,
+            'ingredients': 3,
+        })
+        self.assertEqual(set(data['results']), {
+            'token', 'recipes', 'recipe-detail', 'tags', 'ingredients',
+            'upload-image',
+        })
+        for name, result in data['results'].items():
+            self.assertEqual(result['requests'], 4, name)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['queries_per_request'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'], name)
+        # The benchmark user and their recipes are removed afterwards.
+        self.assertFalse(get_user_model().objects.exists())
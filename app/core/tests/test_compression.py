@@ -0,0 +1,189 @@
+"""
+Test negotiated response compression
+"""
+
+import gzip
+import json
+import threading
+import unittest
+import zlib
+from unittest import mock
+
+from asgiref.sync import SyncToAsync, async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import compression
+from core.middleware import CompressionMiddleware
+
+BODY = json.dumps(
+    [{'id': i, 'title': 'Soup', 'tags': [{'name': 'Vegan'}]}
+     for i in range(200)]
+).encode()
+
+
+@override_settings(
+    COMPRESSION_ENCODINGS=['zstd', 'br', 'gzip'], COMPRESSION_MIN_SIZE=1024
+)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test the compression middleware"""
+
+    def respond(self, response, accept='gzip, deflate'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip_json(self):
+        """Test JSON is gzipped with a weak ETag and a Vary header"""
+        response = HttpResponse(BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+
+        res = self.respond(response)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertEqual(res['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_not_compressed(self):
+        """Test small, packed, refused or already encoded bodies are kept"""
+        encoded = HttpResponse(BODY, content_type='text/plain')
+        encoded['Content-Encoding'] = 'br'
+        cases = [
+            (HttpResponse(b'{}', content_type='application/json'), 'gzip'),
+            (HttpResponse(BODY, content_type='image/jpeg'), 'gzip'),
+            (HttpResponse(BODY, content_type='application/json'),
+             'gzip;q=0, identity'),
+            (HttpResponse(BODY, content_type='application/json'), ''),
+            (encoded, 'gzip'),
+        ]
+        for response, accept in cases:
+            content = response.content
+            with self.subTest(type=response['Content-Type'], accept=accept):
+                res = self.respond(response, accept)
+                self.assertEqual(res.content, content)
+                self.assertNotEqual(res.get('Content-Encoding'), 'gzip')
+
+    def test_streaming_chunks_flushed(self):
+        """Test each streamed chunk can be decoded as soon as it arrives"""
+        chunks = [b'[', BODY, b',', BODY, b']']
+        response = StreamingHttpResponse(
+            iter(chunks), content_type='application/json'
+        )
+
+        res = self.respond(response)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        decoder = zlib.decompressobj(31)
+        decoded = []
+        for part in res.streaming_content:
+            decoded.append(decoder.decompress(part))
+        self.assertEqual(b''.join(decoded), b''.join(chunks))
+        self.assertEqual(decoded[0], b'[')
+
+    def test_async_response(self):
+        """Test responses of an async stack are compressed too"""
+        async def get_response(request):
+            return HttpResponse(BODY, content_type='application/json')
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        res = async_to_sync(CompressionMiddleware(get_response))(request)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+
+    def test_async_stack(self):
+        """Test no project middleware forces ASGI into a sync worker"""
+        chain = ASGIHandler()._middleware_chain
+
+        self.assertNotIsInstance(chain, SyncToAsync)
+
+    def test_preferred_installed_coding(self):
+        """Test q values and server preference pick among installed codings"""
+        preference = ['zstd', 'br', 'gzip']
+        self.assertEqual(
+            compression.negotiate('gzip, br, zstd', preference), 'zstd'
+        )
+        self.assertEqual(
+            compression.negotiate('gzip, br;q=0.5', preference), 'gzip'
+        )
+        self.assertEqual(compression.negotiate('*', preference), 'zstd')
+        self.assertIsNone(compression.negotiate('deflate', preference))
+
+        with mock.patch.object(compression, 'brotli', None), \
+                mock.patch.object(compression, 'zstandard', None):
+            res = self.respond(
+                HttpResponse(BODY, content_type='application/json'),
+                'zstd, br, gzip;q=0.1',
+            )
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+
+class CodecTests(SimpleTestCase):
+    """Test each codec round-trips whole and streamed bodies"""
+
+    def assertRoundTrip(self, codec, decompress, decoder):
+        self.assertEqual(decompress(codec.compress(BODY)), BODY)
+
+        chunks = [b'[', BODY, b',', BODY, b']']
+        decoded = [decoder(part) for part in codec.stream(iter(chunks))]
+        self.assertEqual(b''.join(decoded), b''.join(chunks))
+        self.assertEqual(decoded[0], b'[')
+
+    def test_gzip(self):
+        """Test the gzip codec"""
+        self.assertRoundTrip(
+            compression.GzipCodec(6), gzip.decompress,
+            zlib.decompressobj(31).decompress,
+        )
+
+    @unittest.skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli(self):
+        """Test the brotli codec"""
+        self.assertRoundTrip(
+            compression.BrotliCodec(4), compression.brotli.decompress,
+            compression.brotli.Decompressor().process,
+        )
+
+    @unittest.skipUnless(compression.zstandard, 'zstandard is not installed')
+    def test_zstd(self):
+        """Test the zstd codec, also from several threads at once"""
+        zstandard = compression.zstandard
+        codec = compression.ZstdCodec(3)
+        self.assertRoundTrip(
+            codec, zstandard.ZstdDecompressor().decompress,
+            zstandard.ZstdDecompressor().decompressobj().decompress,
+        )
+
+        results = []
+
+        def compress():
+            for _ in range(50):
+                results.append(codec.compress(BODY))
+
+        threads = [threading.Thread(target=compress) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        decompress = zstandard.ZstdDecompressor().decompress
+        self.assertEqual(len(results), 200)
+        self.assertTrue(all(decompress(data) == BODY for data in results))
+
+
+class CompressedApiTests(SimpleTestCase):
+    """Test API responses are compressed end to end"""
+
+    def test_schema_revalidates_with_weak_etag(self):
+        """Test the compressed schema's weak ETag still gets a 304"""
+        url = reverse('schema') + '?format=json'
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertTrue(res['ETag'].startswith('W/'))
+
+        res = self.client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(res.status_code, 304)
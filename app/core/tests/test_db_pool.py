@@ -0,0 +1,103 @@
+"""
+Test the database connection pool and health checks
+"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+def fake_connect():
+    """Return a stand-in for a raw DB-API connection"""
+    conn = MagicMock()
+    conn.closed = 0
+    return conn
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the in-process connection pool"""
+
+    def test_reuses_released_connections(self):
+        """Test a released connection is handed out again"""
+        pool = ConnectionPool(fake_connect, max_size=2)
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['size'], 1)
+        self.assertEqual(pool.stats()['acquired_total'], 2)
+
+    def test_acquire_times_out_when_exhausted(self):
+        """Test acquiring from a full pool raises after the timeout"""
+        pool = ConnectionPool(fake_connect, max_size=1, timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts_total'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread receives a connection once released"""
+        pool = ConnectionPool(fake_connect, max_size=1, timeout=5)
+        conn = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(pool.acquire())
+        )
+        waiter.start()
+        pool.release(conn)
+        waiter.join()
+
+        self.assertEqual(acquired, [conn])
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_discard_frees_slot(self):
+        """Test discarding a broken connection lets a new one open"""
+        pool = ConnectionPool(fake_connect, max_size=1, timeout=0.01)
+        conn = pool.acquire()
+        conn.closed = 1
+        pool.release(conn)
+
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['size'], 1)
+
+
+class HealthCheckTests(TransactionTestCase):
+    """Test persistent connections are checked before reuse"""
+
+    def setUp(self):
+        persistent = {'CONN_MAX_AGE': 60, 'POOL': None}
+        patcher = patch.dict(connection.settings_dict, persistent)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(connection.close)
+        connection.close()
+
+    def test_dead_connection_replaced(self):
+        """Test a connection that fails the health check is reopened"""
+        connection.ensure_connection()
+        stale = connection.connection
+        connection.close_if_unusable_or_obsolete()
+
+        with patch.object(connection, 'is_usable', return_value=False):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        self.assertIsNot(connection.connection, stale)
+
+    def test_health_checked_once_per_request(self):
+        """Test the check runs only on the first query of a request"""
+        connection.ensure_connection()
+        connection.close_if_unusable_or_obsolete()
+
+        with patch.object(connection, 'is_usable') as usable:
+            usable.return_value = True
+            for _ in range(3):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+
+        usable.assert_called_once()
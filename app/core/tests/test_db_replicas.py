@@ -0,0 +1,109 @@
+"""
+Test read-replica routing and read-your-writes pinning
+"""
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.db.replicas import ReplicaRouter, _replica_reads
+from core.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'cache_table',
+}}
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], CACHES=SHARED_CACHES)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the database router"""
+
+    def setUp(self) -> None:
+        self.router = ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        """Test reads outside replica-enabled views use the primary"""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_reads_use_replica_when_enabled(self):
+        """Test reads go to a replica while replica reads are enabled"""
+        token = _replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica1')
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            _replica_reads.reset(token)
+
+    def test_replicas_not_migrated(self):
+        """Test migrations only run on the primary"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+    def test_replicas_need_shared_cache(self):
+        """Test replicas with a per-process cache are refused"""
+        local = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}
+        with override_settings(CACHES=local), \
+                self.assertRaises(ImproperlyConfigured):
+            ReplicaRouter()
+
+
+# The test database stands in for the replica; routing is observed by
+# counting replica picks.
+@override_settings(DATABASE_REPLICAS=['default'])
+@patch('core.db.replicas.random.choice', side_effect=lambda dbs: dbs[0])
+class ReplicaReadMixinTests(TestCase):
+    """Test which API requests are served from replicas"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_safe_reads_use_replica(self, choice):
+        """Test recipe reads are served from a replica"""
+        self.client.get(RECIPE_URL)
+        self.assertGreater(choice.call_count, 0)
+
+    def test_reads_after_write_use_primary(self, choice):
+        """Test a user's reads stay on the primary after they write"""
+        self.client.post(RECIPE_URL, {
+            'title': 'Soup', 'time_minutes': 10, 'price': '2.00',
+            'chef_name': 'Chef',
+        })
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(choice.call_count, 0)
+        self.assertEqual([r['title'] for r in res.data], ['Soup'])
+
+        cache.clear()
+        self.client.get(RECIPE_URL)
+        self.assertGreater(choice.call_count, 0)
+
+    def test_pin_is_per_user(self, choice):
+        """Test another user's write does not pin this user"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass1234',
+        )
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+        other_client.patch(ME_URL, {'name': 'Other'})
+
+        self.client.get(RECIPE_URL)
+
+        self.assertGreater(choice.call_count, 0)
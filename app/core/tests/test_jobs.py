@@ -0,0 +1,184 @@
+"""
+Test the background job queue and its worker
+"""
+
+import datetime
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job, Tag
+
+calls = []
+
+
+@jobs.task
+def record(value):
+    """Task remembering its calls in this process"""
+    calls.append(value)
+
+
+@jobs.task
+def explode():
+    """Task that always fails"""
+    raise RuntimeError('boom')
+
+
+@jobs.task
+def tag_user(user_id, name):
+    """Task with a side effect visible to other processes"""
+    Tag.objects.create(user_id=user_id, name=name)
+
+
+class JobQueueTests(TestCase):
+    """Test queueing, claiming and running jobs"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_priority_then_age_order(self):
+        """Test urgent jobs run first and scheduled ones wait"""
+        record.enqueue(value='old')
+        record.enqueue(value='later', delay=3600)
+        jobs.enqueue(f'{__name__}.record', priority=5, value='urgent')
+        record.enqueue(value='new')
+
+        self.assertEqual(jobs.work(burst=True), 3)
+
+        self.assertEqual(calls, ['urgent', 'old', 'new'])
+        self.assertEqual(
+            list(Job.objects.values_list('kwargs', flat=True)),
+            [{'value': 'later'}],
+        )
+
+    @override_settings(JOB_RETRY_BASE_SECONDS=10, JOB_RETRY_MAX_SECONDS=15)
+    def test_retry_with_backoff_then_fail(self):
+        """Test failures are retried later, then kept as failed"""
+        job = jobs.enqueue(f'{__name__}.explode', max_attempts=3)
+
+        for attempt, delay in ((1, 10), (2, 15)):
+            before = timezone.now()
+            with self.assertLogs('core.jobs', 'WARNING'):
+                self.assertFalse(jobs.run(jobs.claim('test')))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('RuntimeError: boom', job.last_error)
+            wait = (job.run_after - before).total_seconds()
+            self.assertTrue(delay / 2 <= wait <= delay + 1, wait)
+            self.assertIsNone(jobs.claim('test'))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.run(jobs.claim('test')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_stale_jobs_requeued(self):
+        """Test jobs of a dead worker are run again, or fail when spent"""
+        retried = record.enqueue(value='retried')
+        spent = jobs.enqueue(f'{__name__}.record', max_attempts=1, value=1)
+        jobs.claim('dead')
+        jobs.claim('dead')
+        Job.objects.update(
+            locked_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), (1, 1))
+
+        retried.refresh_from_db()
+        spent.refresh_from_db()
+        self.assertEqual(retried.status, Job.QUEUED)
+        self.assertEqual(spent.status, Job.FAILED)
+
+    def test_outcome_kept_from_taken_over_job(self):
+        """Test a stalled worker leaves a job it lost to another alone"""
+        done = record.enqueue(value='done')
+        failed = jobs.enqueue(f'{__name__}.explode', max_attempts=1)
+        for job in (jobs.claim('stalled'), jobs.claim('stalled')):
+            Job.objects.filter(pk=job.pk).update(locked_by='other')
+            with self.assertLogs('core.jobs', 'WARNING') as logs:
+                jobs.run(job)
+            self.assertIn('given to another worker', logs.output[-1])
+
+        for job in (done, failed):
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.RUNNING)
+            self.assertEqual(job.locked_by, 'other')
+
+    def test_requeued_job_not_finished_by_stalled_worker(self):
+        """Test a requeued job waiting for a new worker is left alone"""
+        done = record.enqueue(value='done')
+        retried = jobs.enqueue(f'{__name__}.explode', max_attempts=3)
+        claimed = [jobs.claim('stalled'), jobs.claim('stalled')]
+        Job.objects.update(
+            locked_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        self.assertEqual(jobs.requeue_stale(), (2, 0))
+
+        for job in claimed:
+            with self.assertLogs('core.jobs', 'WARNING') as logs:
+                jobs.run(job)
+            self.assertIn('given to another worker', logs.output[-1])
+
+        for job in (done, retried):
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertEqual(job.locked_by, '')
+            self.assertEqual(job.last_error, '')
+            self.assertLessEqual(job.run_after, timezone.now())
+
+    def test_queue_depth_metrics(self):
+        """Test /metrics reports the queue depth and job outcomes"""
+        with tempfile.TemporaryDirectory() as directory, \
+                self.settings(METRICS_DIR=directory):
+            record.enqueue(value=1)
+            record.enqueue(value=2, delay=60)
+            jobs.enqueue(f'{__name__}.explode', max_attempts=1)
+            with self.assertLogs('core.jobs', 'ERROR'):
+                jobs.work(burst=True)
+
+            res = self.client.get(reverse('metrics'))
+
+        text = res.content.decode()
+        self.assertIn('job_queue_depth{status="queued"} 1', text)
+        self.assertIn('job_queue_depth{status="failed"} 1', text)
+        self.assertIn('job_queue_ready 0', text)
+        self.assertIn(
+            f'jobs_total{{result="done",task="{__name__}.record"}} 1', text
+        )
+
+    def test_queue_depth_without_database(self):
+        """Test /metrics still renders when the queue cannot be read"""
+        with mock.patch.object(
+            Job.objects, 'values', side_effect=jobs.DatabaseError
+        ), self.assertLogs('core.jobs', 'WARNING'):
+            self.assertEqual(jobs.queue_depth(), {})
+
+
+class WorkerProcessesTests(TransactionTestCase):
+    """Test several worker processes share the queue"""
+
+    def test_each_job_runs_once(self):
+        """Test SKIP LOCKED hands every job to exactly one process"""
+        user = get_user_model().objects.create_user(
+            email='worker@example.com', password='testpass123',
+        )
+        for i in range(30):
+            tag_user.enqueue(user_id=user.id, name=f'tag {i}')
+
+        call_command(
+            'run_jobs', processes=3, burst=True, poll_interval=0.01,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+
+        names = list(Tag.objects.values_list('name', flat=True))
+        self.assertEqual(sorted(names), sorted(f'tag {i}' for i in range(30)))
+        self.assertFalse(Job.objects.exists())
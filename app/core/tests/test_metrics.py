@@ -0,0 +1,238 @@
+"""
+Test the multi-process metrics and the /metrics endpoint
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import (
+    AsyncClient, SimpleTestCase, TestCase, override_settings,
+)
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+
+METRICS_URL = reverse('metrics')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def write_from_child():
+    """Update metrics from another process, then exit"""
+    metrics.inc_counter('http_requests_total', 3, route='a')
+    metrics.inc_gauge('http_requests_in_progress', route='a')
+
+
+class MetricsStoreTests(SimpleTestCase):
+    """Test the memory-mapped metrics store"""
+
+    def setUp(self) -> None:
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.settings = override_settings(METRICS_DIR=tempdir.name)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.dir = tempdir.name
+
+    def test_values_survive_growth_and_reopen(self):
+        """Test the file grows as needed and is read back intact"""
+        path = os.path.join(self.dir, 'counter_1.db')
+        values = metrics.MmapValues(path)
+        for i in range(5000):
+            values.add(f'key{i}', i)
+        values.add('key7', 1)
+
+        read = dict(metrics.read_values(path))
+        self.assertEqual(len(read), 5000)
+        self.assertEqual(read['key7'], 8)
+        self.assertEqual(read['key4999'], 4999)
+
+        reopened = metrics.MmapValues(path)
+        reopened.add('key7', 1)
+        self.assertEqual(dict(metrics.read_values(path))['key7'], 9)
+
+    def test_aggregates_across_processes(self):
+        """Test counters are summed and dead processes' gauges dropped"""
+        metrics.inc_counter('http_requests_total', 2, route='a')
+        metrics.inc_gauge('http_requests_in_progress', route='a')
+        child = multiprocessing.get_context('fork').Process(
+            target=write_from_child
+        )
+        child.start()
+        child.join()
+
+        totals = metrics.collect()
+
+        self.assertEqual(
+            totals[('http_requests_total', (('route', 'a'),))], 5
+        )
+        self.assertEqual(
+            totals[('http_requests_in_progress', (('route', 'a'),))], 1
+        )
+
+    def test_prunes_dead_processes(self):
+        """Test files of exited processes are removed, counters kept"""
+        metrics.inc_counter('http_requests_total', 2, route='a')
+        child = multiprocessing.get_context('fork').Process(
+            target=write_from_child
+        )
+        child.start()
+        child.join()
+
+        metrics.collect()
+        totals = metrics.collect()
+
+        self.assertEqual(
+            sorted(os.listdir(self.dir)),
+            ['collect.lock', f'counter_{os.getpid()}.db'],
+        )
+        self.assertEqual(
+            totals[('http_requests_total', (('route', 'a'),))], 5
+        )
+        self.assertNotIn(('http_requests_in_progress', (('route', 'a'),)),
+                         totals)
+
+    def test_histogram_and_cache_ratio(self):
+        """Test histogram buckets are cumulative and ratios derived"""
+        metrics.observe('http_request_duration_seconds', 0.02, route='a')
+        metrics.observe('http_request_duration_seconds', 3, route='a')
+        metrics.record_cache_lookup('feature_index', hit=True)
+        metrics.record_cache_lookup('feature_index', hit=True)
+        metrics.record_cache_lookup('feature_index', hit=False)
+
+        text = metrics.render_metrics()
+
+        self.assertIn(
+            'http_request_duration_seconds_bucket{le="0.01",route="a"} 0',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{le="0.025",route="a"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{le="+Inf",route="a"} 2',
+            text,
+        )
+        self.assertIn('http_request_duration_seconds_count{route="a"} 2', text)
+        self.assertIn(
+            'cache_hit_ratio{cache="feature_index"} 0.6666666666666666', text
+        )
+
+    def test_histogram_buckets_per_family(self):
+        """Test each histogram is exported with its own buckets"""
+        metrics.observe('job_duration_seconds', 90, task='purge')
+        metrics.observe('job_duration_seconds', 7200, task='purge')
+        # Counted before the job buckets changed: 10 s is no bound now.
+        metrics.inc_counter(
+            'job_duration_seconds_bucket', task='purge', le='10.0'
+        )
+
+        text = metrics.render_metrics()
+
+        for le, count in (('5.0', 0), ('15.0', 1), ('60.0', 1),
+                          ('120.0', 2), ('3600.0', 2), ('+Inf', 3)):
+            self.assertIn(
+                f'job_duration_seconds_bucket{{le="{le}",task="purge"}} '
+                f'{count}',
+                text,
+            )
+        self.assertNotIn('le="10.0"', text)
+
+
+class MetricsEndpointTests(TestCase):
+    """Test requests are reported by the /metrics endpoint"""
+
+    def setUp(self) -> None:
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.settings = override_settings(METRICS_DIR=tempdir.name)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_metrics(self):
+        """Test request counts, latency, in-flight and query counts"""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        text = res.content.decode()
+        self.assertIn(
+            'http_requests_total{method="GET",route="recipe:recipe-list",'
+            'status="200"} 2',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",'
+            'route="recipe:recipe-list"} 2',
+            text,
+        )
+        self.assertIn(
+            'http_requests_in_progress{method="GET",'
+            'route="recipe:recipe-list"} 0',
+            text,
+        )
+        # The /metrics request itself is still in flight.
+        self.assertIn(
+            'http_requests_in_progress{method="GET",route="metrics"} 1', text
+        )
+        self.assertRegex(
+            text, r'db_queries_total\{route="recipe:recipe-list"\} [1-9]'
+        )
+
+    def test_scrape_restricted(self):
+        """Test only allowed addresses or the token may scrape metrics"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(res.status_code, 403)
+
+        with override_settings(METRICS_TOKEN='s3cret'):
+            res = self.client.get(
+                METRICS_URL, REMOTE_ADDR='203.0.113.5',
+                HTTP_AUTHORIZATION='Bearer wrong',
+            )
+            self.assertEqual(res.status_code, 403)
+            res = self.client.get(
+                METRICS_URL, REMOTE_ADDR='203.0.113.5',
+                HTTP_AUTHORIZATION='Bearer s3cret',
+            )
+            self.assertEqual(res.status_code, 200)
+
+    def test_async_request_metrics(self):
+        """Test requests served by the ASGI handler are recorded too"""
+        token = Token.objects.create(user=self.user)
+
+        async def get():
+            return await AsyncClient().get(
+                RECIPE_URL, authorization=f'Token {token.key}',
+            )
+
+        res = async_to_sync(get)()
+
+        self.assertEqual(res.status_code, 200)
+        text = self.client.get(METRICS_URL).content.decode()
+        self.assertIn(
+            'http_requests_total{method="GET",route="recipe:recipe-list",'
+            'status="200"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_requests_in_progress{method="GET",'
+            'route="recipe:recipe-list"} 0',
+            text,
+        )
+        self.assertRegex(
+            text, r'db_queries_total\{route="recipe:recipe-list"\} [1-9]'
+        )
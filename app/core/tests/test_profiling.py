@@ -0,0 +1,109 @@
+"""
+Test on-demand request profiling
+"""
+
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.profiling import load_profiles, make_token
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ProfilingTests(TestCase):
+    """Test requests are profiled on demand and stored"""
+
+    def setUp(self) -> None:
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.dir = tempdir.name
+        self.settings = override_settings(
+            PROFILE_DIR=self.dir, PROFILE_SAMPLE_RATE=0, PROFILE_MAX_FILES=3,
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass1234',
+            is_staff=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_signed_header_profiles_request(self):
+        """Test a valid X-Profile token stores a pstats profile"""
+        out = StringIO()
+        call_command('profiles', 'token', user=self.user.email, stdout=out)
+        token = out.getvalue().strip()
+        res = self.client.get(RECIPE_URL, HTTP_X_PROFILE=token)
+
+        profile_id = res['X-Profile-Id']
+        self.assertTrue(
+            os.path.exists(os.path.join(self.dir, f'{profile_id}.prof'))
+        )
+        [meta] = load_profiles(self.dir)
+        self.assertEqual(meta['path'], RECIPE_URL)
+        self.assertEqual(meta['view'], 'RecipeViewSets')
+
+        out = StringIO()
+        call_command('profiles', 'show', profile_id, stdout=out)
+        self.assertIn('function calls', out.getvalue())
+        # The response is rendered inside the profiled block.
+        self.assertIn('render', out.getvalue())
+
+    def test_unsigned_or_unsampled_not_profiled(self):
+        """Test forged tokens and unsampled requests are not profiled"""
+        res = self.client.get(RECIPE_URL, HTTP_X_PROFILE='forged')
+        self.assertNotIn('X-Profile-Id', res)
+        res = self.client.get(RECIPE_URL)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(load_profiles(self.dir), [])
+
+    def test_token_of_other_user_not_profiled(self):
+        """Test a token only profiles requests of the user it was made for"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass1234',
+        )
+
+        res = self.client.get(RECIPE_URL, HTTP_X_PROFILE=make_token(other))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(load_profiles(self.dir), [])
+
+    def test_token_only_for_staff(self):
+        """Test tokens are only printed for existing staff users"""
+        self.user.is_staff = False
+        self.user.save()
+
+        for options in ({}, {'user': self.user.email}):
+            with self.assertRaises(CommandError):
+                call_command('profiles', 'token', **options)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_MODE='sampling')
+    def test_sampling_ring_buffer(self):
+        """Test sampled profiles keep only the newest few"""
+        ids = [self.client.get(TAGS_URL)['X-Profile-Id'] for _ in range(5)]
+
+        profiles = load_profiles(self.dir)
+        self.assertEqual([p['id'] for p in profiles], ids[-3:])
+        self.assertEqual(profiles[0]['format'], 'collapsed')
+        self.assertEqual(
+            sorted(os.listdir(self.dir)),
+            sorted(f'{i}.{ext}' for i in ids[-3:]
+                   for ext in ('json', 'collapsed')),
+        )
+
+        out = StringIO()
+        call_command('profiles', stdout=out)
+        self.assertEqual(out.getvalue().count(TAGS_URL), 3)
@@ -0,0 +1,114 @@
+"""
+Test the orjson renderer and parser match DRF's JSON ones
+"""
+
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from core.parsers import OrjsonParser
+from core.renderers import OrjsonRenderer
+
+UTC = datetime.timezone.utc
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+
+PAYLOADS = [
+    None,
+    [],
+    {'price': Decimal('5.00'), 'cost': Decimal('0.10')},
+    [Decimal('12345.67'), Decimal('1E+2'), Decimal('-0.5'), Decimal('1E-7')],
+    {
+        'aware': datetime.datetime(2021, 6, 1, 12, 30, 5, 123456, UTC),
+        'offset': datetime.datetime(2021, 6, 1, 12, 30, tzinfo=IST),
+        'naive': datetime.datetime(2021, 6, 1, 12, 30, 5, 999),
+        'now': timezone.now(),
+        'date': datetime.date(2021, 6, 1),
+        'time': datetime.time(8, 15, 0, 250000),
+        'duration': datetime.timedelta(days=1, seconds=3, microseconds=5),
+    },
+    [0.1, 1.5, 100.0, -0.0, 1e15, 1e16, 1e22, 1e-4, 1e-5, 2.5e-7, 5e-324],
+    [0, -1, 2 ** 63 - 1, 2 ** 64, -(2 ** 70)],
+    {2: 'int key', None: 'none key', True: 'bool key', 1.5: 'float'},
+    ['line\u2028separator', 'para\u2029graph', 'é 😀 \x00\x1f\x7f "\\\n\t'],
+    {'uuid': uuid.UUID(int=7), 'lazy': gettext_lazy('Recipes')},
+    ReturnList([ReturnDict({'id': 1, 'title': 'Soup'}, serializer=None)],
+               serializer=None),
+    {'nested': {'tuple': (1, 2), 'set': {3}, 'bytes': b'raw'}},
+]
+
+
+class OrjsonRendererTests(SimpleTestCase):
+    """Test OrjsonRenderer output is byte for byte JSONRenderer's"""
+
+    def test_same_bytes(self):
+        """Test every payload renders identically"""
+        for data in PAYLOADS:
+            with self.subTest(data=data):
+                self.assertEqual(
+                    OrjsonRenderer().render(data),
+                    JSONRenderer().render(data),
+                )
+
+    def test_recipe_list_skips_json_renderer(self):
+        """Test a typical response is rendered by orjson alone"""
+        data = [{'id': i, 'title': 'Soup', 'price': Decimal('5.00'),
+                 'tags': [{'id': 1, 'name': 'Vegan'}], 'image': None}
+                for i in range(3)]
+        expected = JSONRenderer().render(data)
+        with mock.patch.object(JSONRenderer, 'render') as render:
+            self.assertEqual(OrjsonRenderer().render(data), expected)
+        render.assert_not_called()
+
+    def test_indent_uses_json_renderer(self):
+        """Test indented output, which orjson cannot match, is unchanged"""
+        data = {'a': [1, {'b': Decimal('2.50')}]}
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            OrjsonRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_non_finite_decimals_refused(self):
+        """Test a NaN Decimal raises like in strict JSON"""
+        for value in (Decimal('NaN'), Decimal('Infinity')):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    OrjsonRenderer().render([value])
+
+
+class OrjsonParserTests(SimpleTestCase):
+    """Test OrjsonParser reads bodies like JSONParser"""
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json')
+
+    def test_same_data(self):
+        """Test bodies parse to equal data of the same types"""
+        bodies = [
+            b'{"title": "Soup", "price": "5.00", "tags": [{"name": "a"}]}',
+            b'[1, -0, 1.5, 1e400, 12345678901234567890123, "\\u00e9"]',
+            b'"\\ud800"',
+            '{"name": "é 😀"}'.encode(),
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                expected = self.parse(JSONParser(), body)
+                parsed = self.parse(OrjsonParser(), body)
+                self.assertEqual(repr(parsed), repr(expected))
+
+    def test_invalid_json(self):
+        """Test invalid and non-standard JSON raise ParseError"""
+        for body in (b'{"a": ', b'[NaN]', b'\xff', b'\xef\xbb\xbf{}'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError):
+                    self.parse(OrjsonParser(), body)
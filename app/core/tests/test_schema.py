@@ -0,0 +1,62 @@
+"""
+Test the cached OpenAPI schema endpoint
+"""
+
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import schema
+
+SCHEMA_URL = reverse('schema')
+
+
+class CachedSchemaTests(SimpleTestCase):
+    """Test the schema is generated once and served with ETags"""
+
+    def setUp(self) -> None:
+        schema.clear_schema_cache()
+        self.addCleanup(schema.clear_schema_cache)
+        self.client = APIClient()
+
+    def test_generated_once_and_revalidated(self):
+        """Test repeated requests reuse the schema and honour ETags"""
+        with patch(
+            'core.schema.generate_schema', wraps=schema.generate_schema
+        ) as generate:
+            res = self.client.get(SCHEMA_URL, {'format': 'json'})
+            etag = res['ETag']
+            again = self.client.get(SCHEMA_URL, {'format': 'json'})
+            cached = self.client.get(
+                SCHEMA_URL, {'format': 'json'},
+                HTTP_IF_NONE_MATCH=etag,
+            )
+            yaml = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('/recipes/', json.loads(res.content)['paths'])
+        self.assertEqual(again.content, res.content)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+        self.assertEqual(yaml.status_code, 200)
+        self.assertNotEqual(yaml['ETag'], etag)
+        self.assertTrue(yaml.content.startswith(b'openapi:'))
+
+    def test_serves_prebuilt_file(self):
+        """Test a schema written at build time is served as is"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schema.json')
+            built = schema.write_schema(path)
+
+            with override_settings(OPENAPI_SCHEMA_FILE=path), patch(
+                'core.schema.generate_schema', side_effect=AssertionError
+            ):
+                res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(json.loads(res.content), built)
@@ -0,0 +1,32 @@
+"""
+Test the API-only settings profile
+"""
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import NoReverseMatch, reverse
+
+from app import settings_api
+
+
+class SettingsApiTests(SimpleTestCase):
+    """Test app.settings_api serves the API without the admin stack"""
+
+    def test_lean_apps_and_middleware(self):
+        """Test admin, sessions and messages are left out"""
+        for app in settings_api.API_EXCLUDED_APPS:
+            self.assertNotIn(app, settings_api.INSTALLED_APPS)
+        self.assertIn('rest_framework.authtoken', settings_api.INSTALLED_APPS)
+        self.assertFalse(any(
+            'session' in name or 'csrf' in name or 'messages' in name
+            for name in settings_api.MIDDLEWARE
+        ))
+
+    @override_settings(ROOT_URLCONF='app.urls_api')
+    def test_api_urls_without_admin(self):
+        """Test the API routes resolve and the admin ones do not"""
+        self.assertEqual(reverse('recipe:recipe-list'), '/recipes/')
+        self.assertEqual(reverse('user:token'), '/api/user/token/')
+        with self.assertRaises(NoReverseMatch):
+            reverse('admin:index')
+        with self.assertRaises(NoReverseMatch):
+            reverse('swagger-ui')
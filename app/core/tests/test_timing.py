@@ -0,0 +1,106 @@
+"""
+Test per-request timing and Server-Timing headers
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.middleware import ServerTimingMiddleware
+from core.models import Recipe
+from core.timing import RequestTimings, SLOWEST_QUERIES
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def timing_metrics(header):
+    """Parse a Server-Timing header into {name: (duration, desc)}"""
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(params['dur']), params.get('desc'))
+    return metrics
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_SLOW_MS=1e6)
+class ServerTimingMiddlewareTests(TestCase):
+    """Test the timing middleware"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='1.00'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        """Test a sampled API request reports each phase"""
+        res = self.client.get(RECIPE_URL)
+
+        metrics = timing_metrics(res['Server-Timing'])
+        self.assertEqual(
+            set(metrics), {'db', 'auth', 'serialize', 'render', 'total'}
+        )
+        self.assertRegex(metrics['db'][1], r'^"[1-9]\d* queries"$')
+        for name in ('db', 'serialize', 'render'):
+            self.assertLessEqual(metrics[name][0], metrics['total'][0])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        """Test requests outside the sample get no header"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_logged(self):
+        """Test slow requests are logged with their slowest queries"""
+        with self.assertLogs('core.timing', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], RECIPE_URL)
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['query_count'], 0)
+        self.assertIn('core_recipe', record['slowest_queries'][0]['sql'])
+
+    def test_async_stack(self):
+        """Test the middleware is awaited directly in an async stack"""
+        async def get_response(request):
+            await asyncio.sleep(0)
+            return HttpResponse()
+
+        middleware = ServerTimingMiddleware(get_response)
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertIn('total', timing_metrics(response['Server-Timing']))
+
+
+class RequestTimingsTests(TestCase):
+    """Test the timings collector"""
+
+    def test_keeps_slowest_queries(self):
+        """Test only the slowest queries are kept, slowest first"""
+        timings = RequestTimings()
+        for i in range(SLOWEST_QUERIES * 2):
+            timings.add_query(f'SELECT {i}', i / 1000)
+
+        slowest = timings.slowest_queries()
+
+        self.assertEqual(timings.query_count, SLOWEST_QUERIES * 2)
+        self.assertEqual(
+            [query['sql'] for query in slowest],
+            [f'SELECT {i}' for i in range(SLOWEST_QUERIES * 2 - 1, 4, -1)],
+        )
@@ -0,0 +1,140 @@
+"""Per-request timings for Server-Timing headers and the slow request log
+
+core.middleware.ServerTimingMiddleware starts a RequestTimings for
+sampled requests. Every query run while it is current is timed by a
+wrapper installed on each database connection, and DRF views using
+ServerTimingMixin add their authentication and handler (serialization)
+phases. Phases are wall time and include the queries run during them.
+"""
+
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SLOWEST_QUERIES = 5
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Durations, in seconds, collected while serving one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = None
+        self.phases = {}
+        self.query_count = 0
+        self.db_time = 0.0
+        self._slowest = []
+        self._order = itertools.count()
+
+    def add(self, phase, duration):
+        """Add ``duration`` to a named phase"""
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration
+
+    def add_query(self, sql, duration):
+        """Count a query and keep it if it is among the slowest"""
+        self.query_count += 1
+        self.db_time += duration
+        entry = (duration, next(self._order), sql)
+        if len(self._slowest) < SLOWEST_QUERIES:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def finish(self):
+        """Stop the request clock"""
+        self.total = time.perf_counter() - self.start
+
+    def slowest_queries(self):
+        """Return the slowest queries, slowest first"""
+        return [
+            {'sql': sql, 'ms': round(duration * 1000, 3)}
+            for duration, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    def metrics(self):
+        """Return every duration in milliseconds, by name"""
+        metrics = {'db': self.db_time * 1000}
+        for phase, duration in self.phases.items():
+            metrics[phase] = duration * 1000
+        metrics['total'] = self.total * 1000
+        return metrics
+
+    def header(self):
+        """Return the value of the Server-Timing header"""
+        entries = []
+        for name, ms in self.metrics().items():
+            entry = f'{name};dur={ms:.1f}'
+            if name == 'db':
+                entry += f';desc="{self.query_count} queries"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+def current_timings():
+    """Return the RequestTimings of the request being served, if sampled"""
+    return _current.get()
+
+
+@contextmanager
+def collect_timings():
+    """Make a new RequestTimings current for the enclosed block"""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+        timings.finish()
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the enclosed block to a phase"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing queries of sampled requests"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Add record_query to a connection's execute wrappers once"""
+    if record_query not in connection.execute_wrappers:
+        # First, so ``with connection.execute_wrapper()`` still pops its own.
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class ServerTimingMixin:
+    """Record the auth and serialize phases of a DRF view"""
+
+    def initial(self, request, *args, **kwargs):
+        with timed('auth'):
+            super().initial(request, *args, **kwargs)
+        self._handler_started = time.perf_counter()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        started = getattr(self, '_handler_started', None)
+        timings = _current.get()
+        if started is not None and timings is not None:
+            timings.add('serialize', time.perf_counter() - started)
+        return super().finalize_response(request, response, *args, **kwargs)
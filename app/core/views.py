@@ -0,0 +1,62 @@
+"""Views for the core app"""
+
+import hmac
+
+from django.conf import settings
+from django.http import (
+    HttpResponse, HttpResponseForbidden, HttpResponseNotModified,
+)
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+from drf_spectacular.views import SpectacularAPIView
+
+from .metrics import collect_registered, render_metrics
+from .schema import get_rendered_schema
+
+
+def may_scrape(request):
+    """Return whether a request comes from an allowed metrics scraper"""
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(),
+        f'Bearer {token}'.encode(),
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """Expose the metrics of every worker in Prometheus text format"""
+    if not may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(collect_registered()), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """Serve the OpenAPI schema built once per deploy, with an ETag"""
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('lang'):
+            # Translated schemas are rare; generate them as usual.
+            return super().get(request, *args, **kwargs)
+
+        content, etag = get_rendered_schema(
+            request.accepted_renderer, self.get_renderer_context()
+        )
+        # Weak comparison: compression turns the ETag into W/"...".
+        client_etags = [
+            tag[2:] if tag.startswith('W/') else tag
+            for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        ]
+        if etag in client_etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                content, content_type=request.accepted_media_type
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
@@ -0,0 +1,29 @@
+"""URL mapping for the recipe API with async read views, used under ASGI"""
+
+from django.urls import path
+
+from . import urls
+from .async_views import async_read_view
+from .views import RecipeViewSets, TagViewSets, IngredientViewSets
+
+app_name = 'recipe'
+
+# Listed first so they shadow the router's sync routes; everything else
+# (actions, format suffixes) falls through to recipe.urls.
+urlpatterns = [
+    path('recipes/', async_read_view(
+        RecipeViewSets, {'get': 'list', 'post': 'create'}
+    ), name='recipe-list'),
+    path('recipes/<int:pk>/', async_read_view(RecipeViewSets, {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }), name='recipe-detail'),
+    path('tags/', async_read_view(
+        TagViewSets, {'get': 'list'}
+    ), name='tag-list'),
+    path('ingredients/', async_read_view(
+        IngredientViewSets, {'get': 'list'}
+    ), name='ingredient-list'),
+] + urls.urlpatterns
@@ -0,0 +1,68 @@
+"""Async (ASGI-native) read paths for the recipe APIs
+
+Under ASGI, Django 3.2 runs every sync view on one shared thread, so
+concurrent requests queue behind each other. The views here are
+coroutines: reads run the existing viewsets on the event loop's worker
+pool instead, so as many of them proceed in parallel as there are pool
+threads and database connections, while slow clients are handled on
+the event loop. Writes keep going through the sync viewsets unchanged.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+from core.timing import timed
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def _run_read(view):
+    """Wrap a sync view to run and render in a pool thread"""
+
+    def run(request, *args, **kwargs):
+        # Pool threads outlive requests; apply the same connection
+        # lifecycle the request_started/request_finished signals do.
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                with timed('render'):
+                    response.render()
+            return _plain_response(response)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def _plain_response(response):
+    """Copy a rendered response so Django does not render it again"""
+    plain = HttpResponse(
+        response.content,
+        status=response.status_code,
+        content_type=response.get('Content-Type'),
+    )
+    for header, value in response.items():
+        plain[header] = value
+    return plain
+
+
+def async_read_view(viewset, actions):
+    """Build a coroutine view serving reads async and writes via ``viewset``"""
+    read_actions = {m: a for m, a in actions.items() if m == 'get'}
+    sync_view = viewset.as_view(actions)
+    read = _run_read(viewset.as_view(read_actions))
+    write = sync_to_async(sync_view, thread_sensitive=True)
+
+    async def view(request, *args, **kwargs):
+        if request.method in READ_METHODS and read_actions:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    # Let schema generation introspect it like the viewset's own view.
+    view.cls = sync_view.cls
+    view.initkwargs = sync_view.initkwargs
+    view.actions = sync_view.actions
+    return view
@@ -0,0 +1,286 @@
+"""Server-sent events telling clients their recipes changed
+
+Statement-level triggers on the recipe, tag and ingredient tables send
+``NOTIFY recipe_changes, '<user_id>:<kind>'`` once per user whose rows
+a statement wrote; PostgreSQL delivers each distinct payload once per
+transaction. Each
+ASGI worker process keeps one LISTEN connection (the Bridge), read from
+the event loop without a thread, and fans notifications out through a
+process-local Broker to the user's open event streams. Events only say
+which kinds of data changed: clients fetch the changes with /sync/.
+
+An idle stream is a coroutine waiting on an asyncio.Event, plus one
+task waiting for the client to disconnect, so a worker holds thousands
+of them in a few megabytes. app/asgi.py routes EVENTS_PATH here, ahead
+of Django.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import psycopg2
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from rest_framework.authtoken.models import Token
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = '/sync/events/'
+CHANNEL = 'recipe_changes'
+KINDS = ('recipe', 'tag', 'ingredient')
+
+
+class Subscription:
+    """Kinds of data changed for one event stream since it last sent"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.kinds = set()
+        self.closed = False
+        self.changed = asyncio.Event()
+
+    def notify(self, kinds):
+        """Add changed kinds; a burst of writes yields a single event"""
+        self.kinds.update(kinds)
+        self.changed.set()
+
+    def close(self):
+        self.closed = True
+        self.changed.set()
+
+    def take(self):
+        """Return and forget the kinds changed since the last call"""
+        kinds, self.kinds = sorted(self.kinds), set()
+        self.changed.clear()
+        return kinds
+
+
+class Broker:
+    """Process-local fan-out of change notifications to subscriptions"""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+
+    def __len__(self):
+        return sum(len(subs) for subs in self.subscriptions.values())
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subs = self.subscriptions.get(subscription.user_id)
+        if subs is not None:
+            subs.discard(subscription)
+            if not subs:
+                del self.subscriptions[subscription.user_id]
+
+    def publish(self, user_id, kinds):
+        for subscription in self.subscriptions.get(user_id, ()):
+            subscription.notify(kinds)
+
+    def publish_all(self, kinds):
+        """Notify every subscription, e.g. after notifications were lost"""
+        for subs in self.subscriptions.values():
+            for subscription in subs:
+                subscription.notify(kinds)
+
+
+class Bridge:
+    """LISTEN connection feeding NOTIFY payloads into a Broker"""
+
+    def __init__(self, broker, using='default'):
+        self.broker = broker
+        self.using = using
+        self.listening = None
+        self._loop = None
+        self._task = None
+
+    def start(self):
+        """Start listening on the running loop, unless already doing so"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and not self._task.done():
+            return
+        self._loop = loop
+        self.listening = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        reconnecting = False
+        while True:
+            try:
+                conn = await loop.run_in_executor(None, self._connect)
+            except psycopg2.Error:
+                logger.warning('Could not LISTEN for recipe changes',
+                               exc_info=True)
+                await asyncio.sleep(settings.EVENT_STREAM_RECONNECT_SECONDS)
+                continue
+            if reconnecting:
+                # Changes made while disconnected went unnoticed.
+                self.broker.publish_all(KINDS)
+            lost = loop.create_future()
+            # Kept, as a closed connection no longer has a fileno().
+            fd = conn.fileno()
+            loop.add_reader(fd, self._read, conn, lost)
+            self.listening.set()
+            try:
+                await lost
+            finally:
+                self.listening.clear()
+                loop.remove_reader(fd)
+                conn.close()
+            logger.warning('Lost the LISTEN connection for recipe changes')
+            reconnecting = True
+            await asyncio.sleep(settings.EVENT_STREAM_RECONNECT_SECONDS)
+
+    def _connect(self):
+        params = connections[self.using].get_connection_params()
+        # TCP keepalives notice a server that went away silently.
+        params = {
+            'keepalives': 1, 'keepalives_idle': 30,
+            'keepalives_interval': 10, 'keepalives_count': 3, **params,
+        }
+        conn = psycopg2.connect(**params)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return conn
+
+    def _read(self, conn, lost):
+        try:
+            conn.poll()
+        except psycopg2.Error:
+            if not lost.done():
+                lost.set_result(None)
+            return
+        changes = defaultdict(set)
+        for notify in conn.notifies:
+            user_id, _, kind = notify.payload.partition(':')
+            changes[int(user_id)].add(kind)
+        conn.notifies.clear()
+        for user_id, kinds in changes.items():
+            self.broker.publish(user_id, kinds)
+
+
+broker = Broker()
+bridge = Bridge(broker)
+
+
+@sync_to_async(thread_sensitive=False)
+def authenticate(scope):
+    """Return the active user of the request's API token, or None"""
+    header = dict(scope['headers']).get(b'authorization', b'')
+    keyword, _, key = header.decode('latin-1').partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+    close_old_connections()
+    try:
+        token = Token.objects.select_related('user').get(key=key)
+    except Token.DoesNotExist:
+        return None
+    finally:
+        close_old_connections()
+    return token.user if token.user.is_active else None
+
+
+async def _wait_for_disconnect(receive, subscription):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscription.close()
+
+
+async def stream_events(user_id, receive, send):
+    """Send ``change`` events for a user's data until they disconnect"""
+    subscription = broker.subscribe(user_id)
+    bridge.start()
+    disconnect = asyncio.ensure_future(
+        _wait_for_disconnect(receive, subscription)
+    )
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Stops nginx from buffering the stream.
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        retry = int(settings.EVENT_STREAM_RECONNECT_SECONDS * 1000)
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {retry}\n\n'.encode(),
+            'more_body': True,
+        })
+        while not subscription.closed:
+            try:
+                await asyncio.wait_for(
+                    subscription.changed.wait(),
+                    settings.EVENT_STREAM_KEEPALIVE_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing the idle connection.
+                body = b': keepalive\n\n'
+            else:
+                if subscription.closed:
+                    break
+                data = json.dumps({'kinds': subscription.take()})
+                body = f'event: change\ndata: {data}\n\n'.encode()
+            await send({
+                'type': 'http.response.body', 'body': body, 'more_body': True,
+            })
+    except OSError:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
+        disconnect.cancel()
+
+
+async def event_stream(scope, receive, send):
+    """ASGI app serving EVENTS_PATH to clients with an API token"""
+    if scope['method'] != 'GET':
+        return await _send_error(send, 405, 'Method not allowed.')
+    user = await authenticate(scope)
+    if user is None:
+        return await _send_error(
+            send, 401, 'Invalid or missing authentication token.'
+        )
+    await stream_events(user.id, receive, send)
+
+
+async def _send_error(send, status, detail):
+    headers = [(b'content-type', b'application/json')]
+    if status == 401:
+        headers.append((b'www-authenticate', b'Token'))
+    await send({
+        'type': 'http.response.start', 'status': status, 'headers': headers,
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': detail}).encode(),
+    })
+
+
+def with_event_stream(application):
+    """Wrap an ASGI app so EVENTS_PATH is streamed by event_stream"""
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+            return await event_stream(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return app
@@ -0,0 +1,191 @@
+"""Per-user tag/ingredient index for set queries on recipes"""
+
+import numpy as np
+
+from core.metrics import record_cache_lookup
+from core.models import Recipe
+
+from . import sync
+
+CACHE_KEY = 'recipe-feature-index:{user_id}'
+CACHE_TIMEOUT = 60 * 60
+
+SIMILARITY_METRICS = ('jaccard', 'cosine')
+
+# Largest tag or ingredient id whose feature key fits in an int64.
+MAX_FEATURE_ID = 2 ** 62 - 1
+
+
+def tag_keys(tag_ids):
+    """Map tag ids to feature keys (even numbers)"""
+    return np.asarray(tag_ids, dtype=np.int64) * 2
+
+
+def ingredient_keys(ingredient_ids):
+    """Map ingredient ids to feature keys (odd numbers)"""
+    return np.asarray(ingredient_ids, dtype=np.int64) * 2 + 1
+
+
+class RecipeFeatureIndex:
+    """Sparse recipe x feature matrix for one user's recipes.
+
+    Rows are the user's recipes in ascending id order and features are the
+    tags and ingredients attached to them. The matrix is stored twice, by
+    feature (posting lists) and by row, so a query only touches the rows
+    that share at least one feature with it. The posting lists of the
+    ingredient features double as an inverted ingredient -> recipe index.
+    """
+
+    def __init__(self, recipe_ids, rows, features):
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        features = np.asarray(features, dtype=np.int64)
+        n_rows = len(self.recipe_ids)
+
+        by_feature = np.lexsort((rows, features))
+        self.features, starts = np.unique(
+            features[by_feature], return_index=True
+        )
+        self.postings = rows[by_feature].astype(np.int32)
+        self.posting_ptr = np.append(starts, len(by_feature))
+
+        by_row = np.lexsort((features, rows))
+        self.row_features = features[by_row]
+        self.row_ptr = np.searchsorted(rows[by_row], np.arange(n_rows + 1))
+        self.sizes = np.diff(self.row_ptr)
+        self.ingredient_sizes = np.bincount(
+            rows[features % 2 == 1], minlength=n_rows
+        )
+
+    @classmethod
+    def build(cls, user):
+        """Load the index for a user with three flat queries"""
+        recipe_ids = np.fromiter(
+            Recipe.objects.filter(user=user)
+            .order_by('id').values_list('id', flat=True),
+            dtype=np.int64,
+        )
+        tag_links = cls._links(Recipe.tags.through, user, 'tag_id')
+        ingredient_links = cls._links(
+            Recipe.ingredients.through, user, 'ingredient_id'
+        )
+        link_recipes = np.concatenate(
+            [tag_links[:, 0], ingredient_links[:, 0]]
+        )
+        features = np.concatenate([
+            tag_keys(tag_links[:, 1]),
+            ingredient_keys(ingredient_links[:, 1]),
+        ])
+
+        # Drop links to recipes created after the id list was read.
+        rows = np.searchsorted(recipe_ids, link_recipes)
+        known = rows < len(recipe_ids)
+        known[known] = recipe_ids[rows[known]] == link_recipes[known]
+
+        return cls(recipe_ids, rows[known], features[known])
+
+    @staticmethod
+    def _links(through, user, column):
+        """Return (recipe_id, <column>) pairs as an N x 2 array"""
+        pairs = through.objects.filter(
+            recipe__user=user
+        ).values_list('recipe_id', column)
+        return np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def row_of(self, recipe_id):
+        """Return the row of a recipe, or None if it is not indexed"""
+        row = int(np.searchsorted(self.recipe_ids, recipe_id))
+        if row < len(self.recipe_ids) and self.recipe_ids[row] == recipe_id:
+            return row
+        return None
+
+    def features_of(self, row):
+        """Return the feature keys of a row"""
+        return self.row_features[self.row_ptr[row]:self.row_ptr[row + 1]]
+
+    def overlap(self, keys):
+        """Count, for every row, how many of ``keys`` it contains"""
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        cols = np.searchsorted(self.features, keys)
+        present = cols < len(self.features)
+        present[present] = self.features[cols[present]] == keys[present]
+        hits = [
+            self.postings[self.posting_ptr[col]:self.posting_ptr[col + 1]]
+            for col in cols[present]
+        ]
+        if not hits:
+            return np.zeros(len(self), dtype=np.int64)
+        return np.bincount(np.concatenate(hits), minlength=len(self))
+
+    def similar(self, recipe_id, metric='jaccard', limit=10):
+        """Return up to ``limit`` (recipe_id, score) pairs, best first"""
+        if metric not in SIMILARITY_METRICS:
+            raise ValueError(f'Unknown similarity metric: {metric}')
+        row = self.row_of(recipe_id)
+        if row is None or limit <= 0:
+            return []
+
+        keys = self.features_of(row)
+        shared = self.overlap(keys).astype(np.float64)
+        if metric == 'cosine':
+            denominator = np.sqrt(len(keys) * self.sizes.astype(np.float64))
+        else:
+            denominator = len(keys) + self.sizes - shared
+        scores = np.divide(
+            shared, denominator,
+            out=np.zeros_like(shared), where=denominator > 0,
+        )
+        scores[row] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        # Best score first, newest recipe first on ties.
+        order = np.lexsort(
+            (-self.recipe_ids[candidates], -scores[candidates])
+        )
+        candidates = candidates[order]
+        return [
+            (int(self.recipe_ids[c]), float(scores[c])) for c in candidates
+        ]
+
+    def cookable(self, ingredient_ids, max_missing=0, limit=50):
+        """Return recipes cookable from ``ingredient_ids``, best first.
+
+        Each result is a (recipe_id, coverage, missing) tuple where
+        coverage is the share of the recipe's ingredients on hand and
+        missing the number of ingredients still needed.
+        """
+        if limit <= 0:
+            return []
+        have = self.overlap(ingredient_keys(ingredient_ids))
+        missing = self.ingredient_sizes - have
+        candidates = np.flatnonzero((have > 0) & (missing <= max_missing))
+        coverage = have[candidates] / self.ingredient_sizes[candidates]
+
+        # Best coverage first, then fewest missing, then newest recipe.
+        order = np.lexsort((
+            -self.recipe_ids[candidates], missing[candidates], -coverage,
+        ))[:limit]
+        return [
+            (
+                int(self.recipe_ids[candidates[i]]),
+                float(coverage[i]),
+                int(missing[candidates[i]]),
+            )
+            for i in order
+        ]
+
+
+def get_feature_index(user):
+    """Return the feature index of a user, cached until their data changes"""
+    index, hit = sync.cached(
+        user, CACHE_KEY.format(user_id=user.id), RecipeFeatureIndex.build,
+        CACHE_TIMEOUT,
+    )
+    record_cache_lookup('feature_index', hit)
+    return index
@@ -0,0 +1,211 @@
+"""Recipes pre-rendered as JSON and assembled into responses
+
+Serializing a recipe walks its fields, tags and ingredients each time it
+is listed, though recipes rarely change. A RecipeFragment keeps the JSON
+RecipeSerializer and RecipeDetailSerializer produce for a recipe, tagged
+with the recipe's change_seq, which the database bumps on every write to
+the recipe or its links (see recipe.sync). A list response is then its
+recipes' fragments joined with commas; fragments missing or older than
+their recipe are rendered on the spot. Renaming a tag or ingredient
+bumps the change_seq of its recipes as well, so freshness is only ever
+a matter of change_seq. Writes re-render their recipe once committed,
+and renames queue a job rendering the recipes showing the old name.
+
+Fragments are rendered without a request, so images are relative URLs
+until absolute_images() makes them absolute for the request at hand.
+"""
+
+import json
+import logging
+
+from django.db import DatabaseError, connections, router, transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core import jobs
+from core.models import Recipe, RecipeFragment, Tag
+from core.renderers import OrjsonRenderer
+
+from .serializers import RecipeSerializer, RecipeDetailSerializer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Quotes inside JSON strings are escaped, so this only matches the key.
+RELATIVE_IMAGE = b'"image":"/'
+
+UPSERT_SQL = """
+INSERT INTO core_recipefragment
+    (recipe_id, change_seq, list_json, detail_json)
+VALUES {values}
+ON CONFLICT (recipe_id) DO UPDATE SET
+    change_seq = EXCLUDED.change_seq,
+    list_json = EXCLUDED.list_json,
+    detail_json = EXCLUDED.detail_json
+WHERE core_recipefragment.change_seq <= EXCLUDED.change_seq
+"""
+
+
+class FragmentResponse(Response):
+    """Response sending JSON assembled from fragments as it is"""
+
+    def __init__(self, body, **kwargs):
+        super().__init__(None, **kwargs)
+        self.body = body
+
+    @property
+    def data(self):
+        # Only parsed when asked for, which tests do.
+        if self._data is None and self.body is not None:
+            self._data = json.loads(self.body)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self.body = None
+
+    @property
+    def rendered_content(self):
+        # Not DRF's, which would render (and so parse) self.data.
+        renderer = self.accepted_renderer
+        content_type = self.content_type
+        if content_type is None:
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+        self['Content-Type'] = content_type
+        return self.body
+
+
+def serves(request):
+    """Return True if fragments are what the response would render"""
+    renderer = request.accepted_renderer
+    return (
+        isinstance(renderer, JSONRenderer)
+        and renderer.compact
+        and not renderer.ensure_ascii
+        and not renderer.get_indent(request.accepted_media_type, {})
+    )
+
+
+def render(recipe_ids):
+    """Render the fragments of recipes; return them by recipe id"""
+    recipes = Recipe.objects.filter(id__in=recipe_ids).prefetch_related(
+        'tags', 'ingredients'
+    )
+    renderer = OrjsonRenderer()
+    return {
+        recipe.id: RecipeFragment(
+            recipe_id=recipe.id,
+            change_seq=recipe.change_seq,
+            list_json=renderer.render(RecipeSerializer(recipe).data),
+            detail_json=renderer.render(
+                RecipeDetailSerializer(recipe).data
+            ),
+        )
+        for recipe in recipes
+    }
+
+
+def store(fragments):
+    """Save fragments, unless newer ones were saved meanwhile"""
+    fragments = list(fragments)
+    for start in range(0, len(fragments), BATCH_SIZE):
+        batch = fragments[start:start + BATCH_SIZE]
+        params = []
+        for fragment in batch:
+            params += [fragment.recipe_id, fragment.change_seq,
+                       fragment.list_json, fragment.detail_json]
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+        try:
+            with transaction.atomic(), connections['default'].cursor() as c:
+                c.execute(UPSERT_SQL.format(values=values), params)
+        except DatabaseError:
+            # A recipe deleted since it was rendered; rendered again if
+            # it is ever read.
+            logger.warning('Could not store recipe fragments',
+                           exc_info=True)
+
+
+def refresh(recipe_ids):
+    """Render and store the fragments of recipes that are out of date"""
+    rows = Recipe.objects.filter(id__in=recipe_ids).values_list(
+        'id', 'change_seq', 'fragment__change_seq'
+    )
+    stale = [recipe_id for recipe_id, seq, rendered in rows
+             if rendered != seq]
+    if stale:
+        store(render(stale).values())
+    return len(stale)
+
+
+def refresh_on_commit(recipe_ids):
+    """Refresh fragments once the current transaction commits"""
+    transaction.on_commit(lambda: refresh(recipe_ids))
+
+
+def load(queryset, detail=False):
+    """Return the fragments of the queryset's recipes, in its order"""
+    column = 'detail_json' if detail else 'list_json'
+    rows = list(queryset.prefetch_related(None).values_list(
+        'id', 'change_seq', 'fragment__change_seq', f'fragment__{column}'
+    ))
+    stale = [row[0] for row in rows if row[1] != row[2]]
+    rendered = {}
+    if stale:
+        rendered = render(stale)
+        # A replica may lag behind fragments already on the primary.
+        if router.db_for_read(Recipe) == 'default':
+            store(rendered.values())
+    parts = []
+    for recipe_id, seq, fragment_seq, body in rows:
+        if seq != fragment_seq:
+            fragment = rendered.get(recipe_id)
+            if fragment is None:
+                continue
+            body = getattr(fragment, column)
+        parts.append(body)
+    return parts
+
+
+def same_json(a, b):
+    """Return True if two renderings hold the same recipes.
+
+    Tags and ingredients are compared as sets, as their order in a
+    rendering is not defined.
+    """
+    def normalize(body):
+        data = json.loads(bytes(body))
+        for recipe in data if isinstance(data, list) else [data]:
+            for field in ('tags', 'ingredients'):
+                if isinstance(recipe.get(field), list):
+                    recipe[field].sort(key=lambda item: item['id'])
+        return data
+
+    return normalize(a) == normalize(b)
+
+
+def absolute_images(body, request):
+    """Make the relative image URLs in rendered JSON absolute"""
+    if RELATIVE_IMAGE not in body:
+        return body
+    base = request.build_absolute_uri('/').encode()
+    return body.replace(RELATIVE_IMAGE, b'"image":"' + base)
+
+
+def refresh_renamed(instance):
+    """Queue rendering the recipes of a renamed tag or ingredient"""
+    field = 'tags' if isinstance(instance, Tag) else 'ingredients'
+    refresh_linked.enqueue(field=field, object_id=instance.id)
+
+
+@jobs.task
+def refresh_linked(field, object_id):
+    """Background job rendering fragments of a tag or ingredient's recipes"""
+    recipe_ids = list(Recipe.objects.filter(
+        **{field: object_id}
+    ).order_by('id').values_list('id', flat=True))
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        refresh(recipe_ids[start:start + BATCH_SIZE])
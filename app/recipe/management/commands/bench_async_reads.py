@@ -0,0 +1,153 @@
+"""
+Django command to compare WSGI and ASGI read concurrency in-process
+"""
+
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag
+
+BENCH_EMAIL = 'bench-async-reads@example.com'
+
+
+class Command(BaseCommand):
+    """Drive GET /recipes/ through the WSGI and ASGI handlers"""
+    help = 'Compare WSGI, ASGI with sync views and ASGI with async views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--recipes', type=int, default=50)
+        parser.add_argument(
+            '--db-latency-ms', type=float, default=0,
+            help='Extra round-trip time added to every query, to model a '
+                 'database on another host',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        token = self.seed(options['recipes'])
+        latency = options['db_latency_ms'] / 1000
+
+        def add_latency(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def on_connect(connection, **kwargs):
+            connection.execute_wrappers.append(add_latency)
+
+        if latency:
+            connection_created.connect(on_connect)
+        try:
+            configs = [
+                ('WSGI, sync views', self.run_wsgi, 'recipe.urls'),
+                ('ASGI, sync views', self.run_asgi, 'recipe.urls'),
+                ('ASGI, async views', self.run_asgi, 'recipe.async_urls'),
+            ]
+            for name, runner, urlconf in configs:
+                with override_settings(ROOT_URLCONF=urlconf):
+                    timings, elapsed = runner(
+                        token, options['requests'], options['concurrency']
+                    )
+                p50, p99 = np.percentile(timings, [50, 99]) * 1000
+                self.stdout.write(self.style.SUCCESS(
+                    f'{name}: {len(timings) / elapsed:.0f} requests/sec, '
+                    f'p50 {p50:.1f} ms, p99 {p99:.1f} ms'
+                ))
+        finally:
+            connection_created.disconnect(on_connect)
+            get_user_model().objects.filter(email=BENCH_EMAIL).delete()
+
+    def seed(self, recipes):
+        """Create the benchmark user and recipes, returning a token"""
+        get_user_model().objects.filter(email=BENCH_EMAIL).delete()
+        user = get_user_model().objects.create_user(email=BENCH_EMAIL)
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag{i}') for i in range(5)
+        )
+        for i in range(recipes):
+            recipe = Recipe.objects.create(
+                user=user,
+                title=f'recipe{i}',
+                time_minutes=10,
+                price=Decimal('5.00'),
+            )
+            recipe.tags.set(tags[:i % 5 + 1])
+        return Token.objects.create(user=user).key
+
+    def run_wsgi(self, token, requests, concurrency):
+        """Serve requests with a thread per in-flight request"""
+        handler = WSGIHandler()
+
+        def one(_):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': '/recipes/',
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'HTTP_HOST': 'localhost',
+                'HTTP_AUTHORIZATION': f'Token {token}',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.url_scheme': 'http',
+            }
+            start = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            timings = list(pool.map(one, range(requests)))
+        return timings, time.perf_counter() - start
+
+    def run_asgi(self, token, requests, concurrency):
+        """Serve requests as concurrent tasks on one event loop"""
+        handler = ASGIHandler()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/recipes/',
+            'query_string': b'',
+            'server': ('localhost', 80),
+            'headers': [
+                (b'host', b'localhost'),
+                (b'authorization', f'Token {token}'.encode()),
+            ],
+        }
+
+        async def one(limit):
+            async with limit:
+                async def receive():
+                    return {'type': 'http.request', 'body': b''}
+
+                async def send(message):
+                    pass
+
+                start = time.perf_counter()
+                await handler(dict(scope), receive, send)
+                return time.perf_counter() - start
+
+        async def run():
+            limit = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*[one(limit) for _ in range(requests)])
+
+        start = time.perf_counter()
+        timings = asyncio.run(run())
+        return timings, time.perf_counter() - start
@@ -0,0 +1,81 @@
+"""
+Django command to benchmark idle change event streams
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipe import events
+
+
+class Command(BaseCommand):
+    """Hold many idle event streams, then time notifying them"""
+    help = 'Measure the memory of idle event streams and NOTIFY fan-out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        asyncio.run(self.run(options['streams'], options['users']))
+
+    async def run(self, streams, users):
+        received = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message.get('body', b'').startswith(b'event:'):
+                received.put_nowait(time.perf_counter())
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tasks = [
+            asyncio.ensure_future(
+                events.stream_events(i % users, receive, send)
+            )
+            for i in range(streams)
+        ]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(events.bridge.listening.wait(), 10)
+        per_stream = (tracemalloc.get_traced_memory()[0] - before) / streams
+        tracemalloc.stop()
+        self.stdout.write(
+            f'{streams} idle streams: {per_stream / 1024:.1f} KiB each'
+        )
+
+        for label, user_ids in (('one user', [0]),
+                                ('every user', range(users))):
+            start = time.perf_counter()
+            await sync_to_async(self.notify)(user_ids)
+            expected = sum(
+                len(events.broker.subscriptions.get(user_id, ()))
+                for user_id in user_ids
+            )
+            last = start
+            for _ in range(expected):
+                last = await asyncio.wait_for(received.get(), 30)
+            self.stdout.write(
+                f'NOTIFY {label} -> {expected} streams: '
+                f'{(last - start) * 1000:.1f} ms'
+            )
+
+        disconnected.set()
+        await asyncio.gather(*tasks)
+        await events.bridge.stop()
+
+    def notify(self, user_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, id || %s) FROM unnest(%s::bigint[]) id',
+                [events.CHANNEL, ':recipe', list(user_ids)],
+            )
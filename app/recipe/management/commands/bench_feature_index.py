@@ -0,0 +1,87 @@
+"""
+Django command to benchmark the recipe feature index on synthetic data
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from recipe.feature_index import RecipeFeatureIndex, tag_keys, ingredient_keys
+
+
+class Command(BaseCommand):
+    """Time index construction, similarity and pantry queries"""
+    help = 'Benchmark the in-memory recipe feature index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=2_000)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--pantry-size', type=int, default=30)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        rng = np.random.default_rng(options['seed'])
+        n = options['recipes']
+
+        # Zipf-like popularity so a few tags/ingredients are everywhere.
+        def draw(vocabulary, per_recipe):
+            weights = 1.0 / np.arange(1, vocabulary + 1)
+            ids = rng.choice(
+                vocabulary, size=n * per_recipe, p=weights / weights.sum()
+            )
+            return np.repeat(np.arange(n), per_recipe), ids
+
+        tag_rows, tag_ids = draw(
+            options['tags'], options['tags_per_recipe']
+        )
+        ing_rows, ing_ids = draw(
+            options['ingredients'], options['ingredients_per_recipe']
+        )
+        rows = np.concatenate([tag_rows, ing_rows])
+        features = np.concatenate(
+            [tag_keys(tag_ids), ingredient_keys(ing_ids)]
+        )
+        # Duplicate draws would be a single M2M row in the database.
+        pairs = np.unique(np.stack([rows, features], axis=1), axis=0)
+
+        start = time.perf_counter()
+        index = RecipeFeatureIndex(
+            np.arange(1, n + 1), pairs[:, 0], pairs[:, 1]
+        )
+        build = time.perf_counter() - start
+        self.stdout.write(
+            f'{len(pairs)} links over {n} recipes, '
+            f'built in {build * 1000:.1f} ms'
+        )
+
+        self.time_queries(
+            'similar',
+            lambda recipe_id: index.similar(recipe_id, limit=10),
+            rng.integers(1, n + 1, size=options['queries']),
+        )
+        self.time_queries(
+            'pantry',
+            lambda pantry: index.cookable(pantry, max_missing=2, limit=50),
+            [
+                rng.choice(options['ingredients'], options['pantry_size'])
+                for _ in range(options['queries'])
+            ],
+        )
+
+    def time_queries(self, name, query, args):
+        """Run ``query`` for each argument and report latency percentiles"""
+        timings = []
+        for arg in args:
+            start = time.perf_counter()
+            query(arg)
+            timings.append(time.perf_counter() - start)
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms'
+        ))
@@ -0,0 +1,64 @@
+"""
+Django command to benchmark recipe lists from fragments and serializers
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core.models import Recipe
+from core.renderers import OrjsonRenderer
+from recipe import fragments
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """Time a user's recipe list rendered live and from fragments"""
+    help = 'Compare list rendering through serializers and fragments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, help='Default: the user with most recipes',
+        )
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        user_id = options['user'] or Recipe.objects.values('user_id').annotate(
+            n=Count('id')
+        ).order_by('-n')[0]['user_id']
+        queryset = Recipe.objects.filter(user_id=user_id).order_by('-id')
+        ids = list(queryset.values_list('id', flat=True)[:options['recipes']])
+        queryset = queryset.filter(id__in=ids)
+        fragments.refresh(ids)
+
+        def live():
+            return OrjsonRenderer().render(RecipeSerializer(
+                queryset.prefetch_related('tags', 'ingredients'), many=True
+            ).data)
+
+        def assembled():
+            return b'[' + b','.join(fragments.load(queryset)) + b']'
+
+        results = {}
+        for name, func in (('serializers', live), ('fragments', assembled)):
+            best = float('inf')
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                body = func()
+                best = min(best, time.perf_counter() - start)
+            results[name] = (best, body)
+            self.stdout.write(
+                f'{name}: {best * 1000:.1f} ms for {len(ids)} recipes '
+                f'({len(body) // 1024} KiB)'
+            )
+
+        same = fragments.same_json(
+            results['serializers'][1], results['fragments'][1]
+        )
+        speedup = results['serializers'][0] / results['fragments'][0]
+        self.stdout.write(self.style.SUCCESS(
+            f'{speedup:.1f}x faster, same output: {same}'
+        ))
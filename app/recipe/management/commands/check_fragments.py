@@ -0,0 +1,79 @@
+"""
+Django command to check pre-rendered recipe fragments against the data
+"""
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe, RecipeFragment
+from recipe import fragments
+
+
+class Command(BaseCommand):
+    """Compare stored recipe fragments with a fresh rendering"""
+    help = 'Report, and with --fix repair, recipe fragments out of step'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only check this user')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Store fresh fragments for every recipe not up to date',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        recipes = Recipe.objects.order_by('id')
+        if options['user']:
+            recipes = recipes.filter(user_id=options['user'])
+        counts = Counter()
+        wrong = []
+        last_id = 0
+        while True:
+            ids = list(recipes.filter(id__gt=last_id).values_list(
+                'id', flat=True
+            )[:options['batch_size']])
+            if not ids:
+                break
+            last_id = ids[-1]
+            stored = RecipeFragment.objects.in_bulk(ids)
+            rendered = fragments.render(ids)
+            outdated = []
+            for recipe_id, fragment in rendered.items():
+                state = self.compare(stored.get(recipe_id), fragment)
+                counts[state] += 1
+                if state == 'wrong':
+                    wrong.append(recipe_id)
+                if state != 'ok':
+                    outdated.append(fragment)
+            if options['fix']:
+                fragments.store(outdated)
+
+        self.stdout.write(
+            f"{counts['ok']} up to date, {counts['missing']} missing, "
+            f"{counts['stale']} stale, {counts['wrong']} wrong"
+        )
+        if wrong and not options['fix']:
+            # Missing and stale fragments are re-rendered when read;
+            # wrong ones would be served as they are.
+            raise CommandError(
+                f'{len(wrong)} fragments do not match their recipe, e.g. '
+                f'recipes {", ".join(map(str, wrong[:10]))}'
+            )
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Stored {sum(counts.values()) - counts["ok"]} fragments'
+            ))
+
+    def compare(self, stored, fragment):
+        if stored is None:
+            return 'missing'
+        if stored.change_seq != fragment.change_seq:
+            return 'stale'
+        if not (
+            fragments.same_json(stored.list_json, fragment.list_json)
+            and fragments.same_json(stored.detail_json, fragment.detail_json)
+        ):
+            return 'wrong'
+        return 'ok'
@@ -0,0 +1,17 @@
+"""
+Django command to delete tombstones older than any valid sync token
+"""
+
+from django.core.management.base import BaseCommand
+
+from recipe.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    """Prune the record of deletions kept for syncing clients"""
+    help = 'Delete tombstones no unexpired sync token needs; run daily'
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones'))
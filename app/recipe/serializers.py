@@ -1,6 +1,7 @@
 '''Serializers for recipe API'''
 
 from core.models import Recipe, Tag, Ingredient
+from django.core import validators
 from rest_framework import serializers
 
 
@@ -96,6 +97,87 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description', 'chef_name']
 
 
+class SimilarRecipeSerializer(RecipeSerializer):
+    '''Serializer for recipes ranked by similarity to another recipe'''
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['similarity']
+
+
+class PantryRecipeSerializer(RecipeSerializer):
+    '''Serializer for recipes matched against a set of ingredients'''
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + [
+            'coverage', 'missing_ingredients',
+        ]
+
+
+class CompoundRecipeSerializer(RecipeSerializer):
+    '''Serializer for recipes linking side-loaded tags and ingredients by ID'''
+
+    def get_fields(self):
+        # The view sets <relation>_ids on each recipe for the relations
+        # it side-loads, so their objects are never loaded per recipe.
+        fields = super().get_fields()
+        for name in self.context.get('include', ()):
+            fields[name] = serializers.ReadOnlyField(source=f'{name}_ids')
+        return fields
+
+
+class TagCountSerializer(TagSerializer):
+    '''Serializer for tags with the number of recipes using them'''
+    recipes = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipes']
+
+
+class IngredientCountSerializer(IngredientsSerializer):
+    '''Serializer for ingredients with the number of recipes using them'''
+    recipes = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientsSerializer.Meta):
+        fields = IngredientsSerializer.Meta.fields + ['recipes']
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    '''Serializer for the aggregates of a user's recipes'''
+    recipes = serializers.IntegerField()
+    average_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, allow_null=True
+    )
+    total_time_minutes = serializers.IntegerField()
+    tags = TagCountSerializer(many=True)
+    top_ingredients = IngredientCountSerializer(many=True)
+
+
+class SyncRecipeSerializer(RecipeDetailSerializer):
+    '''Serializer for synced recipes, linking tags and ingredients by ID'''
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    ingredients = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    '''Serializer for the IDs deleted since the last sync'''
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncSerializer(serializers.Serializer):
+    '''Serializer for the changes sent to a syncing client'''
+    token = serializers.CharField()
+    reset = serializers.BooleanField()
+    recipes = SyncRecipeSerializer(many=True)
+    tags = TagSerializer(many=True)
+    ingredients = IngredientsSerializer(many=True)
+    deleted = SyncDeletedSerializer()
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     '''Serializer for recipe images'''
 
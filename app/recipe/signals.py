@@ -0,0 +1,42 @@
+"""Signal handlers keeping recipe caches in step with writes"""
+
+from django.db.models.signals import m2m_changed, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+
+from . import fragments
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_written(sender, instance, **kwargs):
+    """Re-render a recipe's fragments once the write commits"""
+    fragments.refresh_on_commit([instance.id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_written(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """Re-render fragments of recipes whose tags or ingredients changed"""
+    if action in ('post_add', 'post_remove'):
+        fragments.refresh_on_commit(list(pk_set) if reverse else [instance.id])
+    elif action == 'post_clear' and not reverse:
+        fragments.refresh_on_commit([instance.id])
+
+
+@receiver(pre_save, sender=Tag)
+@receiver(pre_save, sender=Ingredient)
+def recipe_attr_saving(sender, instance, **kwargs):
+    """Note whether a save renames a tag or ingredient"""
+    instance._renamed = instance.pk is not None and sender.objects.filter(
+        pk=instance.pk
+    ).exclude(name=instance.name).exists()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_attr_renamed(sender, instance, created, **kwargs):
+    """Re-render fragments showing a tag or ingredient's old name"""
+    if not created and instance._renamed:
+        fragments.refresh_renamed(instance)
@@ -0,0 +1,44 @@
+"""Per-user aggregates over recipes, tags and ingredients"""
+
+from django.db.models import Avg, Count, Sum
+
+from core.metrics import record_cache_lookup
+from core.models import Recipe, Tag, Ingredient
+
+from . import sync
+
+CACHE_KEY = 'recipe-stats:{user_id}'
+CACHE_TIMEOUT = 60 * 60
+
+TOP_INGREDIENTS = 10
+
+
+def compute_stats(user):
+    """Aggregate a user's recipes in one grouped query per relation"""
+    totals = Recipe.objects.filter(user=user).aggregate(
+        recipes=Count('id'),
+        average_price=Avg('price'),
+        total_time_minutes=Sum('time_minutes'),
+    )
+    # Counting links only needs the link table, not core_recipe.
+    tags = Tag.objects.filter(user=user).annotate(
+        recipes=Count('recipe')
+    ).order_by('-recipes', 'id').values('id', 'name', 'recipes')
+    ingredients = Ingredient.objects.filter(user=user).annotate(
+        recipes=Count('recipe')
+    ).order_by('-recipes', 'id').values('id', 'name', 'recipes')
+    return dict(
+        totals,
+        total_time_minutes=totals['total_time_minutes'] or 0,
+        tags=list(tags),
+        top_ingredients=list(ingredients[:TOP_INGREDIENTS]),
+    )
+
+
+def get_stats(user):
+    """Return the stats of a user, cached until their data changes"""
+    stats, hit = sync.cached(
+        user, CACHE_KEY.format(user_id=user.id), compute_stats, CACHE_TIMEOUT
+    )
+    record_cache_lookup('recipe_stats', hit)
+    return stats
@@ -0,0 +1,112 @@
+"""Tests for the async (ASGI) recipe read endpoints"""
+
+import asyncio
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from recipe.async_views import async_read_view
+from recipe.views import RecipeViewSets
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+@override_settings(ROOT_URLCONF='recipe.async_urls')
+class AsyncReadViewTests(TransactionTestCase):
+    """Test reads are served by coroutine views with unchanged output"""
+
+    def setUp(self) -> None:
+        # Worker threads must hand their connections back after each read
+        # or the test database cannot be dropped.
+        patcher = patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        token = Token.objects.create(user=self.user)
+        self.headers = {'authorization': f'Token {token.key}'}
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Brunch'))
+
+    def get(self, path, **extra):
+        """Issue a GET through the ASGI handler"""
+        return self.request('get', path, **extra)
+
+    def request(self, method, path, *args, **extra):
+        """Issue a request through the ASGI handler"""
+        async def send():
+            client = AsyncClient()
+            return await getattr(client, method)(path, *args, **extra)
+
+        return async_to_sync(send)()
+
+    def test_views_are_coroutines(self):
+        """Test the routed views are async so ASGI does not wrap them"""
+        view = async_read_view(RecipeViewSets, {'get': 'list'})
+
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+
+    def test_list_and_retrieve_match_sync_views(self):
+        """Test async responses are identical to the sync viewsets'"""
+        for path in (
+            '/recipes/',
+            f'/recipes/{self.recipe.id}/',
+            '/tags/',
+            '/ingredients/',
+        ):
+            res = self.get(path, **self.headers)
+            expected = self.sync_client.get(path)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res['Content-Type'], expected['Content-Type'])
+            self.assertEqual(json.loads(res.content), expected.json())
+
+    def test_auth_required(self):
+        """Test async reads still authenticate"""
+        res = self.get('/recipes/')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_writes_use_sync_viewset(self):
+        """Test non-read methods fall through to the sync viewset"""
+        res = self.request(
+            'patch',
+            f'/recipes/{self.recipe.id}/',
+            json.dumps({'title': 'Waffles'}),
+            content_type='application/json',
+            **self.headers,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Waffles')
+
+    def test_concurrent_reads(self):
+        """Test many concurrent reads all succeed"""
+        async def burst():
+            client = AsyncClient()
+            return await asyncio.gather(*[
+                client.get('/recipes/', **self.headers)
+                for _ in range(10)
+            ])
+
+        responses = async_to_sync(burst)()
+
+        self.assertEqual(
+            {res.status_code for res in responses}, {status.HTTP_200_OK}
+        )
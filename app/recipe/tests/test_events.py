@@ -0,0 +1,189 @@
+"""Tests for the recipe change event stream"""
+
+import asyncio
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from recipe import events
+from rest_framework.authtoken.models import Token
+
+
+class FakeClient:
+    """ASGI receive and send callables recording the response"""
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.sent = asyncio.Queue()
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def send(self, message):
+        await self.sent.put(message)
+
+    async def next_body(self):
+        message = await asyncio.wait_for(self.sent.get(), 5)
+        return message['body']
+
+    async def disconnect(self):
+        await self.inbox.put({'type': 'http.disconnect'})
+
+
+def scope(token=None, method='GET'):
+    headers = [(b'authorization', f'Token {token}'.encode())] if token else []
+    return {
+        'type': 'http', 'method': method, 'path': events.EVENTS_PATH,
+        'headers': headers,
+    }
+
+
+async def django_app(scope, receive, send):
+    raise AssertionError('Event streams must not reach Django')
+
+
+class BrokerTests(SimpleTestCase):
+    """Test fanning notifications out to subscriptions"""
+
+    async def test_publish_coalesces_per_user(self):
+        """Test a burst of changes wakes each of the user's streams once"""
+        broker = events.Broker()
+        first = broker.subscribe(1)
+        second = broker.subscribe(1)
+        other = broker.subscribe(2)
+
+        broker.publish(1, {'recipe'})
+        broker.publish(1, {'tag', 'recipe'})
+
+        self.assertEqual(first.take(), ['recipe', 'tag'])
+        self.assertEqual(second.take(), ['recipe', 'tag'])
+        self.assertFalse(first.changed.is_set())
+        self.assertFalse(other.changed.is_set())
+        broker.unsubscribe(first)
+        broker.unsubscribe(second)
+        self.assertEqual(len(broker), 1)
+        self.assertNotIn(1, broker.subscriptions)
+
+
+@override_settings(EVENT_STREAM_RECONNECT_SECONDS=0.05)
+class EventStreamTests(TransactionTestCase):
+    """Test streaming change events over ASGI"""
+
+    def setUp(self):
+        # Authentication runs in a pool thread, which must hand its
+        # connection back or the test database cannot be dropped.
+        patcher = patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        self.token = Token.objects.create(user=self.user).key
+        self.app = events.with_event_stream(django_app)
+
+    async def open_stream(self):
+        client = FakeClient()
+        task = asyncio.ensure_future(
+            self.app(scope(self.token), client.receive, client.send)
+        )
+        start = await asyncio.wait_for(client.sent.get(), 5)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'),
+                      start['headers'])
+        self.assertEqual(await client.next_body(), b'retry: 50\n\n')
+        await asyncio.wait_for(events.bridge.listening.wait(), 5)
+        return client, task
+
+    async def close_stream(self, client, task):
+        await client.disconnect()
+        await asyncio.wait_for(task, 5)
+        self.assertEqual(len(events.broker), 0)
+        await events.bridge.stop()
+
+    @sync_to_async
+    @transaction.atomic
+    def write(self, user, title):
+        recipe = Recipe.objects.create(
+            user=user, title=title, time_minutes=5, price=Decimal('1.00'),
+        )
+        recipe.tags.add(Tag.objects.create(user=user, name=title))
+
+    async def test_user_changes_pushed(self):
+        """Test writes reach the owner's stream only, one event each"""
+        client, task = await self.open_stream()
+
+        await self.write(self.other, 'Not mine')
+        await self.write(self.user, 'Soup')
+
+        self.assertEqual(
+            await client.next_body(),
+            b'event: change\ndata: {"kinds": ["recipe", "tag"]}\n\n',
+        )
+        await self.close_stream(client, task)
+
+    async def test_bulk_delete_pushed(self):
+        """Test a statement deleting many recipes sends one event"""
+        await self.write(self.user, 'Soup')
+        await self.write(self.user, 'Stew')
+        client, task = await self.open_stream()
+
+        await sync_to_async(Recipe.objects.filter(user=self.user).delete)()
+
+        self.assertEqual(
+            await client.next_body(),
+            b'event: change\ndata: {"kinds": ["recipe"]}\n\n',
+        )
+        await self.close_stream(client, task)
+
+    @override_settings(EVENT_STREAM_KEEPALIVE_SECONDS=0.05)
+    async def test_idle_stream_kept_alive(self):
+        """Test idle streams get comments so proxies keep them open"""
+        client, task = await self.open_stream()
+
+        self.assertEqual(await client.next_body(), b': keepalive\n\n')
+
+        await self.close_stream(client, task)
+
+    async def test_lost_listen_connection(self):
+        """Test streams are told to resync after the bridge reconnects"""
+        client, task = await self.open_stream()
+
+        await sync_to_async(self.terminate_listener)()
+
+        self.assertEqual(
+            await client.next_body(),
+            b'event: change\n'
+            b'data: {"kinds": ["ingredient", "recipe", "tag"]}\n\n',
+        )
+        await self.close_stream(client, task)
+
+    def terminate_listener(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_terminate_backend(pid) FROM pg_stat_activity '
+                'WHERE query = %s',
+                [f'LISTEN {events.CHANNEL}'],
+            )
+
+    async def test_token_required(self):
+        """Test streams need a valid API token"""
+        for token in (None, 'wrong'):
+            client = FakeClient()
+            await self.app(scope(token), client.receive, client.send)
+            start = await client.sent.get()
+            self.assertEqual(start['status'], 401)
+
+    async def test_only_get_allowed(self):
+        """Test other methods are rejected"""
+        client = FakeClient()
+        await self.app(
+            scope(self.token, method='POST'), client.receive, client.send
+        )
+        self.assertEqual((await client.sent.get())['status'], 405)
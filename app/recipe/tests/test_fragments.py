@@ -0,0 +1,188 @@
+"""Tests for recipes served from pre-rendered JSON fragments"""
+
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from core import jobs
+from core.models import Job, Recipe, RecipeFragment, Tag, Ingredient
+from core.renderers import OrjsonRenderer
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from recipe import fragments
+from recipe.serializers import RecipeSerializer
+from rest_framework import status
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+# Fragments are checked against the writing transaction's id, so each
+# write here commits on its own.
+class RecipeFragmentTests(TransactionTestCase):
+    """Test list and detail responses assembled from fragments"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('4.50'), description='Hot',
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Leek')
+        )
+
+    def test_list_matches_serializer(self):
+        """Test a list from fragments is what the serializer renders"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(
+            res.json(), RecipeSerializer([self.recipe], many=True).data
+        )
+        self.assertTrue(RecipeFragment.objects.filter(
+            recipe=self.recipe
+        ).exists())
+
+        with self.assertNumQueries(1):
+            self.client.get(RECIPES_URL)
+
+    def test_fragments_sent_without_parsing(self):
+        """Test rendering a fragment response neither parses nor encodes"""
+        self.client.get(RECIPES_URL)
+
+        with mock.patch.object(fragments, 'json', wraps=json) as parser, \
+                mock.patch.object(OrjsonRenderer, 'render') as encode:
+            res = self.client.get(RECIPES_URL)
+            content = res.content
+            detail = self.client.get(detail_url(self.recipe.id)).content
+
+        parser.loads.assert_not_called()
+        encode.assert_not_called()
+        self.assertEqual(json.loads(content)[0]['id'], self.recipe.id)
+        self.assertEqual(json.loads(detail)['description'], 'Hot')
+
+    def test_detail_from_fragment(self):
+        """Test the detail view serves the detail fragment"""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['description'], 'Hot')
+        self.assertEqual(
+            self.client.get(detail_url(0)).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_image_url_made_absolute(self):
+        """Test image URLs are absolute for the request's host"""
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media, ALLOWED_HOSTS=['api.example.com'],
+        ):
+            self.recipe.image.save('soup.jpg', ContentFile(b'jpeg'))
+            res = self.client.get(RECIPES_URL, HTTP_HOST='api.example.com')
+
+        self.assertEqual(
+            res.json()[0]['image'],
+            f'http://api.example.com{self.recipe.image.url}',
+        )
+
+    def test_write_refreshes_fragment(self):
+        """Test writes through the API re-render the fragment"""
+        self.client.get(RECIPES_URL)
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+
+        fragment = RecipeFragment.objects.get(recipe=self.recipe)
+        self.assertIn(b'"title":"Stew"', bytes(fragment.list_json))
+        self.assertEqual(
+            fragment.change_seq,
+            Recipe.objects.get(pk=self.recipe.pk).change_seq,
+        )
+
+    def test_stale_fragment_not_served(self):
+        """Test writes bypassing signals are still picked up"""
+        self.client.get(RECIPES_URL)
+
+        Recipe.objects.filter(pk=self.recipe.pk).update(title='Broth')
+        self.recipe.tags.through.objects.all().delete()
+
+        recipe = self.client.get(RECIPES_URL).json()[0]
+        self.assertEqual((recipe['title'], recipe['tags']), ('Broth', []))
+
+    def test_tag_rename_refreshes_fragments(self):
+        """Test renaming a tag re-renders the recipes showing it"""
+        self.client.get(RECIPES_URL)
+
+        self.client.patch(
+            reverse('recipe:tag-detail', args=[self.tag.id]),
+            {'name': 'Plant based'},
+        )
+
+        jobs.work(burst=True)
+        self.assertIn(
+            b'Plant based',
+            bytes(RecipeFragment.objects.get(recipe=self.recipe).list_json),
+        )
+
+    def test_rename_outdates_fragments(self):
+        """Test renames bypassing signals outdate the fragments"""
+        self.client.get(RECIPES_URL)
+
+        Tag.objects.filter(pk=self.tag.pk).update(name='Plant based')
+        Ingredient.objects.update(name='Onion')
+
+        recipe = self.client.get(RECIPES_URL).json()[0]
+        self.assertEqual(recipe['tags'][0]['name'], 'Plant based')
+        self.assertEqual(recipe['ingredients'][0]['name'], 'Onion')
+
+    def test_rename_racing_render(self):
+        """Test a fragment rendered before a rename is not served after"""
+        stale = fragments.render([self.recipe.id]).values()
+
+        Tag.objects.filter(pk=self.tag.pk).update(name='Plant based')
+        fragments.store(stale)
+
+        recipe = self.client.get(RECIPES_URL).json()[0]
+        self.assertEqual(recipe['tags'][0]['name'], 'Plant based')
+
+    def test_save_without_rename(self):
+        """Test saving a tag under the same name queues no job"""
+        self.tag.save()
+
+        self.assertFalse(Job.objects.exists())
+
+    def test_browsable_api_uses_serializers(self):
+        """Test non-JSON renderers go through the serializers"""
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Soup', res.content)
+
+    def test_check_fragments(self):
+        """Test the checker reports and repairs wrong fragments"""
+        self.client.get(RECIPES_URL)
+        RecipeFragment.objects.update(list_json=b'{}')
+
+        with self.assertRaises(CommandError):
+            call_command('check_fragments', stdout=StringIO())
+        out = StringIO()
+        call_command('check_fragments', fix=True, stdout=out)
+
+        self.assertIn('1 wrong', out.getvalue())
+        call_command('check_fragments', stdout=StringIO())
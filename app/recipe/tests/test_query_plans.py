@@ -0,0 +1,205 @@
+"""Query plan regression tests for the recipe API's hot queries
+
+Each test requests an endpoint, then EXPLAINs every query it ran with
+sequential scans, sorts and hash/merge joins disabled in the planner,
+leaving only plans that scale with per-user data. Postgres still falls
+back to the disabled nodes, or walks a whole index without an index
+condition, when no index can answer the query; any of those in the plan
+mean the query will degrade as the tables grow.
+"""
+
+import random
+from decimal import Decimal
+
+from core.models import Recipe, Tag, Ingredient
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+PLANNER_SETTINGS = (
+    'enable_seqscan',
+    'enable_sort',
+    'enable_hashjoin',
+    'enable_mergejoin',
+)
+
+# Synthetic dataset; big enough for realistic planner statistics.
+USERS = 40
+RECIPES_PER_USER = 250
+TAGS_PER_USER = 30
+INGREDIENTS_PER_USER = 60
+TAGS_PER_RECIPE = 3
+INGREDIENTS_PER_RECIPE = 5
+
+BIG_TABLES = {
+    'core_recipe',
+    'core_tag',
+    'core_ingredient',
+    'core_recipe_tags',
+    'core_recipe_ingredients',
+}
+
+
+def seed_dataset(rng):
+    """Bulk load the synthetic dataset and return the users"""
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(email=f'user{i}@example.com', name=f'user{i}')
+        for i in range(USERS)
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag{i}')
+        for user in users for i in range(TAGS_PER_USER)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'ingredient{i}')
+        for user in users for i in range(INGREDIENTS_PER_USER)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'recipe{i}',
+            time_minutes=rng.randint(5, 180),
+            price=Decimal(rng.randint(100, 5000)) / 100,
+        )
+        for user in users for i in range(RECIPES_PER_USER)
+    )
+
+    tags_by_user = _group_by_user(tags)
+    ingredients_by_user = _group_by_user(ingredients)
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in rng.sample(tags_by_user[recipe.user_id], TAGS_PER_RECIPE)
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=recipe.id, ingredient_id=ingredient.id
+        )
+        for recipe in recipes
+        for ingredient in rng.sample(
+            ingredients_by_user[recipe.user_id], INGREDIENTS_PER_RECIPE
+        )
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return users
+
+
+def _group_by_user(objects):
+    """Group tags or ingredients by their user id"""
+    grouped = {}
+    for obj in objects:
+        grouped.setdefault(obj.user_id, []).append(obj)
+    return grouped
+
+
+def plan_problems(plan):
+    """Yield a description of every full scan or sort in a plan"""
+    node_type = plan['Node Type']
+    relation = plan.get('Relation Name')
+    if node_type == 'Seq Scan' and relation in BIG_TABLES:
+        yield f'Seq Scan on {relation}'
+    if node_type in ('Index Scan', 'Index Only Scan') and \
+            relation in BIG_TABLES and 'Index Cond' not in plan:
+        yield f'Full {node_type} of {plan["Index Name"]}'
+    if node_type in ('Sort', 'Incremental Sort'):
+        yield f'{node_type} on {plan.get("Sort Key")}'
+    for child in plan.get('Plans', []):
+        yield from plan_problems(child)
+
+
+# The first list request renders every fragment of a large dataset; it
+# is slow by design, so keep it out of the slow-request log.
+@override_settings(REQUEST_TIMING_SLOW_MS=1e6)
+class QueryPlanTests(TestCase):
+    """Test each endpoint's SQL is answered from indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = seed_dataset(random.Random(0))
+        cls.user = users[USERS // 2]
+        cls.recipe = Recipe.objects.filter(user=cls.user).first()
+        cls.tag_ids = list(cls.recipe.tags.values_list('id', flat=True))
+        cls.ingredient_ids = list(
+            cls.recipe.ingredients.values_list('id', flat=True)
+        )
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertIndexed(self, url, params=None):
+        """Request ``url`` and EXPLAIN every query it ran on big tables"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params or {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        explained = 0
+        with connection.cursor() as cursor:
+            for setting in PLANNER_SETTINGS:
+                cursor.execute(f'SET {setting} = off')
+            try:
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.startswith('SELECT'):
+                        continue
+                    if not any(f'"{table}"' in sql for table in BIG_TABLES):
+                        continue
+                    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                    plan = cursor.fetchone()[0][0]['Plan']
+                    problems = list(plan_problems(plan))
+                    self.assertEqual(problems, [], f'{sql}\n{plan}')
+                    explained += 1
+            finally:
+                # Settings are per session: never leak into later tests.
+                for setting in PLANNER_SETTINGS:
+                    cursor.execute(f'RESET {setting}')
+        self.assertGreater(explained, 0)
+
+    def test_recipe_list(self):
+        self.assertIndexed(RECIPE_URL)
+
+    def test_recipe_list_filtered_by_tags(self):
+        self.assertIndexed(RECIPE_URL, {
+            'tags': ','.join(map(str, self.tag_ids)),
+        })
+
+    def test_recipe_list_filtered_by_ingredients(self):
+        self.assertIndexed(RECIPE_URL, {
+            'ingredients': ','.join(map(str, self.ingredient_ids)),
+        })
+
+    def test_recipe_list_cheapest(self):
+        self.assertIndexed(RECIPE_URL, {
+            'ordering': 'price', 'price_max': '10.00',
+        })
+
+    def test_recipe_list_quickest(self):
+        self.assertIndexed(RECIPE_URL, {
+            'ordering': 'time_minutes', 'time_max': 30,
+        })
+
+    def test_recipe_detail(self):
+        self.assertIndexed(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+    def test_tag_list(self):
+        self.assertIndexed(TAGS_URL)
+
+    def test_tag_list_assigned_only(self):
+        self.assertIndexed(TAGS_URL, {'assigned_only': 1})
+
+    def test_ingredient_list(self):
+        self.assertIndexed(INGREDIENTS_URL)
+
+    def test_ingredient_list_assigned_only(self):
+        self.assertIndexed(INGREDIENTS_URL, {'assigned_only': 1})
@@ -1,21 +1,444 @@
-"""Test for recipe api endpoints
+"""Test for recipe api endpoints"""
 
-import os
-import tempfile
 from decimal import Decimal
 
-from PIL import Image
 from core.models import Recipe, Tag, Ingredient
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.feature_index import RecipeFeatureIndex, tag_keys, ingredient_keys
+from recipe.serializers import RecipeSerializer
 from rest_framework import status
 from rest_framework.test import APIClient
 
 RECIPE_URL = reverse('recipe:recipe-list')
+PANTRY_URL = reverse('recipe:recipe-pantry')
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
 
 
-... // Complete code for the file
+def similar_url(recipe_id):
+    """Create and return a similar recipes url"""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
 
-"
\ No newline at end of file
+
+def create_user(**params):
+    """Helper function for creating and returning users"""
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, tags=(), ingredients=(), **params):
+    """Helper function for creating and returning recipes"""
+    defaults = {
+        'title': 'sample_recipe_name',
+        'time_minutes': 10,
+        'price': Decimal('5.50'),
+    }
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    for name in tags:
+        tag, _ = Tag.objects.get_or_create(user=user, name=name)
+        recipe.tags.add(tag)
+    for name in ingredients:
+        ingredient, _ = Ingredient.objects.get_or_create(user=user, name=name)
+        recipe.ingredients.add(ingredient)
+    return recipe
+
+
+class PublicRecipeApiTests(TestCase):
+    """Test unauthenticated API requests"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test authentication is required for retrieving recipes"""
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeApiTests(TestCase):
+    """Test authenticated API requests"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_retrieve_recipes(self):
+        """Test retrieving recipes newest first"""
+        create_recipe(self.user)
+        create_recipe(self.user)
+
+        res = self.client.get(RECIPE_URL)
+
+        recipes = Recipe.objects.all().order_by('-id')
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, serializer.data)
+
+    def test_filter_by_tags_unique(self):
+        """Test filtering by several tags lists each recipe once"""
+        recipe = create_recipe(self.user, tags=['Vegan', 'Dinner'])
+        create_recipe(self.user, tags=['Lunch'])
+        tag_ids = recipe.tags.values_list('id', flat=True)
+
+        res = self.client.get(
+            RECIPE_URL, {'tags': ','.join(map(str, tag_ids))}
+        )
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+    def test_filter_by_price_and_time(self):
+        """Test filtering by price range and maximum time"""
+        cheap_quick = create_recipe(
+            self.user, price=Decimal('3.00'), time_minutes=10
+        )
+        create_recipe(self.user, price=Decimal('3.00'), time_minutes=60)
+        create_recipe(self.user, price=Decimal('30.00'), time_minutes=10)
+        create_recipe(self.user, price=Decimal('1.00'), time_minutes=10)
+
+        res = self.client.get(RECIPE_URL, {
+            'price_min': '2', 'price_max': '5.50', 'time_max': 15,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [cheap_quick.id])
+
+    def test_ordering(self):
+        """Test ordering by price and time with id as tie breaker"""
+        r1 = create_recipe(self.user, price=Decimal('9.00'), time_minutes=5)
+        r2 = create_recipe(self.user, price=Decimal('2.00'), time_minutes=30)
+        r3 = create_recipe(self.user, price=Decimal('2.00'), time_minutes=5)
+
+        res = self.client.get(RECIPE_URL, {'ordering': 'price'})
+        self.assertEqual([r['id'] for r in res.data], [r2.id, r3.id, r1.id])
+
+        res = self.client.get(RECIPE_URL, {'ordering': 'time_minutes'})
+        self.assertEqual([r['id'] for r in res.data], [r1.id, r3.id, r2.id])
+
+    def test_invalid_filters_rejected(self):
+        """Test malformed range filters and orderings are rejected"""
+        for params in (
+            {'price_min': 'cheap'},
+            {'price_max': '1e999999'},
+            {'price_max': 'NaN'},
+            {'price_min': 'Infinity'},
+            {'price_min': '-Infinity'},
+            {'price_max': '1000'},
+            {'time_max': 'soon'},
+            {'ordering': 'title'},
+        ):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_multi_get_by_ids(self):
+        """Test fetching several recipes by id in one request"""
+        r1 = create_recipe(self.user)
+        create_recipe(self.user)
+        r3 = create_recipe(self.user)
+        other = create_recipe(create_user(email='other@example.com'))
+
+        res = self.client.get(
+            RECIPE_URL, {'ids': f'{r1.id},{r3.id},{other.id},0'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [r3.id, r1.id])
+
+    def test_multi_get_invalid_ids(self):
+        """Test malformed and oversized id lists are rejected"""
+        too_many = ','.join(map(str, range(501)))
+        for ids in ('1,x', too_many):
+            res = self.client.get(RECIPE_URL, {'ids': ids})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_include_side_loads_once(self):
+        """Test included tags and ingredients are listed once by id"""
+        r1 = create_recipe(self.user, tags=['Vegan', 'Quick'],
+                           ingredients=['Rice'])
+        r2 = create_recipe(self.user, tags=['Vegan'], ingredients=['Rice'])
+        vegan = Tag.objects.get(name='Vegan')
+        quick = Tag.objects.get(name='Quick')
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL, {'include': 'tags'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = {r['id']: r for r in res.data['recipes']}
+        self.assertCountEqual(recipes[r1.id]['tags'], [vegan.id, quick.id])
+        self.assertEqual(recipes[r2.id]['tags'], [vegan.id])
+        self.assertEqual(recipes[r2.id]['ingredients'][0]['name'], 'Rice')
+        self.assertEqual(res.data['included'], {'tags': [
+            {'id': vegan.id, 'name': 'Vegan'},
+            {'id': quick.id, 'name': 'Quick'},
+        ]})
+
+        res = self.client.get(RECIPE_URL, {
+            'include': 'tags,ingredients', 'ids': str(r2.id),
+        })
+        self.assertEqual(res.data['recipes'][0]['ingredients'], [
+            res.data['included']['ingredients'][0]['id']
+        ])
+
+    def test_shopping_list(self):
+        """Test the shopping list counts each ingredient once"""
+        r1 = create_recipe(self.user, ingredients=['Rice', 'Leek'])
+        r2 = create_recipe(self.user, ingredients=['Rice', 'Salt'])
+        create_recipe(self.user, ingredients=['Tofu'])
+        other = create_recipe(create_user(email='other@example.com'),
+                              ingredients=['Rice'])
+        ids = f'{r1.id},{r2.id},{other.id}'
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SHOPPING_LIST_URL, {'ids': ids})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(i['name'], i['recipes']) for i in res.data],
+            [('Leek', 1), ('Rice', 2), ('Salt', 1)],
+        )
+
+    def test_shopping_list_requires_ids(self):
+        """Test the shopping list needs valid recipe ids"""
+        for params in ({}, {'ids': 'soup'}):
+            res = self.client.get(SHOPPING_LIST_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_include_unknown_rejected(self):
+        """Test only tags and ingredients can be included"""
+        res = self.client.get(RECIPE_URL, {'include': 'tags,user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PrivateSimilarRecipeApiTests(TestCase):
+    """Test the similar recipes endpoint"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_similar_recipes_ranked(self):
+        """Test recipes are ranked by shared tags and ingredients"""
+        recipe = create_recipe(
+            self.user, tags=['Dinner', 'Vegan'], ingredients=['Rice', 'Tofu']
+        )
+        close = create_recipe(
+            self.user, tags=['Dinner', 'Vegan'], ingredients=['Rice']
+        )
+        far = create_recipe(self.user, tags=['Dinner'], ingredients=['Eggs'])
+        create_recipe(self.user, tags=['Dessert'], ingredients=['Sugar'])
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [close.id, far.id])
+        self.assertAlmostEqual(res.data[0]['similarity'], 3 / 4)
+        self.assertAlmostEqual(res.data[1]['similarity'], 1 / 5)
+
+    def test_similar_recipes_cosine_and_limit(self):
+        """Test the cosine metric and the limit parameter"""
+        recipe = create_recipe(
+            self.user, tags=['Dinner'], ingredients=['Rice']
+        )
+        best = create_recipe(self.user, tags=['Dinner'], ingredients=['Rice'])
+        create_recipe(self.user, tags=['Dinner'], ingredients=['Beans'])
+
+        res = self.client.get(
+            similar_url(recipe.id), {'metric': 'cosine', 'limit': 1}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['id'], best.id)
+        self.assertAlmostEqual(res.data[0]['similarity'], 1.0)
+
+    def test_similar_recipes_invalid_metric(self):
+        """Test an unknown metric is rejected"""
+        recipe = create_recipe(self.user)
+
+        res = self.client.get(similar_url(recipe.id), {'metric': 'euclid'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('metric', res.data)
+
+    def test_similar_recipes_limited_to_user(self):
+        """Test other users' recipes are neither ranked nor reachable"""
+        other_user = create_user(
+            email='other@example.com',
+            password='testpass1234',
+        )
+        recipe = create_recipe(self.user, tags=['Dinner'])
+        create_recipe(other_user, tags=['Dinner'])
+        other_recipe = create_recipe(other_user, tags=['Dinner'])
+
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual(res.data, [])
+
+        res = self.client.get(similar_url(other_recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_similar_recipes_see_updates(self):
+        """Test the index follows link changes"""
+        recipe = create_recipe(self.user, tags=['Dinner'])
+        other = create_recipe(self.user, tags=['Lunch'])
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+
+        other.tags.add(Tag.objects.get(user=self.user, name='Dinner'))
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual([r['id'] for r in res.data], [other.id])
+
+        Tag.objects.filter(user=self.user, name='Dinner').first().delete()
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+
+
+# The cached index is checked against the writing transactions' ids, so
+# each write here commits on its own.
+class FeatureIndexCacheTests(TransactionTestCase):
+    """Test the feature index cache follows writes"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_index_sees_writes_without_signals(self):
+        """Test links added by bulk writes or other processes are seen"""
+        recipe = create_recipe(self.user, tags=['Dinner'])
+        other = create_recipe(self.user)
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+
+        Recipe.tags.through.objects.bulk_create([Recipe.tags.through(
+            recipe=other, tag=Tag.objects.get(name='Dinner'),
+        )])
+
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual([r['id'] for r in res.data], [other.id])
+
+
+class PrivatePantryApiTests(TestCase):
+    """Test the pantry (what can I cook) endpoint"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass1234',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _ingredient_ids(self, *names):
+        """Return the ids of the named ingredients as a query string"""
+        return ','.join(
+            str(Ingredient.objects.get(user=self.user, name=name).id)
+            for name in names
+        )
+
+    def test_pantry_fully_covered(self):
+        """Test only recipes with every ingredient on hand are returned"""
+        omelette = create_recipe(self.user, ingredients=['Eggs', 'Butter'])
+        create_recipe(self.user, ingredients=['Eggs', 'Flour'])
+        rice = create_recipe(self.user, ingredients=['Rice'])
+
+        res = self.client.get(PANTRY_URL, {
+            'ingredients': self._ingredient_ids('Eggs', 'Butter', 'Rice'),
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [rice.id, omelette.id])
+        for recipe in res.data:
+            self.assertEqual(recipe['coverage'], 1.0)
+            self.assertEqual(recipe['missing_ingredients'], 0)
+
+    def test_pantry_max_missing_ranked(self):
+        """Test partially covered recipes are ranked by coverage"""
+        full = create_recipe(self.user, ingredients=['Eggs', 'Butter'])
+        half = create_recipe(self.user, ingredients=['Eggs', 'Flour'])
+        third = create_recipe(
+            self.user, ingredients=['Eggs', 'Sugar', 'Cream']
+        )
+
+        res = self.client.get(PANTRY_URL, {
+            'ingredients': self._ingredient_ids('Eggs', 'Butter'),
+            'max_missing': 2,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data], [full.id, half.id, third.id]
+        )
+        self.assertEqual(
+            [r['missing_ingredients'] for r in res.data], [0, 1, 2]
+        )
+        self.assertAlmostEqual(res.data[1]['coverage'], 0.5)
+
+    def test_pantry_limited_to_user(self):
+        """Test other users' recipes are never matched"""
+        other_user = create_user(
+            email='other@example.com',
+            password='testpass1234',
+        )
+        other_recipe = create_recipe(other_user, ingredients=['Eggs'])
+        egg = other_recipe.ingredients.get()
+
+        res = self.client.get(PANTRY_URL, {'ingredients': str(egg.id)})
+
+        self.assertEqual(res.data, [])
+
+    def test_pantry_invalid_ingredients(self):
+        """Test a malformed ingredient list is rejected"""
+        res = self.client.get(PANTRY_URL, {'ingredients': 'eggs'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients', res.data)
+
+        for ids in ('99999999999999999999', str(2 ** 62), '0', '1,-2'):
+            res = self.client.get(PANTRY_URL, {'ingredients': ids})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ingredients', res.data)
+
+        res = self.client.get(PANTRY_URL, {'ingredients': '1', 'limit': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('limit', res.data)
+
+
+class RecipeFeatureIndexTests(TestCase):
+    """Test the in-memory feature index"""
+
+    def test_similar_without_database(self):
+        """Test ranking on an index built from raw arrays"""
+        rows = [0, 0, 1, 1, 2]
+        features = list(tag_keys([1, 2])) + list(tag_keys([1])) + \
+            list(ingredient_keys([1])) + list(ingredient_keys([1]))
+        index = RecipeFeatureIndex([10, 20, 30], rows, features)
+
+        self.assertEqual(index.similar(10), [(20, 1 / 3)])
+        self.assertEqual(index.similar(20), [(30, 0.5), (10, 1 / 3)])
+        self.assertEqual(index.similar(99), [])
+
+    def test_cookable_without_database(self):
+        """Test pantry matching on an index built from raw arrays"""
+        rows = [0, 0, 1, 1, 2]
+        features = list(ingredient_keys([1, 2])) + \
+            list(ingredient_keys([1, 3])) + list(tag_keys([1]))
+        index = RecipeFeatureIndex([10, 20, 30], rows, features)
+
+        self.assertEqual(index.cookable([1, 2]), [(10, 1.0, 0)])
+        self.assertEqual(
+            index.cookable([1], max_missing=1),
+            [(20, 0.5, 1), (10, 0.5, 1)],
+        )
+        self.assertEqual(index.cookable([9], max_missing=5), [])
@@ -0,0 +1,110 @@
+"""Tests for the recipe stats API"""
+
+from decimal import Decimal
+
+from core.models import Recipe, Tag, Ingredient
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+# Cached stats are checked against the writing transactions' ids, so
+# each write here commits on its own.
+class RecipeStatsApiTests(TransactionTestCase):
+    """Test the per-user recipe stats endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+        self.soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10,
+            price=Decimal('4.00'),
+        )
+        self.soup.tags.add(self.vegan)
+        self.soup.ingredients.add(self.rice)
+        self.rice_bowl = Recipe.objects.create(
+            user=self.user, title='Rice bowl', time_minutes=25,
+            price=Decimal('7.25'),
+        )
+        self.rice_bowl.ingredients.add(self.rice)
+
+    def test_stats(self):
+        """Test stats aggregate the user's recipes only"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        Recipe.objects.create(
+            user=other, title='Cake', time_minutes=60, price=Decimal('9'),
+        )
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 2)
+        self.assertEqual(res.data['average_price'], '5.62')
+        self.assertEqual(res.data['total_time_minutes'], 35)
+        self.assertEqual(res.data['tags'], [
+            {'id': self.vegan.id, 'name': 'Vegan', 'recipes': 1},
+            {'id': self.quick.id, 'name': 'Quick', 'recipes': 0},
+        ])
+        self.assertEqual(res.data['top_ingredients'], [
+            {'id': self.rice.id, 'name': 'Rice', 'recipes': 2},
+        ])
+
+    def test_stats_cached_until_write(self):
+        """Test stats are served from cache until a write"""
+        self.client.get(STATS_URL)
+        with self.assertNumQueries(1):
+            self.client.get(STATS_URL)
+
+        self.rice_bowl.tags.add(self.quick)
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['tags'][1]['recipes'], 1)
+
+        self.soup.price = Decimal('1.00')
+        self.soup.save()
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['average_price'], '4.12')
+
+        self.quick.name = 'Fast'
+        self.quick.save()
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['tags'][1]['name'], 'Fast')
+
+        self.rice_bowl.delete()
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipes'], 1)
+
+    def test_stats_see_writes_without_signals(self):
+        """Test writes other processes or bulk updates make are seen"""
+        self.client.get(STATS_URL)
+
+        Recipe.objects.filter(pk=self.soup.pk).update(time_minutes=5)
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['total_time_minutes'], 30)
+
+        Tag.objects.filter(pk=self.quick.pk).delete()
+        res = self.client.get(STATS_URL)
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_stats_empty(self):
+        """Test stats of a user without recipes"""
+        Recipe.objects.all().delete()
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes'], 0)
+        self.assertIsNone(res.data['average_price'])
+        self.assertEqual(res.data['total_time_minutes'], 0)
@@ -0,0 +1,195 @@
+"""Tests for the incremental sync API"""
+
+import datetime
+import threading
+from decimal import Decimal
+from io import StringIO
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SYNC_URL = reverse('recipe:sync')
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+# Each write commits on its own here: inside one test transaction every
+# change would carry the same transaction id.
+class SyncApiTests(TransactionTestCase):
+    """Test syncing recipes, tags and ingredients since a token"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt',
+        )
+        self.soup = create_recipe(self.user, title='Soup')
+        self.soup.tags.add(self.tag)
+        self.soup.ingredients.add(self.ingredient)
+        self.stew = create_recipe(self.user, title='Stew')
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        create_recipe(other, title='Not mine')
+        Tag.objects.create(user=other, name='Not mine')
+
+    def sync(self, since=None):
+        params = {'since': since} if since else {}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_sync(self):
+        """Test a first sync returns all of the user's data"""
+        data = self.sync()
+
+        self.assertTrue(data['reset'])
+        self.assertEqual(
+            [recipe['title'] for recipe in data['recipes']], ['Soup', 'Stew']
+        )
+        self.assertEqual(data['recipes'][0]['tags'], [self.tag.id])
+        self.assertEqual(
+            data['recipes'][0]['ingredients'], [self.ingredient.id]
+        )
+        self.assertEqual([tag['name'] for tag in data['tags']], ['Vegan'])
+        self.assertEqual(len(data['ingredients']), 1)
+
+    def test_changes_since_token(self):
+        """Test only rows written or deleted since the token are returned"""
+        token = self.sync()['token']
+        self.stew.title = 'Beef stew'
+        self.stew.save()
+        new_tag = Tag.objects.create(user=self.user, name='Quick')
+        ingredient_id = self.ingredient.id
+        self.ingredient.delete()
+
+        data = self.sync(token)
+
+        self.assertFalse(data['reset'])
+        # Deleting the ingredient unlinked it from the soup.
+        self.assertEqual(
+            [(recipe['title'], recipe['ingredients'])
+             for recipe in data['recipes']],
+            [('Soup', []), ('Beef stew', [])],
+        )
+        self.assertEqual([tag['id'] for tag in data['tags']], [new_tag.id])
+        self.assertEqual(data['ingredients'], [])
+        self.assertEqual(data['deleted'], {
+            'recipes': [], 'tags': [], 'ingredients': [ingredient_id],
+        })
+
+        data = self.sync(data['token'])
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['deleted']['ingredients'], [])
+
+    def test_linking_a_tag_changes_the_recipe(self):
+        """Test (un)linking tags and ingredients syncs the recipe"""
+        token = self.sync()['token']
+
+        self.stew.tags.add(self.tag)
+
+        data = self.sync(token)
+        self.assertEqual(
+            [(recipe['id'], recipe['tags']) for recipe in data['recipes']],
+            [(self.stew.id, [self.tag.id])],
+        )
+        self.assertEqual(data['tags'], [])
+
+    def test_sync_without_changes_is_one_query(self):
+        """Test an empty sync only probes the change indexes"""
+        token = self.sync()['token']
+
+        with self.assertNumQueries(1):
+            data = self.sync(token)
+
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['deleted']['recipes'], [])
+
+    def test_change_committed_after_sync_not_missed(self):
+        """Test a write in flight during a sync is in the next one"""
+        started = threading.Event()
+        synced = threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    Recipe.objects.filter(pk=self.soup.pk).update(
+                        title='Slow soup'
+                    )
+                    started.set()
+                    synced.wait(10)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        started.wait(10)
+        token = self.sync()['token']
+        synced.set()
+        writer.join()
+
+        data = self.sync(token)
+        self.assertIn(
+            'Slow soup', [recipe['title'] for recipe in data['recipes']]
+        )
+
+    @override_settings(SYNC_TOKEN_MAX_AGE=60)
+    def test_expired_token_resets(self):
+        """Test a token older than the tombstones kept gets a full sync"""
+        seq, issued = self.sync()['token'].split('.')
+
+        data = self.sync(f'{seq}.{int(issued) - 120}')
+
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['recipes']), 2)
+
+    def test_invalid_token(self):
+        """Test a malformed token is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_auth_required(self):
+        """Test syncing requires authentication"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(SYNC_TOKEN_MAX_AGE=60)
+    def test_prune_tombstones(self):
+        """Test only tombstones past the token lifetime are pruned"""
+        soup_id, stew_id = self.soup.id, self.stew.id
+        self.soup.delete()
+        self.stew.delete()
+        Tombstone.objects.filter(object_id=soup_id).update(
+            deleted_at=timezone.now() - datetime.timedelta(days=2)
+        )
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)),
+            [stew_id],
+        )
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import RecipeViewSets, TagViewSets, IngredientViewSets
+from .views import RecipeViewSets, TagViewSets, IngredientViewSets, SyncView
 
 router = DefaultRouter()
 router.register('recipes', viewset=RecipeViewSets)
@@ -12,5 +12,6 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('sync/', SyncView.as_view(), name='sync'),
     path('recipes/<int:pk>/add-chef/', RecipeViewSets.as_view({'post': 'add_chef'}), name='recipe-add-chef'),
 ]
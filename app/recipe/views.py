@@ -1,19 +1,45 @@
 """Views for the recipe APIs"""
 
+from core.db.replicas import ReplicaReadMixin
+from core.profiling import ProfilingMixin
+from core.timing import ServerTimingMixin
 from core.models import Recipe, Tag, Ingredient
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef
+from django.http import Http404
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes
-from rest_framework import viewsets, mixins, status
+from rest_framework import viewsets, mixins, serializers, status
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from . import fragments, sync
+from .stats import get_stats
+from .feature_index import MAX_FEATURE_ID, SIMILARITY_METRICS, get_feature_index
 from .serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer, IngredientsSerializer, \
-    RecipeImageSerializer
+    CompoundRecipeSerializer, RecipeImageSerializer, SimilarRecipeSerializer, PantryRecipeSerializer, SyncSerializer, \
+    RecipeStatsSerializer, IngredientCountSerializer
 
 
 # Create your views here.
 
+# Every ordering ends on the primary key so it is total, matches a
+# (user_id, <column>, id) index and can be resumed with a keyset cursor.
+RECIPE_ORDERINGS = {
+    '-id': ('-id',),
+    'price': ('price', 'id'),
+    'time_minutes': ('time_minutes', 'id'),
+}
+
+# Relations ?include= side-loads: their link column and serializer.
+RECIPE_INCLUDES = {
+    'tags': ('tag_id', TagSerializer),
+    'ingredients': ('ingredient_id', IngredientsSerializer),
+}
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
@@ -26,11 +52,86 @@ from .serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of IDs to filter',
+            ),
+            OpenApiParameter(
+                'price_min',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at least this much',
+            ),
+            OpenApiParameter(
+                'price_max',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at most this much',
+            ),
+            OpenApiParameter(
+                'time_max',
+                OpenApiTypes.INT,
+                description='Only recipes taking at most this many minutes',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=list(RECIPE_ORDERINGS),
+                description='Sort order of the results (default -id)',
+            ),
+            OpenApiParameter(
+                'ids',
+                OpenApiTypes.STR,
+                description='Comma separated list of recipe IDs to fetch; '
+                            'unknown IDs are left out',
+            ),
+            OpenApiParameter(
+                'include',
+                OpenApiTypes.STR,
+                description='Comma separated list of tags, ingredients: return '
+                            '{"recipes": [...], "included": {...}} with these '
+                            'linked by ID and listed once under "included"',
+            )
+        ]
+    ),
+    similar=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'metric',
+                OpenApiTypes.STR, enum=list(SIMILARITY_METRICS),
+                description='Set similarity used for ranking (default jaccard)',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of recipes to return (default 10)',
+            )
+        ]
+    ),
+    pantry=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'ingredients',
+                OpenApiTypes.STR,
+                description='Comma separated list of ingredient IDs on hand',
+            ),
+            OpenApiParameter(
+                'max_missing',
+                OpenApiTypes.INT,
+                description='Allow recipes missing up to this many ingredients (default 0)',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of recipes to return (default 50)',
+            )
+        ]
+    ),
+    shopping_list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'ids',
+                OpenApiTypes.STR, required=True,
+                description='Comma separated list of recipe IDs to shop for',
             )
         ]
     )
 )
-class RecipeViewSets(viewsets.ModelViewSet):
+class RecipeViewSets(ProfilingMixin, ServerTimingMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = RecipeDetailSerializer
     queryset = Recipe.objects.all()
@@ -41,27 +142,142 @@ class RecipeViewSets(viewsets.ModelViewSet):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _param_to_decimal(self, name):
+        """Return a query parameter as a price Decimal, or None if absent."""
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        # Finite and within the column's precision, so Postgres accepts it.
+        price = Recipe._meta.get_field('price')
+        field = serializers.DecimalField(max_digits=price.max_digits, decimal_places=price.decimal_places)
+        try:
+            return field.to_internal_value(value)
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
+
+    def _param_to_int(self, name, default):
+        """Return a query parameter as an integer, or default if absent."""
+        try:
+            return int(self.request.query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: 'A valid integer is required.'})
+
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        params = self.request.query_params
+        tags = params.get('tags')
+        ingredients = params.get('ingredients')
+        queryset = self.queryset.filter(
+            user=self.request.user
+        ).prefetch_related('tags', 'ingredients')
+        ids = params.get('ids')
+        if ids is not None:
+            try:
+                recipe_ids = self._params_to_ints(ids)
+            except ValueError:
+                raise ValidationError({'ids': 'A comma separated list of integers is required.'})
+            if len(recipe_ids) > settings.RECIPE_MULTI_GET_MAX_IDS:
+                raise ValidationError({'ids': f'At most {settings.RECIPE_MULTI_GET_MAX_IDS} IDs are allowed.'})
+            queryset = queryset.filter(id__in=recipe_ids)
+        # EXISTS rather than a join so no DISTINCT (and sort) is needed.
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.filter(Exists(Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag_id__in=tag_ids,
+            )))
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = queryset.filter(Exists(Recipe.ingredients.through.objects.filter(
+                recipe_id=OuterRef('pk'), ingredient_id__in=ingredient_ids,
+            )))
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        price_min = self._param_to_decimal('price_min')
+        if price_min is not None:
+            queryset = queryset.filter(price__gte=price_min)
+        price_max = self._param_to_decimal('price_max')
+        if price_max is not None:
+            queryset = queryset.filter(price__lte=price_max)
+        time_max = params.get('time_max')
+        if time_max is not None:
+            try:
+                queryset = queryset.filter(time_minutes__lte=int(time_max))
+            except ValueError:
+                raise ValidationError({'time_max': 'A valid integer is required.'})
+
+        ordering = params.get('ordering', '-id')
+        if ordering not in RECIPE_ORDERINGS:
+            raise ValidationError({'ordering': f'Must be one of {", ".join(RECIPE_ORDERINGS)}.'})
+        return queryset.order_by(*RECIPE_ORDERINGS[ordering])
+
+    def list(self, request, *args, **kwargs):
+        """List recipes from their pre-rendered fragments"""
+        include = request.query_params.get('include')
+        if include:
+            return self._compound_list(include.split(','))
+        if not fragments.serves(request):
+            return super().list(request, *args, **kwargs)
+        parts = fragments.load(self.filter_queryset(self.get_queryset()))
+        return self._fragment_response(b'[' + b','.join(parts) + b']')
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a recipe from its pre-rendered fragment"""
+        if not fragments.serves(request):
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(pk=kwargs['pk'])
+            parts = fragments.load(queryset, detail=True)
+        except (TypeError, ValueError):
+            raise Http404
+        if not parts:
+            raise Http404
+        return self._fragment_response(bytes(parts[0]))
+
+    def _compound_list(self, include):
+        """List recipes with the included relations side-loaded once"""
+        unknown = set(include) - set(RECIPE_INCLUDES)
+        if unknown:
+            raise ValidationError({'include': f'Must be among {", ".join(RECIPE_INCLUDES)}.'})
+        embedded = [name for name in RECIPE_INCLUDES if name not in include]
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        recipes = list(queryset.prefetch_related(*embedded))
+        by_id = {recipe.id: recipe for recipe in recipes}
+        included = {}
+        for name, (column, serializer_class) in RECIPE_INCLUDES.items():
+            if name not in include:
+                continue
+            # Link rows as plain id pairs; each linked object is loaded once.
+            for recipe in recipes:
+                setattr(recipe, f'{name}_ids', [])
+            links = getattr(Recipe, name).through.objects.filter(recipe_id__in=queryset.values('id')).order_by('id')
+            for recipe_id, object_id in links.values_list('recipe_id', column):
+                if recipe_id in by_id:  # Not if created since recipes were read
+                    getattr(by_id[recipe_id], f'{name}_ids').append(object_id)
+            objects = serializer_class.Meta.model.objects.filter(
+                id__in={object_id for recipe in recipes for object_id in getattr(recipe, f'{name}_ids')}
+            ).order_by('id')
+            included[name] = serializer_class(objects, many=True).data
+        context = dict(self.get_serializer_context(), include=included)
+        return Response({
+            'recipes': CompoundRecipeSerializer(recipes, many=True, context=context).data,
+            'included': included,
+        })
+
+    def _fragment_response(self, body):
+        return fragments.FragmentResponse(fragments.absolute_images(body, self.request))
 
     def get_serializer_class(self):
         if self.action == 'list':
             return RecipeSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
+        elif self.action == 'similar':
+            return SimilarRecipeSerializer
+        elif self.action == 'pantry':
+            return PantryRecipeSerializer
+        elif self.action == 'stats':
+            return RecipeStatsSerializer
+        elif self.action == 'shopping_list':
+            return IngredientCountSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
@@ -79,6 +295,72 @@ class RecipeViewSets(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.data, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['GET'], detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        """List the user's recipes sharing the most tags and ingredients"""
+        recipe = self.get_object()
+        metric = request.query_params.get('metric', 'jaccard')
+        if metric not in SIMILARITY_METRICS:
+            raise ValidationError({'metric': f'Must be one of {", ".join(SIMILARITY_METRICS)}.'})
+        limit = max(0, min(self._param_to_int('limit', 10), 100))
+
+        ranked = get_feature_index(request.user).similar(recipe.id, metric=metric, limit=limit)
+        results = self._load_ranked(ranked, ['similarity'])
+
+        serializer = self.get_serializer(results, many=True)
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=False, url_path='pantry')
+    def pantry(self, request):
+        """List recipes cookable from the given ingredients"""
+        try:
+            ingredient_ids = self._params_to_ints(request.query_params.get('ingredients', ''))
+        except ValueError:
+            raise ValidationError({'ingredients': 'A comma separated list of integers is required.'})
+        if not all(0 < ingredient_id <= MAX_FEATURE_ID for ingredient_id in ingredient_ids):
+            raise ValidationError({'ingredients': f'IDs must be between 1 and {MAX_FEATURE_ID}.'})
+        max_missing = self._param_to_int('max_missing', 0)
+        limit = max(0, min(self._param_to_int('limit', 50), 500))
+
+        ranked = get_feature_index(request.user).cookable(ingredient_ids, max_missing=max_missing, limit=limit)
+        results = self._load_ranked(ranked, ['coverage', 'missing_ingredients'])
+
+        serializer = self.get_serializer(results, many=True)
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=False, url_path='stats')
+    def stats(self, request):
+        """Return aggregates over all the user's recipes"""
+        serializer = self.get_serializer(get_stats(request.user))
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """List the ingredients of the given recipes, each once with a count"""
+        if not request.query_params.get('ids'):
+            raise ValidationError({'ids': 'This parameter is required.'})
+        recipes = self.filter_queryset(self.get_queryset())
+        # One query grouping the links of the recipes by ingredient.
+        ingredients = Ingredient.objects.filter(
+            recipe__in=recipes.values('id')
+        ).annotate(recipes=Count('recipe')).order_by('name', 'id')
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+    def _load_ranked(self, ranked, attrs):
+        """Load ranked (recipe_id, *values) rows as recipes, keeping order"""
+        recipes = Recipe.objects.filter(user=self.request.user).prefetch_related(
+            'tags', 'ingredients'
+        ).in_bulk([row[0] for row in ranked])
+        results = []
+        for recipe_id, *values in ranked:
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                for attr, value in zip(attrs, values):
+                    setattr(recipe, attr, value)
+                results.append(recipe)
+        return results
+
     @action(methods=['POST'], detail=True, url_path='add-chef')
     def add_chef(self, request, pk=None):
         """Add chef's name to a recipe"""
@@ -104,7 +386,10 @@ class RecipeViewSets(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseRecipeAtrrViewSet(mixins.UpdateModelMixin,
+class BaseRecipeAtrrViewSet(ProfilingMixin,
+                            ServerTimingMixin,
+                            ReplicaReadMixin,
+                            mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             mixins.DestroyModelMixin,
                             viewsets.GenericViewSet):
@@ -117,21 +402,49 @@ class BaseRecipeAtrrViewSet(mixins.UpdateModelMixin,
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+            queryset = queryset.filter(Exists(self.recipe_links.objects.filter(
+                **{self.link_field: OuterRef('pk')}
+            )))
+        return queryset.order_by('-id')
 
 
 class TagViewSets(BaseRecipeAtrrViewSet):
     """ View manage recipe tags APIs"""
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
+    recipe_links = Recipe.tags.through
+    link_field = 'tag_id'
 
 
 class IngredientViewSets(BaseRecipeAtrrViewSet):
     """ View manage recipe ingredients APIs"""
     serializer_class = IngredientsSerializer
     queryset = Ingredient.objects.all()
+    recipe_links = Recipe.ingredients.through
+    link_field = 'ingredient_id'
+
+
+class SyncView(ProfilingMixin, ServerTimingMixin, ReplicaReadMixin, APIView):
+    """View returning what changed in the user's recipes since a sync"""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'since',
+                OpenApiTypes.STR,
+                description='Token returned by the previous sync; omit for a full sync',
+            )
+        ],
+        responses=SyncSerializer,
+    )
+    def get(self, request):
+        """List recipes, tags and ingredients changed or deleted since a sync"""
+        try:
+            changes = sync.changes(request.user, request.query_params.get('since'))
+        except ValueError:
+            raise ValidationError({'since': 'Invalid sync token.'})
+        return Response(SyncSerializer(changes).data)
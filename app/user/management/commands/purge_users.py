@@ -0,0 +1,49 @@
+"""
+Django command to purge the data of deleted users
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user import purge
+
+
+class Command(BaseCommand):
+    """Run queued user purges, a batch of rows per transaction"""
+    help = 'Delete the data of users whose deletion was requested'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when no purge is left instead of waiting for more',
+        )
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--poll-interval', type=float, default=5)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        while True:
+            job = purge.claim_next(settings.USER_PURGE_STALE_SECONDS)
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Purging user {job.user_id} ({job.email})')
+            start = time.perf_counter()
+            try:
+                job = purge.run(job, options['batch_size'])
+            except Exception as exc:
+                self.stderr.write(f'Purge of user {job.user_id} failed: '
+                                  f'{exc!r}')
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'Purged user {job.user_id} in '
+                f'{time.perf_counter() - start:.1f} s: '
+                f'{job.recipes_deleted} recipes, {job.tags_deleted} tags, '
+                f'{job.ingredients_deleted} ingredients, '
+                f'{job.images_deleted} images'
+            ))
@@ -0,0 +1,155 @@
+"""Deletion of users and their data in small committed batches
+
+Deleting a user in one go cascades through every recipe, tag,
+ingredient and link of theirs in a single transaction. Instead,
+request_deletion deactivates the account and logs it out at once, and
+queues a background job (see core.jobs) which deletes the data a batch
+per transaction, removing recipe images once each batch is committed.
+``manage.py purge_users`` runs queued purges too. Progress is kept on
+the user's UserPurge row.
+"""
+
+import datetime
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import jobs
+from core.models import Recipe, Tag, Ingredient, Tombstone, UserPurge
+
+logger = logging.getLogger(__name__)
+
+
+def request_deletion(user):
+    """Deactivate a user and queue the deletion of their data"""
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+        Token.objects.filter(user_id=user.pk).delete()
+        purge, created = UserPurge.objects.get_or_create(
+            user_id=user.pk, defaults={'email': user.email},
+        )
+        if created:
+            purge_user.enqueue(purge_id=purge.pk)
+    user.is_active = False
+    return purge
+
+
+def claim_next(stale_after, pk=None):
+    """Mark the next purge to run as running and return it, or None.
+
+    Purges left running without progress for ``stale_after`` seconds are
+    assumed to belong to a dead worker and are claimed again.
+    """
+    stale = timezone.now() - datetime.timedelta(seconds=stale_after)
+    purges = UserPurge.objects.all() if pk is None else (
+        UserPurge.objects.filter(pk=pk)
+    )
+    with transaction.atomic():
+        purge = (
+            purges.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=UserPurge.PENDING)
+                | Q(status=UserPurge.RUNNING, updated_at__lt=stale)
+            )
+            .order_by('requested_at')
+            .first()
+        )
+        if purge is not None:
+            purge.status = UserPurge.RUNNING
+            purge.save(update_fields=['status', 'updated_at'])
+    return purge
+
+
+def _delete_batch(purge, model, counter, batch_size):
+    """Delete a batch of a user's rows; return the count and image names"""
+    with transaction.atomic():
+        ids = list(
+            model.objects.filter(user_id=purge.user_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, []
+        images = []
+        if model is Recipe:
+            images = [
+                name for name in Recipe.objects.filter(id__in=ids)
+                .exclude(image='').exclude(image=None)
+                .values_list('image', flat=True)
+            ]
+            Recipe.tags.through.objects.filter(recipe_id__in=ids).delete()
+            Recipe.ingredients.through.objects.filter(
+                recipe_id__in=ids
+            ).delete()
+        model.objects.filter(id__in=ids).delete()
+        UserPurge.objects.filter(pk=purge.pk).update(
+            **{counter: F(counter) + len(ids)}, updated_at=timezone.now()
+        )
+    return len(ids), images
+
+
+def _delete_images(purge, names):
+    """Remove image files of deleted recipes from storage"""
+    storage = Recipe._meta.get_field('image').storage
+    deleted = 0
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning('Could not delete %s of user %s', name,
+                           purge.user_id, exc_info=True)
+            continue
+        deleted += 1
+    if deleted:
+        UserPurge.objects.filter(pk=purge.pk).update(
+            images_deleted=F('images_deleted') + deleted
+        )
+
+
+def run(purge, batch_size=None):
+    """Delete all data of a purge's user, then the user, in batches"""
+    batch_size = batch_size or settings.USER_PURGE_BATCH_SIZE
+    try:
+        for model, counter in ((Recipe, 'recipes_deleted'),
+                               (Tag, 'tags_deleted'),
+                               (Ingredient, 'ingredients_deleted')):
+            while True:
+                deleted, images = _delete_batch(
+                    purge, model, counter, batch_size
+                )
+                _delete_images(purge, images)
+                if deleted < batch_size:
+                    break
+        with transaction.atomic():
+            get_user_model().objects.filter(pk=purge.user_id).delete()
+            # Nobody is left to sync the deletions to.
+            Tombstone.objects.filter(user_id=purge.user_id).delete()
+            UserPurge.objects.filter(pk=purge.pk).update(
+                status=UserPurge.DONE, finished_at=timezone.now(),
+                updated_at=timezone.now(),
+            )
+    except Exception as exc:
+        logger.exception('Purge of user %s failed', purge.user_id)
+        UserPurge.objects.filter(pk=purge.pk).update(
+            status=UserPurge.FAILED, error=repr(exc),
+            updated_at=timezone.now(),
+        )
+        raise
+    purge.refresh_from_db()
+    return purge
+
+
+@jobs.task(priority=-10)
+def purge_user(purge_id):
+    """Background job running a queued purge, unless already taken"""
+    # A retried job gives a failed purge another go.
+    UserPurge.objects.filter(pk=purge_id, status=UserPurge.FAILED).update(
+        status=UserPurge.PENDING
+    )
+    purge = claim_next(settings.USER_PURGE_STALE_SECONDS, pk=purge_id)
+    if purge is not None:
+        run(purge)
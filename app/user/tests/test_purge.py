@@ -0,0 +1,127 @@
+"""
+Test user deletion purges data in batches
+"""
+
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job, Recipe, Tag, Ingredient, UserPurge
+from user import purge
+
+ME_URL = reverse('user:me')
+
+
+def create_user(email):
+    """Create a user with five recipes linked to tags and ingredients"""
+    user = get_user_model().objects.create_user(
+        email=email, password='testpass123',
+    )
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(3)]
+    ingredients = [
+        Ingredient.objects.create(user=user, name=f'Item {i}')
+        for i in range(3)
+    ]
+    for i in range(5):
+        recipe = Recipe.objects.create(
+            user=user, title=f'Recipe {i}', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+    return user
+
+
+class UserPurgeTests(TestCase):
+    """Test deleting users and purging their data"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings = override_settings(MEDIA_ROOT=media.name)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user = create_user('user@example.com')
+        self.other = create_user('other@example.com')
+        self.recipe = Recipe.objects.filter(user=self.user).first()
+        self.recipe.image.save('soup.jpg', ContentFile(b'jpeg'))
+        self.image_path = self.recipe.image.path
+
+    def test_delete_me_deactivates_and_queues(self):
+        """Test DELETE /me logs the user out and leaves the data for later"""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            UserPurge.objects.get(user_id=self.user.id).status,
+            UserPurge.PENDING,
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+        res = client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_worker_purges_in_batches(self):
+        """Test the worker deletes the user's rows and images only"""
+        purge.request_deletion(self.user)
+
+        call_command(
+            'purge_users', once=True, batch_size=2, stdout=StringIO()
+        )
+
+        job = UserPurge.objects.get(user_id=self.user.id)
+        self.assertEqual(job.status, UserPurge.DONE)
+        self.assertEqual(
+            (job.recipes_deleted, job.tags_deleted,
+             job.ingredients_deleted, job.images_deleted),
+            (5, 3, 3, 1),
+        )
+        self.assertIsNotNone(job.finished_at)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        self.assertFalse(os.path.exists(self.image_path))
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 3)
+        self.assertEqual(
+            Recipe.tags.through.objects.count(), 15
+        )
+
+    def test_purge_runs_as_background_job(self):
+        """Test requesting a deletion queues a job doing the purge"""
+        purge.request_deletion(self.user)
+        purge.request_deletion(self.user)
+        self.assertEqual(Job.objects.count(), 1)
+
+        jobs.work(burst=True)
+
+        self.assertEqual(
+            UserPurge.objects.get(user_id=self.user.id).status,
+            UserPurge.DONE,
+        )
+        self.assertFalse(Recipe.objects.filter(user_id=self.user.id).exists())
+
+    def test_stale_purge_taken_over(self):
+        """Test a purge abandoned by a dead worker is claimed again"""
+        purge.request_deletion(self.user)
+        self.assertIsNotNone(purge.claim_next(stale_after=300))
+        self.assertIsNone(purge.claim_next(stale_after=300))
+
+        self.assertIsNotNone(purge.claim_next(stale_after=-1))
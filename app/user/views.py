@@ -1,9 +1,13 @@
 """Views for the user API"""
 
-from rest_framework import generics, authentication, permissions
+from core.db.replicas import ReplicaReadMixin
+from core.timing import ServerTimingMixin
+from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from . import purge
 from .serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -18,7 +22,7 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManagerUserView(generics.RetrieveUpdateAPIView):
+class ManagerUserView(ServerTimingMixin, ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     """Manage authenticated users"""
     serializer_class = UserSerializer
     authentication_classes = [authentication.TokenAuthentication]
@@ -27,3 +31,8 @@ class ManagerUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """Retrieve and return the authenticated user"""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user now and purge their data in the background"""
+        job = purge.request_deletion(self.get_object())
+        return Response({'status': job.status}, status=status.HTTP_202_ACCEPTED)